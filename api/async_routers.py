@@ -0,0 +1,343 @@
+from typing import FrozenSet
+
+from fastapi import Depends, HTTPException, Request, Response, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.conditional import conditional_get
+from api.cost_guard import async_guard_list, guard_params
+from api.counting import async_total_count
+from api.expand import expand_options, parse_expand, serialize_viaje
+from api.filters import ViajeFilters, PagoFilters
+from api.models import Viaje as ViajeSchema, Pago as PagoSchema, CommunityArea as CommunitySchema
+from api.pagination import NEXT_CURSOR_HEADER, next_cursor
+from api.projection import projected_columns, rows_response
+from api.routers import (
+    ViajesRouter,
+    PagosRouter,
+    CommunityRouter,
+    BY_ID_VERSION,
+    CATALOG_TTL,
+    COMMUNITIES_CACHE_KEY,
+    COMMUNITIES_TABLES,
+    PAGOS_TABLES,
+    VIAJES_TABLES,
+    community_cache_key,
+    pago_cache_key,
+    viaje_cache_key,
+)
+from db.entities import Viaje, Pago, CommunityArea
+from db.bulk import delete_viajes, lock_viajes
+from db.rollups import adjust_rollups
+from util.cache import bump_data_version, get_versioned, invalidate, run_cache, set_versioned
+
+
+# Versiones async de los routers principales. Heredan el registro de rutas
+# y la construcción de consultas de api/routers.py; solo se reemplazan los
+# handlers para que usen request.state.async_db_session y no ocupen un hilo
+# del threadpool mientras esperan a Postgres. Los endpoints que no se
+# redefinen aquí (export, bulk, lookup, DELETE /viajes y PATCH /pagos por
+# filtro) siguen usando la sesión síncrona.
+# El cache en memoria no bloquea; con CACHE_URL (Redis) cada operación es
+# una ida y vuelta por red, así que todo lo que toca el cache pasa por
+# run_cache (threadpool) para no detener el event loop.
+# Se activan con DB_ASYNC=1 (ver db/config.py).
+
+# ==========================================
+# 1. ROUTER DE VIAJES (async)
+# ==========================================
+class AsyncViajesRouter(ViajesRouter):
+
+    async def list(
+        self,
+        request: Request,
+        response: Response,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: str = Query(default=None, description="Token de paginación devuelto en el header X-Next-Cursor (reemplaza a skip)"),
+        filters: ViajeFilters = Depends(),
+        expand: FrozenSet[str] = Depends(parse_expand),
+        fields: str = Query(default=None, description="Columnas a devolver separadas por coma (p. ej. trip_id,trip_miles)"),
+        count: str = Query(default="none", pattern="^(none|estimated|exact)$", description="Total en el header X-Total-Count: estimated (planner, casi gratis), exact (COUNT) o none"),
+    ):
+        """
+        Lista viajes. Permite filtrar por zona de recogida o llegada.
+        La paginación por cursor (keyset) mantiene el costo constante
+        sin importar qué tan profunda sea la página; skip se conserva
+        para clientes anteriores. Con ?expand=pago,ciudad,areas cada
+        relación cuesta una sola consulta extra para toda la página.
+
+        Sin expand se leen solo columnas (las de ?fields= o todas) y las
+        filas se codifican directo, sin un modelo Pydantic por fila.
+        ?count= agrega el total que cumple los filtros (cacheado por filtros).
+        Con If-None-Match / If-Modified-Since se responde 304 sin consultar
+        la BD si viajes y pagos no cambiaron. En Postgres la página pasa
+        antes por el guard de costo (api/cost_guard.py): 400 si es
+        demasiado cara y count=exact se degrada a estimated si contar
+        todo lo es.
+        """
+        db_session: AsyncSession = request.state.async_db_session
+        self.logger.info(f"Listando viajes: skip={skip}, limit={limit}, cursor={cursor is not None}, filtros={filters.as_dict()}, expand={sorted(expand)}, fields={fields}")
+
+        if expand and fields:
+            raise HTTPException(status_code=400, detail="Use fields o expand, no ambos")
+        validators, not_modified = await run_cache(self.cache, conditional_get, request, self.cache, *VIAJES_TABLES)
+        if not_modified is not None:
+            return not_modified
+
+        columns = None if expand else projected_columns(Viaje, fields)
+        stmt, keyset_columns, limit = self._list_statement(skip, limit, cursor, filters, columns)
+        count_base = self._count_base(filters)
+        count = await async_guard_list(db_session, self.cache, "viajes", stmt, count_base, count, guard_params(filters.as_dict(), skip, limit, cursor))
+        headers = {**validators, **await async_total_count(db_session, self.cache, "viajes", count, count_base, filters.as_dict())}
+
+        if expand:
+            viajes = (await db_session.scalars(stmt.options(*expand_options(expand)))).all()
+
+            token = next_cursor(viajes, keyset_columns, limit)
+            if token is not None:
+                response.headers[NEXT_CURSOR_HEADER] = token
+            response.headers.update(headers)
+            return [serialize_viaje(viaje, expand) for viaje in viajes]
+
+        rows = (await db_session.execute(stmt)).all()
+        return rows_response(rows, columns, next_cursor(rows, keyset_columns, limit), headers)
+
+    async def get(self, trip_id: str, request: Request, expand: FrozenSet[str] = Depends(parse_expand)):
+        db_session: AsyncSession = request.state.async_db_session
+        self.logger.info(f"Buscando viaje ID: {trip_id}")
+
+        if not expand:
+            version, cached = await run_cache(self.cache, get_versioned, self.cache, viaje_cache_key(trip_id), BY_ID_VERSION)
+            if cached is not None:
+                return cached
+
+        viaje = await db_session.get(Viaje, trip_id, options=expand_options(expand, single=True))
+
+        if not viaje:
+            return JSONResponse(
+                status_code=404, content={"error_description": "Viaje no encontrado"}
+            )
+        data = serialize_viaje(viaje, expand)
+        if not expand:
+            await run_cache(self.cache, set_versioned, self.cache, viaje_cache_key(trip_id), version, data)
+        return data
+
+    async def delete(self, trip_id: str, request: Request):
+        db_session: AsyncSession = request.state.async_db_session
+
+        # Los helpers síncronos de db/ se reutilizan con run_sync
+        if not await db_session.run_sync(lock_viajes, [trip_id]):
+            raise HTTPException(status_code=404, detail="Viaje no encontrado")
+        await db_session.run_sync(adjust_rollups, [trip_id], -1)
+        await db_session.run_sync(delete_viajes, [trip_id])
+
+        await run_cache(self.cache, invalidate, db_session, self.cache, viaje_cache_key(trip_id), pago_cache_key(trip_id))
+        await run_cache(self.cache, bump_data_version, db_session, self.cache, "viajes", "pagos")
+        return {"message": f"Viaje {trip_id} eliminado correctamente"}
+
+    async def create(self, request: Request, data: ViajeSchema):
+        """Crea un nuevo viaje en la BD."""
+        db_session: AsyncSession = request.state.async_db_session
+        self.logger.info(f"Creando nuevo viaje: {data.trip_id}")
+
+        new_viaje = Viaje(**data.model_dump())
+
+        try:
+            db_session.add(new_viaje)
+            await db_session.flush()
+            await db_session.run_sync(adjust_rollups, [new_viaje.trip_id], 1)
+            await run_cache(self.cache, invalidate, db_session, self.cache, viaje_cache_key(new_viaje.trip_id))
+            await run_cache(self.cache, bump_data_version, db_session, self.cache, "viajes")
+            return new_viaje
+        except Exception as e:
+            self.logger.error(f"Error al crear viaje: {e}")
+            raise HTTPException(status_code=400, detail="Error al crear el viaje. Verifique que el ID no exista.")
+
+    async def update(self, trip_id: str, request: Request, data: ViajeSchema):
+        """Actualiza un viaje existente."""
+        db_session: AsyncSession = request.state.async_db_session
+        self.logger.info(f"Actualizando viaje ID: {trip_id}")
+
+        viaje = await db_session.get(Viaje, trip_id, with_for_update=True, populate_existing=True)
+        if not viaje:
+            raise HTTPException(status_code=404, detail="Viaje no encontrado")
+
+        await db_session.run_sync(adjust_rollups, [trip_id], -1)
+
+        for key, value in data.model_dump(exclude_unset=True).items():
+            if key == "trip_id":
+                continue
+            if hasattr(viaje, key):
+                setattr(viaje, key, value)
+
+        await db_session.flush()
+        await db_session.run_sync(adjust_rollups, [trip_id], 1)
+        await run_cache(self.cache, invalidate, db_session, self.cache, viaje_cache_key(trip_id))
+        await run_cache(self.cache, bump_data_version, db_session, self.cache, "viajes")
+        return viaje
+
+
+# ==========================================
+# 2. ROUTER DE PAGOS (async)
+# ==========================================
+class AsyncPagosRouter(PagosRouter):
+
+    async def get_by_trip_id(self, trip_id: str, request: Request):
+        version, cached = await run_cache(self.cache, get_versioned, self.cache, pago_cache_key(trip_id), BY_ID_VERSION)
+        if cached is not None:
+            return cached
+
+        db_session: AsyncSession = request.state.async_db_session
+        pago = await db_session.get(Pago, trip_id)
+
+        if not pago:
+            raise HTTPException(status_code=404, detail="Pago no encontrado para este viaje")
+
+        data = PagoSchema.model_validate(pago, from_attributes=True).model_dump(mode="json")
+        await run_cache(self.cache, set_versioned, self.cache, pago_cache_key(trip_id), version, data)
+        return data
+
+    async def create(self, request: Request, data: PagoSchema):
+        """
+        Registra el pago de un viaje existente.
+        El trip_id dentro de 'data' debe existir previamente en la tabla 'viajes'.
+        """
+        db_session: AsyncSession = request.state.async_db_session
+        self.logger.info(f"Registrando pago para viaje ID: {data.trip_id}")
+
+        new_pago = Pago(**data.model_dump())
+        if not await db_session.run_sync(lock_viajes, [data.trip_id]):
+            raise HTTPException(status_code=400, detail="Error: Verifique que el trip_id exista en la tabla Viajes.")
+
+        try:
+            await db_session.run_sync(adjust_rollups, [data.trip_id], -1)
+            db_session.add(new_pago)
+            await db_session.flush()
+            await db_session.run_sync(adjust_rollups, [data.trip_id], 1)
+            await run_cache(self.cache, invalidate, db_session, self.cache, pago_cache_key(data.trip_id))
+            await run_cache(self.cache, bump_data_version, db_session, self.cache, "pagos")
+            return new_pago
+        except IntegrityError as e:
+            await db_session.rollback()
+            self.logger.error(f"Error de integridad al crear pago: {e}")
+            raise HTTPException(
+                status_code=400,
+                detail="Error: Verifique que el trip_id exista en la tabla Viajes y que no tenga ya un pago registrado."
+            )
+        except Exception as e:
+            await db_session.rollback()
+            self.logger.error(f"Error al crear pago: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def update(self, trip_id: str, request: Request, data: PagoSchema):
+        """Actualiza la información de un pago existente."""
+        db_session: AsyncSession = request.state.async_db_session
+        self.logger.info(f"Actualizando pago del viaje ID: {trip_id}")
+
+        pago = await db_session.run_sync(self._locked_pago, trip_id)
+        if not pago:
+            raise HTTPException(status_code=404, detail="Pago no encontrado")
+
+        await db_session.run_sync(adjust_rollups, [trip_id], -1)
+
+        for key, value in data.model_dump(exclude_unset=True).items():
+            if key == "trip_id":
+                continue
+            if hasattr(pago, key):
+                setattr(pago, key, value)
+
+        await db_session.flush()
+        await db_session.run_sync(adjust_rollups, [trip_id], 1)
+        await run_cache(self.cache, invalidate, db_session, self.cache, pago_cache_key(trip_id))
+        await run_cache(self.cache, bump_data_version, db_session, self.cache, "pagos")
+        return pago
+
+    async def delete(self, trip_id: str, request: Request):
+        """Elimina el registro de pago asociado a un viaje."""
+        db_session: AsyncSession = request.state.async_db_session
+        self.logger.info(f"Eliminando pago del viaje ID: {trip_id}")
+
+        pago = await db_session.run_sync(self._locked_pago, trip_id)
+        if not pago:
+            raise HTTPException(status_code=404, detail="Pago no encontrado")
+
+        await db_session.run_sync(adjust_rollups, [trip_id], -1)
+        await db_session.delete(pago)
+        await db_session.flush()
+        await db_session.run_sync(adjust_rollups, [trip_id], 1)
+        await run_cache(self.cache, invalidate, db_session, self.cache, pago_cache_key(trip_id))
+        await run_cache(self.cache, bump_data_version, db_session, self.cache, "pagos")
+        return {"message": f"Pago del viaje {trip_id} eliminado correctamente"}
+
+    async def list(
+        self,
+        request: Request,
+        response: Response,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: str = Query(default=None, description="Token de paginación devuelto en el header X-Next-Cursor (reemplaza a skip)"),
+        filters: PagoFilters = Depends(),
+        fields: str = Query(default=None, description="Columnas a devolver separadas por coma (p. ej. trip_id,trip_total)"),
+        count: str = Query(default="none", pattern="^(none|estimated|exact)$", description="Total en el header X-Total-Count: estimated (planner, casi gratis), exact (COUNT) o none"),
+    ):
+        """
+        Lista pagos con paginación y filtros por rango de monto.
+        Acepta skip (clientes anteriores) o cursor por trip_id. Igual que
+        en viajes, se leen solo columnas y se codifican sin Pydantic, y un
+        GET condicional responde 304 si pagos no cambió. El guard de costo
+        aplica igual que en viajes.
+        """
+        db_session: AsyncSession = request.state.async_db_session
+        self.logger.info(f"Listando pagos: skip={skip}, limit={limit}, cursor={cursor is not None}, filtros={filters.as_dict()}, fields={fields}")
+
+        validators, not_modified = await run_cache(self.cache, conditional_get, request, self.cache, *PAGOS_TABLES)
+        if not_modified is not None:
+            return not_modified
+        columns = projected_columns(Pago, fields)
+        stmt, keyset_columns, limit = self._list_statement(skip, limit, cursor, filters, columns)
+        count_base = filters.apply(select(Pago.trip_id))
+        count = await async_guard_list(db_session, self.cache, "pagos", stmt, count_base, count, guard_params(filters.as_dict(), skip, limit, cursor))
+        headers = {**validators, **await async_total_count(db_session, self.cache, "pagos", count, count_base, filters.as_dict())}
+        rows = (await db_session.execute(stmt)).all()
+        return rows_response(rows, columns, next_cursor(rows, keyset_columns, limit), headers)
+
+
+# ==========================================
+# 3. ROUTER DE COMMUNITY AREAS (async)
+# ==========================================
+class AsyncCommunityRouter(CommunityRouter):
+
+    async def list(self, request: Request, response: Response):
+        validators, not_modified = await run_cache(self.cache, conditional_get, request, self.cache, *COMMUNITIES_TABLES)
+        if not_modified is not None:
+            return not_modified
+        response.headers.update(validators)
+
+        cached = await run_cache(self.cache, self.cache.get, COMMUNITIES_CACHE_KEY)
+        if cached is not None:
+            return cached
+
+        db_session: AsyncSession = request.state.async_db_session
+        data = [
+            CommunitySchema.model_validate(area, from_attributes=True).model_dump(mode="json")
+            for area in (await db_session.scalars(select(CommunityArea))).all()
+        ]
+        await run_cache(self.cache, self.cache.set, COMMUNITIES_CACHE_KEY, data, CATALOG_TTL)
+        return data
+
+    async def get(self, community_id: int, request: Request):
+        cached = await run_cache(self.cache, self.cache.get, community_cache_key(community_id))
+        if cached is not None:
+            return cached
+
+        db_session: AsyncSession = request.state.async_db_session
+        area = await db_session.get(CommunityArea, community_id)
+
+        if not area:
+            raise HTTPException(status_code=404, detail="Area no encontrada")
+        data = CommunitySchema.model_validate(area, from_attributes=True).model_dump(mode="json")
+        await run_cache(self.cache, self.cache.set, community_cache_key(community_id), data, CATALOG_TTL)
+        return data
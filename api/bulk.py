@@ -0,0 +1,162 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from api.models import ViajeCompleto, BulkError
+
+# Máximo de filas aceptadas por request en POST /viajes/bulk
+MAX_BULK_ROWS = 100_000
+# Líneas que se validan y se copian a staging juntas mientras llega el cuerpo
+BULK_BATCH_LINES = 5_000
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+def parse_bulk(
+    fmt: str,
+    lines: Iterable[str],
+    valid_area_ids: Optional[Set[int]] = None,
+    first_line: int = 1,
+    seen: Optional[Dict[str, int]] = None,
+) -> Tuple[List[Tuple[int, ViajeCompleto]], List[BulkError]]:
+    """
+    Valida un lote NDJSON o CSV contra ViajeCompleto.
+    Las filas inválidas, con trip_id repetido dentro del lote o con zonas
+    que no existen en community_area se reportan con su número de línea
+    y no detienen el resto del lote (en la BD, una llave foránea rota
+    haría fallar el lote completo).
+
+    'seen' (trip_id -> línea) se comparte entre las partes de un mismo
+    lote para detectar duplicados entre ellas.
+
+    Devuelve las filas válidas junto con su número de línea.
+    """
+    rows: List[Tuple[int, ViajeCompleto]] = []
+    errors: List[BulkError] = []
+    seen = {} if seen is None else seen
+
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        # La línea 1 es el encabezado
+        records = (
+            (first_line + index + 1, {key: (value if value != "" else None) for key, value in record.items()})
+            for index, record in enumerate(reader)
+        )
+    else:
+        records = ((first_line + index, line) for index, line in enumerate(lines) if line.strip())
+
+    for line_number, record in records:
+        trip_id = None
+        try:
+            if isinstance(record, str):
+                record = json.loads(record)
+            if isinstance(record, dict):
+                trip_id = record.get("trip_id")
+            row = ViajeCompleto.model_validate(record)
+        except json.JSONDecodeError as e:
+            errors.append(BulkError(line=line_number, error=f"JSON inválido: {e.msg}"))
+            continue
+        except ValidationError as e:
+            errors.append(BulkError(line=line_number, trip_id=trip_id, error=_validation_message(e)))
+            continue
+
+        if valid_area_ids is not None:
+            unknown = [
+                area for area in (row.pickup_community_area, row.dropoff_community_area)
+                if area is not None and area not in valid_area_ids
+            ]
+            if unknown:
+                errors.append(BulkError(
+                    line=line_number,
+                    trip_id=row.trip_id,
+                    error=f"community_area inexistente: {', '.join(map(str, unknown))}",
+                ))
+                continue
+
+        if row.trip_id in seen:
+            errors.append(BulkError(line=line_number, trip_id=row.trip_id, error="trip_id duplicado en el lote"))
+            continue
+        seen[row.trip_id] = line_number
+        rows.append((line_number, row))
+
+    return rows, errors
+
+
+async def iter_line_batches(chunks: AsyncIterable[bytes], size: int = BULK_BATCH_LINES) -> AsyncIterator[List[str]]:
+    """
+    Parte el cuerpo del request en lotes de 'size' líneas a medida que
+    llega, sin juntarlo completo. Un carácter UTF-8 partido entre dos
+    chunks se decodifica entero.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    batch: List[str] = []
+    try:
+        async for chunk in chunks:
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                batch.append(line.rstrip("\r"))
+                if len(batch) >= size:
+                    yield batch
+                    batch = []
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="El cuerpo no es UTF-8 válido")
+    if pending.rstrip("\r"):
+        batch.append(pending.rstrip("\r"))
+    if batch:
+        yield batch
+
+
+class BulkStream:
+    """
+    Estado de un POST /viajes/bulk que se valida por partes: encabezado
+    CSV, siguiente número de línea, trip_id vistos (con su línea) y
+    errores acumulados. Las filas válidas de cada parte se copian a
+    staging y no se conservan.
+    """
+
+    def __init__(self, fmt: str, valid_area_ids: Optional[Set[int]] = None):
+        self.fmt = fmt
+        self.valid_area_ids = valid_area_ids
+        self.header: Optional[str] = None
+        self.next_line = 1
+        self.lines = 0
+        self.seen: Dict[str, int] = {}
+        self.errors: List[BulkError] = []
+
+    @property
+    def received(self) -> int:
+        return len(self.seen) + len(self.errors)
+
+    def feed(self, lines: List[str]) -> List[ViajeCompleto]:
+        """Valida la siguiente parte del cuerpo; devuelve sus filas válidas."""
+        self.lines += len(lines)
+        if self.lines > MAX_BULK_ROWS + 1:
+            raise HTTPException(status_code=413, detail=f"Máximo {MAX_BULK_ROWS} filas por lote")
+
+        if self.fmt == "csv" and self.header is None:
+            if not lines:
+                return []
+            # En CSV cada parte se valida con el encabezado al frente
+            self.header, lines = lines[0], lines[1:]
+            self.next_line = 2
+        if self.header is not None:
+            rows, errors = parse_bulk(self.fmt, [self.header] + lines, self.valid_area_ids, self.next_line - 1, self.seen)
+        else:
+            rows, errors = parse_bulk(self.fmt, lines, self.valid_area_ids, self.next_line, self.seen)
+
+        self.next_line += len(lines)
+        self.errors.extend(errors)
+        return [row for _, row in rows]
+
@@ -0,0 +1,279 @@
+import asyncio
+import hashlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from db.entities import CommunityArea, ResumenTaxis, ResumenViajes
+
+# --- GRÁFICAS DE "ERD y graficas/" GENERADAS EN EL SERVIDOR ---
+# Cada gráfica es una consulta sobre las tablas de resumen que devuelve un
+# dict serializable (etiquetas + series) y un render genérico con
+# matplotlib que corre en un pool de procesos, fuera del event loop.
+
+# Procesos para dibujar (CHARTS_WORKERS); matplotlib no libera el GIL
+DEFAULT_WORKERS = 2
+
+# Las imágenes se cachean por (gráfica, parámetros, versión de los datos);
+# el TTL solo libera memoria, una escritura cambia la versión
+CHART_TTL = 3600
+
+# Intervalos de SQL/4_Consultas.sql (Consulta 1) como rangos de horas
+INTERVALOS = [
+    ("Madrugada (00:00 - 05:59)", range(0, 6)),
+    ("Mañana (06:00 - 11:59)", range(6, 12)),
+    ("Tarde (12:00 - 17:59)", range(12, 18)),
+    ("Noche (18:00 - 23:59)", range(18, 24)),
+]
+# Vida nocturna = noche + madrugada
+HORAS_NOCTURNAS = set(range(18, 24)) | set(range(0, 6))
+
+
+def _chart(titulo: str, tipo: str, etiquetas: list, series: List[Tuple[str, list]], eje_y: str) -> dict:
+    return {
+        "titulo": titulo,
+        "tipo": tipo,
+        "etiquetas": [str(etiqueta) for etiqueta in etiquetas],
+        "series": [{"nombre": nombre, "valores": [None if v is None else float(v) for v in valores]} for nombre, valores in series],
+        "eje_y": eje_y,
+    }
+
+
+def _ratio(numerator, denominator):
+    return func.sum(numerator) / func.nullif(func.sum(denominator), 0)
+
+
+def _por_anio(query, anio: Optional[int]):
+    return query if anio is None else query.where(ResumenViajes.anio == anio)
+
+
+def _viajes_por_hora(db_session: Session, anio: Optional[int]) -> Dict[int, List[int]]:
+    """{año: [viajes de la hora 0 ... 23]}"""
+    rows = db_session.execute(
+        _por_anio(select(ResumenViajes.anio, ResumenViajes.hora, func.sum(ResumenViajes.viajes)), anio)
+        .group_by(ResumenViajes.anio, ResumenViajes.hora)
+    ).all()
+    por_anio: Dict[int, List[int]] = {}
+    for row_anio, hora, viajes in rows:
+        por_anio.setdefault(row_anio, [0] * 24)[hora] += int(viajes or 0)
+    return dict(sorted(por_anio.items()))
+
+
+def _porcentaje(parte: float, total: float) -> float:
+    return round(parte * 100.0 / total, 2) if total else 0.0
+
+
+def horario_agrupado(db_session: Session, anio: Optional[int], top: int) -> dict:
+    por_anio = _viajes_por_hora(db_session, anio)
+    return _chart(
+        "Viajes por intervalo del día", "barras",
+        [nombre for nombre, _ in INTERVALOS],
+        [
+            (str(year), [_porcentaje(sum(horas[h] for h in rango), sum(horas)) for _, rango in INTERVALOS])
+            for year, horas in por_anio.items()
+        ],
+        "% de los viajes del año",
+    )
+
+
+def horario_completo(db_session: Session, anio: Optional[int], top: int) -> dict:
+    por_anio = _viajes_por_hora(db_session, anio)
+    return _chart(
+        "Viajes por hora del día", "lineas",
+        [f"{hora:02d}:00" for hora in range(24)],
+        [(str(year), [_porcentaje(viajes, sum(horas)) for viajes in horas]) for year, horas in por_anio.items()],
+        "% de los viajes del año",
+    )
+
+
+def vida_nocturna(db_session: Session, anio: Optional[int], top: int) -> dict:
+    por_anio = _viajes_por_hora(db_session, anio)
+    return _chart(
+        "Viajes de noche y madrugada (18:00 - 05:59)", "barras",
+        list(por_anio),
+        [("Noche + madrugada", [_porcentaje(sum(horas[h] for h in HORAS_NOCTURNAS), sum(horas)) for horas in por_anio.values()])],
+        "% de los viajes del año",
+    )
+
+
+def _mensual(db_session: Session, anio: Optional[int], metrica, titulo: str, eje_y: str) -> dict:
+    rows = db_session.execute(
+        _por_anio(select(ResumenViajes.anio, ResumenViajes.mes, metrica), anio)
+        .group_by(ResumenViajes.anio, ResumenViajes.mes)
+        .having(func.sum(ResumenViajes.viajes) > 0)
+        .order_by(ResumenViajes.anio, ResumenViajes.mes)
+    ).all()
+    return _chart(titulo, "lineas", [f"{row[0]}-{row[1]:02d}" for row in rows], [(titulo, [row[2] for row in rows])], eje_y)
+
+
+def tarifa_por_milla(db_session: Session, anio: Optional[int], top: int) -> dict:
+    return _mensual(
+        db_session, anio, _ratio(ResumenViajes.suma_trip_total, ResumenViajes.suma_millas),
+        "Precio promedio por milla", "USD por milla",
+    )
+
+
+def distancia_promedio(db_session: Session, anio: Optional[int], top: int) -> dict:
+    return _mensual(
+        db_session, anio, _ratio(ResumenViajes.suma_millas, ResumenViajes.viajes_con_millas),
+        "Distancia promedio", "millas",
+    )
+
+
+def _por_zona(db_session: Session, anio: Optional[int], zona, metrica, descending: bool, top: int):
+    query = (
+        _por_anio(select(CommunityArea.community, metrica.label("valor")).select_from(ResumenViajes), anio)
+        .join(CommunityArea, CommunityArea.community_id == zona)
+        .group_by(CommunityArea.community)
+        .having(metrica.is_not(None))
+        .order_by(metrica.desc() if descending else metrica.asc())
+        .limit(top)
+    )
+    return db_session.execute(query).all()
+
+
+def precio_promedio_zona(db_session: Session, anio: Optional[int], top: int) -> dict:
+    rows = _por_zona(
+        db_session, anio, ResumenViajes.pickup_community_area,
+        _ratio(ResumenViajes.suma_trip_total, ResumenViajes.suma_millas), True, top,
+    )
+    return _chart(f"Zonas de origen con mayor precio por milla (top {top})", "barras_h", [r[0] for r in rows], [("USD por milla", [r[1] for r in rows])], "USD por milla")
+
+
+def _propinas_zona(db_session: Session, anio: Optional[int], top: int, descending: bool) -> dict:
+    rows = _por_zona(db_session, anio, ResumenViajes.dropoff_community_area, func.sum(ResumenViajes.suma_tips), descending, top)
+    titulo = "mayores" if descending else "menores"
+    return _chart(f"Zonas de destino con {titulo} propinas (top {top})", "barras_h", [r[0] for r in rows], [("Propinas", [r[1] for r in rows])], "USD")
+
+
+def mayores_propinas_zona(db_session: Session, anio: Optional[int], top: int) -> dict:
+    return _propinas_zona(db_session, anio, top, True)
+
+
+def menores_propinas_zona(db_session: Session, anio: Optional[int], top: int) -> dict:
+    return _propinas_zona(db_session, anio, top, False)
+
+
+def _por_taxi(db_session: Session, metrica, top: int):
+    # resumen_taxis no tiene dimensión de tiempo: anio no aplica
+    return db_session.execute(
+        select(ResumenTaxis.taxi_id, metrica)
+        .where(ResumenTaxis.viajes > 0)
+        .order_by(metrica.desc(), ResumenTaxis.taxi_id)
+        .limit(top)
+    ).all()
+
+
+def viajes_por_taxi(db_session: Session, anio: Optional[int], top: int) -> dict:
+    rows = _por_taxi(db_session, ResumenTaxis.viajes, top)
+    # Los taxi_id son hashes largos; se muestra el prefijo
+    return _chart(f"Taxis con más viajes (top {top})", "barras_h", [r[0][:10] for r in rows], [("Viajes", [r[1] for r in rows])], "viajes")
+
+
+def ingreso_por_taxi(db_session: Session, anio: Optional[int], top: int) -> dict:
+    rows = _por_taxi(db_session, ResumenTaxis.suma_trip_total, top)
+    return _chart(f"Taxis con más ingresos (top {top})", "barras_h", [r[0][:10] for r in rows], [("Ingresos", [r[1] for r in rows])], "USD")
+
+
+# Nombre (el de la imagen en "ERD y graficas/") -> consulta
+CHARTS: Dict[str, Callable[[Session, Optional[int], int], dict]] = {
+    "viajes_por_horario_agrupado": horario_agrupado,
+    "viajes_por_horario_completo": horario_completo,
+    "vida_nocturna": vida_nocturna,
+    "tarifa_promedio_por_milla": tarifa_por_milla,
+    "distancia_promedio": distancia_promedio,
+    "precio_promedio_zona": precio_promedio_zona,
+    "mayores_propinas_zona": mayores_propinas_zona,
+    "menores_propinas_zona": menores_propinas_zona,
+    "viajes_por_taxi": viajes_por_taxi,
+    "ingreso_por_taxi": ingreso_por_taxi,
+}
+
+
+def chart_cache_key(name: str, params: dict, version: str) -> str:
+    return f"chart:{name}:{json.dumps(params, sort_keys=True)}:{version}"
+
+
+def chart_etag(name: str, params: dict, version: str) -> str:
+    digest = hashlib.sha1(chart_cache_key(name, params, version).encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def charts_available() -> bool:
+    """matplotlib solo se instala con el extra "charts"."""
+    return importlib.util.find_spec("matplotlib") is not None
+
+
+def render_png(data: dict) -> bytes:
+    """Dibuja el dict de una consulta de CHARTS. Corre en el pool de procesos."""
+    # Figure sin pyplot: no hay estado global ni backend interactivo
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 6), dpi=100)
+    axes = figure.add_subplot()
+    etiquetas, series = data["etiquetas"], data["series"]
+
+    def valores(serie):
+        return [0 if value is None else value for value in serie["valores"]]
+
+    if data["tipo"] == "lineas":
+        for serie in series:
+            axes.plot(etiquetas, valores(serie), marker="o", markersize=3, label=serie["nombre"])
+        # Con muchas etiquetas (meses) se muestra una de cada N
+        step = max(1, len(etiquetas) // 24)
+        axes.set_xticks(range(0, len(etiquetas), step), etiquetas[::step], rotation=45, ha="right")
+        axes.set_ylabel(data["eje_y"])
+    elif data["tipo"] == "barras_h":
+        axes.barh(etiquetas[::-1], valores(series[0])[::-1])
+        axes.set_xlabel(data["eje_y"])
+    else:
+        width = 0.8 / max(1, len(series))
+        for index, serie in enumerate(series):
+            axes.bar([x + index * width for x in range(len(etiquetas))], valores(serie), width, label=serie["nombre"])
+        axes.set_xticks([x + width * (len(series) - 1) / 2 for x in range(len(etiquetas))], etiquetas)
+        axes.set_ylabel(data["eje_y"])
+
+    if len(series) > 1:
+        axes.legend()
+    axes.set_title(data["titulo"])
+    axes.grid(axis="y" if data["tipo"] != "barras_h" else "x", alpha=0.3)
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png", bbox_inches="tight")
+    return buffer.getvalue()
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def render_pool() -> ProcessPoolExecutor:
+    """Pool creado con el primer render; "spawn" para no hacer fork de un proceso con hilos."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=int(os.getenv("CHARTS_WORKERS", DEFAULT_WORKERS)),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+async def render_chart(data: dict) -> bytes:
+    return await asyncio.get_running_loop().run_in_executor(render_pool(), render_png, data)
+
+
+def shutdown_render_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
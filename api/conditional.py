@@ -0,0 +1,68 @@
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from util.cache import Cache, table_version
+
+# --- GET CONDICIONAL (ETag / Last-Modified) ---
+# Los validadores de un listado salen de la URL y de las versiones de las
+# tablas que lee (util/cache.py), sin tocar la BD: un 304 no ejecuta la
+# consulta. Cada escritura de la API cambia la versión de su tabla.
+# Las versiones tienen que ser las mismas en todos los workers: con más de
+# uno, main.py no arranca sin un cache compartido (CACHE_URL).
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match con comparación débil (se ignora el W/), o "*"."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in header.split(",")}
+
+
+def _modified_since(request: Request, modified: int) -> bool:
+    try:
+        since = parsedate_to_datetime(request.headers["if-modified-since"])
+    except (TypeError, ValueError):
+        return True
+    return modified > since.timestamp()
+
+
+def conditional_get(request: Request, cache: Cache, *tables: str) -> Tuple[Dict[str, str], Optional[Response]]:
+    """
+    Headers de validación del listado y, si el cliente ya tiene esa
+    versión, la respuesta 304 lista para devolver (None si hay que
+    ejecutar la consulta).
+
+    El ETag es débil porque el cuerpo puede ir comprimido
+    (util/compression.py). If-None-Match tiene prioridad; If-Modified-Since
+    solo se usa sin él y tiene resolución de segundos.
+    """
+    versions = [table_version(cache, table) for table in tables]
+    query = sorted(request.query_params.multi_items())
+    raw = "|".join([request.url.path, repr(query)] + [version["version"] for version in versions])
+    modified = max(version["modified"] for version in versions)
+
+    headers = {
+        "ETag": f'W/"{hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]}"',
+        "Last-Modified": formatdate(modified, usegmt=True),
+        # El cliente puede guardar la respuesta pero debe revalidarla
+        "Cache-Control": "no-cache",
+    }
+
+    if "if-none-match" in request.headers:
+        fresh = etag_matches(request, headers["ETag"])
+    elif "if-modified-since" in request.headers:
+        fresh = not _modified_since(request, modified)
+    else:
+        fresh = False
+    return headers, Response(status_code=304, headers=headers) if fresh else None
@@ -0,0 +1,99 @@
+import json
+import os
+
+from fastapi import HTTPException
+
+from api.counting import async_explain_plan, count_statement, explain_plan, explain_statement
+from util.cache import Cache, run_cache
+
+# --- GUARD DE COSTO DE LOS LISTADOS ---
+# Antes de ejecutar una página de /viajes o /pagos se pide al planner su
+# costo estimado (EXPLAIN, sin leer la tabla). Las combinaciones que no
+# seleccionan nada (p. ej. trip_total>=0 con skip=5000000) se rechazan con
+# 400 en lugar de ocupar una conexión hasta el statement_timeout.
+# El costo está en las unidades del planner de Postgres (seq_page_cost=1);
+# 0 desactiva el límite. Solo Postgres: en otros motores no hay guard.
+DEFAULT_MAX_LIST_COST = 1_000_000
+# ?count=exact arriba de este costo se degrada a estimated
+DEFAULT_MAX_COUNT_COST = 250_000
+
+# El veredicto de una combinación de filtros se reutiliza este tiempo
+GUARD_TTL = 300
+
+
+def guard_cache_key(name: str, params: dict) -> str:
+    return f"cost:{name}:{json.dumps(params, sort_keys=True, default=str)}"
+
+
+def guard_params(filters: dict, skip: int, limit: int, cursor: str) -> dict:
+    """Lo que define el costo de una página: llave del veredicto cacheado."""
+    return {**filters, "skip": skip, "limit": limit, "cursor": cursor is not None}
+
+
+def plan_cost(plan) -> float:
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return float(plan[0]["Plan"]["Total Cost"])
+
+
+def _limits():
+    return (
+        float(os.getenv("LIST_MAX_COST", DEFAULT_MAX_LIST_COST)),
+        float(os.getenv("COUNT_MAX_COST", DEFAULT_MAX_COUNT_COST)),
+    )
+
+
+def _verdict(name: str, costs: dict, count: str) -> str:
+    """Lanza 400 si la página es demasiado cara; devuelve el modo de conteo a usar."""
+    max_list_cost, max_count_cost = _limits()
+    if max_list_cost and costs["page"] > max_list_cost:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Consulta de {name} demasiado costosa (costo estimado {costs['page']:,.0f}, "
+                f"máximo {max_list_cost:,.0f}). Agregue filtros más selectivos "
+                "(fechas, zona, taxi) o pagine con cursor en lugar de skip"
+            ),
+        )
+    if count == "exact" and max_count_cost and costs["count"] > max_count_cost:
+        return "estimated"
+    return count
+
+
+def _pending(cache: Cache, name: str, count: str, params: dict):
+    key = guard_cache_key(name, {**params, "count": count == "exact"})
+    return key, cache.get(key)
+
+
+def guard_list(db_session, cache: Cache, name: str, page, count_base, count: str, params: dict) -> str:
+    """
+    Revisa con EXPLAIN la página (y el COUNT si se pidió count=exact)
+    antes de ejecutarla. Devuelve el modo de conteo a usar: exact se
+    degrada a estimated si contar todo es demasiado caro.
+    """
+    dialect = db_session.get_bind().dialect
+    if dialect.name != "postgresql":
+        return count
+
+    key, costs = _pending(cache, name, count, params)
+    if costs is None:
+        costs = {"page": plan_cost(explain_plan(db_session, explain_statement(page, dialect))), "count": None}
+        if count == "exact":
+            costs["count"] = plan_cost(explain_plan(db_session, explain_statement(count_statement(count_base), dialect)))
+        cache.set(key, costs, ttl=GUARD_TTL)
+    return _verdict(name, costs, count)
+
+
+async def async_guard_list(db_session, cache: Cache, name: str, page, count_base, count: str, params: dict) -> str:
+    """Igual que guard_list con AsyncSession."""
+    dialect = db_session.bind.dialect
+    if dialect.name != "postgresql":
+        return count
+
+    key, costs = await run_cache(cache, _pending, cache, name, count, params)
+    if costs is None:
+        costs = {"page": plan_cost(await async_explain_plan(db_session, explain_statement(page, dialect))), "count": None}
+        if count == "exact":
+            costs["count"] = plan_cost(await async_explain_plan(db_session, explain_statement(count_statement(count_base), dialect)))
+        await run_cache(cache, cache.set, key, costs, GUARD_TTL)
+    return _verdict(name, costs, count)
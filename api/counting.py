@@ -0,0 +1,104 @@
+import json
+from typing import Dict, Optional
+
+from sqlalchemy import func, select
+
+from util.cache import Cache, run_cache
+
+# Headers con el total de filas que cumplen los filtros (?count=)
+TOTAL_COUNT_HEADER = "X-Total-Count"
+COUNT_MODE_HEADER = "X-Total-Count-Mode"
+
+COUNT_MODES = ("none", "estimated", "exact")
+
+# Un conteo de la misma combinación de filtros se reutiliza este tiempo;
+# no se invalida con las escrituras (es un total aproximado para paginar)
+COUNT_TTL = 300
+
+
+def count_cache_key(name: str, mode: str, filters: dict) -> str:
+    return f"count:{name}:{mode}:{json.dumps(filters, sort_keys=True, default=str)}"
+
+
+def count_statement(base):
+    """SELECT count(*) sobre el SELECT filtrado, sin orden ni paginación."""
+    return select(func.count()).select_from(base.subquery())
+
+
+def explain_statement(base, dialect) -> Optional[str]:
+    """
+    SQL del EXPLAIN del SELECT filtrado: el planner estima las filas con
+    las estadísticas de ANALYZE sin leer la tabla. Los valores van como
+    literales porque EXPLAIN no se puede preparar (asyncpg); por eso se
+    ejecuta con explain_plan y no con text(), que volvería a leer un
+    ":nombre" dentro de un literal (p. ej. taxi_id="x :y") como parámetro.
+    Solo Postgres; en otros motores se cuenta exacto.
+    """
+    if dialect.name != "postgresql":
+        return None
+    compiled = base.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    return f"EXPLAIN (FORMAT JSON) {compiled}"
+
+
+def explain_plan(db_session, explain: str):
+    """Plan JSON de explain_statement, con el SQL tal cual hacia el driver."""
+    return db_session.connection().exec_driver_sql(explain).scalar()
+
+
+async def async_explain_plan(db_session, explain: str):
+    """Igual que explain_plan con AsyncSession."""
+    connection = await db_session.connection()
+    return (await connection.exec_driver_sql(explain)).scalar()
+
+
+def plan_rows(plan) -> int:
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_headers(total: Optional[int], mode: str) -> Dict[str, str]:
+    if total is None:
+        return {}
+    return {TOTAL_COUNT_HEADER: str(total), COUNT_MODE_HEADER: mode}
+
+
+def total_count(db_session, cache: Cache, name: str, mode: str, base, filters: dict) -> Dict[str, str]:
+    """
+    Total para ?count=estimated|exact como headers de respuesta (vacío con
+    none). El resultado se cachea por combinación de filtros.
+    """
+    if mode == "none":
+        return {}
+    key = count_cache_key(name, mode, filters)
+    cached = cache.get(key)
+    if cached is not None:
+        return count_headers(cached["total"], cached["mode"])
+
+    explain = explain_statement(base, db_session.get_bind().dialect) if mode == "estimated" else None
+    if explain is not None:
+        total = plan_rows(explain_plan(db_session, explain))
+    else:
+        total, mode = db_session.execute(count_statement(base)).scalar(), "exact"
+
+    cache.set(key, {"total": total, "mode": mode}, ttl=COUNT_TTL)
+    return count_headers(total, mode)
+
+
+async def async_total_count(db_session, cache: Cache, name: str, mode: str, base, filters: dict) -> Dict[str, str]:
+    """Igual que total_count con AsyncSession."""
+    if mode == "none":
+        return {}
+    key = count_cache_key(name, mode, filters)
+    cached = await run_cache(cache, cache.get, key)
+    if cached is not None:
+        return count_headers(cached["total"], cached["mode"])
+
+    explain = explain_statement(base, db_session.bind.dialect) if mode == "estimated" else None
+    if explain is not None:
+        total = plan_rows(await async_explain_plan(db_session, explain))
+    else:
+        total, mode = (await db_session.execute(count_statement(base))).scalar(), "exact"
+
+    await run_cache(cache, cache.set, key, {"total": total, "mode": mode}, COUNT_TTL)
+    return count_headers(total, mode)
@@ -0,0 +1,84 @@
+from typing import FrozenSet, List
+
+from fastapi import HTTPException, Query
+from sqlalchemy.orm import joinedload, selectinload
+
+from api.models import (
+    Viaje as ViajeSchema,
+    Pago as PagoSchema,
+    CiudadViaje as CiudadSchema,
+    CommunityArea as CommunitySchema,
+)
+from db.entities import Viaje, CiudadViaje
+
+# Relaciones que se pueden pedir con ?expand=pago,ciudad,areas
+EXPAND_OPTIONS = ("pago", "ciudad", "areas")
+
+
+def parse_expand(
+    expand: str = Query(
+        default=None,
+        description="Relaciones a incluir separadas por coma: pago, ciudad, areas (areas incluye ciudad)",
+    ),
+) -> FrozenSet[str]:
+    """Dependencia que valida ?expand= y devuelve las relaciones pedidas."""
+    if not expand:
+        return frozenset()
+
+    requested = {item.strip() for item in expand.split(",") if item.strip()}
+    unknown = requested - set(EXPAND_OPTIONS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"expand inválido: {', '.join(sorted(unknown))}. Opciones: {', '.join(EXPAND_OPTIONS)}",
+        )
+    # Las zonas cuelgan de ciudad_viaje
+    if "areas" in requested:
+        requested.add("ciudad")
+    return frozenset(requested)
+
+
+def expand_options(expand: FrozenSet[str], single: bool = False) -> List:
+    """
+    Estrategias de carga para las relaciones pedidas. Para un solo viaje
+    todo va en un JOIN (una sentencia); para listados se usa selectinload,
+    que agrega una sentencia por relación sin importar el tamaño de la
+    página y no obliga a envolver el SELECT paginado en una subconsulta.
+    Nunca queda una relación en carga perezosa (N+1).
+    """
+    load = joinedload if single else selectinload
+    options = []
+    if "pago" in expand:
+        options.append(load(Viaje.pago))
+    if "ciudad" in expand:
+        ciudad = load(Viaje.ciudad_info)
+        if "areas" in expand:
+            # El catálogo es chico; se une en la misma sentencia de ciudad_viaje
+            ciudad = ciudad.options(
+                joinedload(CiudadViaje.pickup_area_obj),
+                joinedload(CiudadViaje.dropoff_area_obj),
+            )
+        options.append(ciudad)
+    return options
+
+
+def _dump(schema, obj):
+    return None if obj is None else schema.model_validate(obj, from_attributes=True).model_dump(mode="json")
+
+
+def serialize_viaje(viaje: Viaje, expand: FrozenSet[str]) -> dict:
+    """
+    Convierte un viaje (con sus relaciones ya cargadas) a dict. Solo se
+    agregan las llaves pedidas, así la respuesta sin expand es la misma
+    de siempre.
+    """
+    data = _dump(ViajeSchema, viaje)
+    if "pago" in expand:
+        data["pago"] = _dump(PagoSchema, viaje.pago)
+    if "ciudad" in expand:
+        ciudad = _dump(CiudadSchema, viaje.ciudad_info)
+        if ciudad is not None and "areas" in expand:
+            ciudad["pickup_area"] = _dump(CommunitySchema, viaje.ciudad_info.pickup_area_obj)
+            ciudad["dropoff_area"] = _dump(CommunitySchema, viaje.ciudad_info.dropoff_area_obj)
+        data["ciudad"] = ciudad
+    return data
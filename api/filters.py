@@ -0,0 +1,107 @@
+from fastapi import Query
+
+from db.entities import Viaje, Pago, CiudadViaje
+
+
+class ViajeFilters:
+    """
+    Filtros compartidos por los endpoints que consultan viajes
+    (listado, exportación, etc.). Se inyecta con Depends() para que
+    todos acepten exactamente los mismos parámetros.
+    """
+
+    def __init__(
+        self,
+        taxi_id: str = Query(default=None, description="Filtrar por taxi"),
+        pickup_community_id: int = Query(default=None, ge=1, description="Filtrar por zona de Recogida"),
+        dropoff_community_id: int = Query(default=None, ge=1, description="Filtrar por zona de Llegada"),
+        trip_miles_min: int = Query(default=None, ge=0, description="Distancia minima del viaje"),
+        trip_miles_max: int = Query(default=None, ge=0, description="Distancia maxima del viaje"),
+        trip_start_after: str = Query(default=None, description="Filtrar viajes que iniciaron después de esta fecha (YYYY-MM-DD)"),
+        trip_end_before: str = Query(default=None, description="Filtrar viajes que terminaron antes de esta fecha (YYYY-MM-DD)"),
+        trip_total: float = Query(default=None, ge=0, description="Filtrar por costo total minimo del viaje(propina incluida)"),
+    ):
+        self.taxi_id = taxi_id
+        self.pickup_community_id = pickup_community_id
+        self.dropoff_community_id = dropoff_community_id
+        self.trip_miles_min = trip_miles_min
+        self.trip_miles_max = trip_miles_max
+        self.trip_start_after = trip_start_after
+        self.trip_end_before = trip_end_before
+        self.trip_total = trip_total
+
+    @property
+    def orders_by_start(self) -> bool:
+        """
+        Con trip_start_after el listado se pagina por (trip_start_timestamp,
+        trip_id) para aprovechar el rango. Ese filtro ya deja fuera los
+        viajes sin fecha de inicio, que no tendrían lugar en la llave;
+        trip_end_before solo no cambia el orden ni descarta esos viajes.
+        """
+        return self.trip_start_after is not None
+
+    def apply(self, query, joined: frozenset = frozenset()):
+        """
+        Aplica los filtros a un Query o Select que parte de Viaje.
+        'joined' indica las entidades que ya vienen unidas en la consulta
+        para no repetir el JOIN.
+        """
+        if self.taxi_id is not None:
+            query = query.filter(Viaje.taxi_id == self.taxi_id)
+
+        if self.pickup_community_id is not None or self.dropoff_community_id is not None:
+            if CiudadViaje not in joined:
+                query = query.join(CiudadViaje, Viaje.trip_id == CiudadViaje.trip_id)
+
+        if self.pickup_community_id is not None:
+            query = query.filter(CiudadViaje.pickup_community_area == self.pickup_community_id)
+
+        if self.dropoff_community_id is not None:
+            query = query.filter(CiudadViaje.dropoff_community_area == self.dropoff_community_id)
+
+        if self.trip_miles_min is not None:
+            query = query.filter(Viaje.trip_miles >= self.trip_miles_min)
+
+        if self.trip_miles_max is not None:
+            query = query.filter(Viaje.trip_miles <= self.trip_miles_max)
+
+        if self.trip_start_after is not None:
+            query = query.filter(Viaje.trip_start_timestamp >= self.trip_start_after)
+
+        if self.trip_end_before is not None:
+            query = query.filter(Viaje.trip_end_timestamp <= self.trip_end_before)
+
+        if self.trip_total is not None:
+            if Pago not in joined:
+                query = query.join(Pago, Viaje.trip_id == Pago.trip_id)
+            query = query.filter(Pago.trip_total >= self.trip_total)
+
+        return query
+
+    def as_dict(self) -> dict:
+        """Filtros activos, útil para logs."""
+        return {key: value for key, value in vars(self).items() if value is not None}
+
+
+class PagoFilters:
+    """Filtros por rango de monto para los endpoints de pagos."""
+
+    def __init__(
+        self,
+        min_total: float = Query(default=None, ge=0, description="Filtrar pagos mayores o iguales a esta cantidad"),
+        max_total: float = Query(default=None, ge=0, description="Filtrar pagos menores o iguales a esta cantidad"),
+    ):
+        self.min_total = min_total
+        self.max_total = max_total
+
+    def apply(self, query):
+        if self.min_total is not None:
+            query = query.filter(Pago.trip_total >= self.min_total)
+
+        if self.max_total is not None:
+            query = query.filter(Pago.trip_total <= self.max_total)
+
+        return query
+
+    def as_dict(self) -> dict:
+        return {key: value for key, value in vars(self).items() if value is not None}
@@ -0,0 +1,70 @@
+import json
+from typing import Iterable, Iterator, List, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Text, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from api.streaming import iter_ndjson
+from util.serialization import json_default
+
+# Máximo de IDs por request en POST /viajes/lookup y /pagos/lookup
+MAX_LOOKUP_IDS = 50_000
+
+# IDs por consulta. Cada chunk viaja como un solo parámetro (arreglo), así
+# Postgres reutiliza el mismo plan sin importar cuántos IDs traiga
+LOOKUP_CHUNK_SIZE = 5_000
+
+
+def unique_ids(ids: List[str]) -> List[str]:
+    """Quita repetidos conservando el orden; más de MAX_LOOKUP_IDS es 413."""
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_LOOKUP_IDS:
+        raise HTTPException(status_code=413, detail=f"Máximo {MAX_LOOKUP_IDS} IDs por request")
+    return ids
+
+
+def lookup_columns(entity) -> list:
+    """Columnas de la tabla en el orden del schema de respuesta."""
+    return list(entity.__table__.columns)
+
+
+def lookup_statement(entity, ids: List[str]):
+    """SELECT ... WHERE trip_id = ANY(:ids) para un chunk de IDs."""
+    return select(*lookup_columns(entity)).where(
+        entity.trip_id == any_(bindparam("ids", ids, type_=ARRAY(Text)))
+    )
+
+
+def lookup_chunks(db_session: Session, entity, ids: List[str]) -> Iterator[Tuple[list, List[str]]]:
+    """Por cada chunk devuelve (filas encontradas, IDs que no existen)."""
+    for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+        chunk = ids[start:start + LOOKUP_CHUNK_SIZE]
+        rows = db_session.execute(lookup_statement(entity, chunk)).all()
+        found = {row.trip_id for row in rows}
+        yield rows, [trip_id for trip_id in chunk if trip_id not in found]
+
+
+def lookup_result(columns: List[str], chunks: Iterable[Tuple[list, List[str]]]) -> dict:
+    found, missing = [], []
+    for rows, chunk_missing in chunks:
+        found.extend(dict(zip(columns, row)) for row in rows)
+        missing.extend(chunk_missing)
+    return {"found": found, "missing": missing}
+
+
+def iter_lookup_ndjson(columns: List[str], chunks: Iterable[Tuple[list, List[str]]]) -> Iterator[bytes]:
+    """
+    Una línea JSON por registro encontrado, a medida que sale cada chunk.
+    La última línea es {"missing": [...]} con los IDs que no existen.
+    """
+    missing = []
+
+    def rows():
+        for found, chunk_missing in chunks:
+            missing.extend(chunk_missing)
+            yield from found
+
+    yield from iter_ndjson(columns, rows())
+    yield (json.dumps({"missing": missing}, default=json_default) + "\n").encode()
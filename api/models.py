@@ -1,15 +1,13 @@
-from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel
+from datetime import date, datetime
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict
 
 # --- Modelo para la tabla community_area ---
 class CommunityArea(BaseModel):
     community_id: int
     community: Optional[str] = None
 
-    class Config:
-        orm_mode = True
-        title = "CommunityArea"
+    model_config = ConfigDict(from_attributes=True, title="CommunityArea")
 
 # --- Modelo para la tabla pagos ---
 class Pago(BaseModel):
@@ -20,9 +18,7 @@ class Pago(BaseModel):
     extras: Optional[float] = 0.0
     trip_total: Optional[float] = 0.0
 
-    class Config:
-        orm_mode = True
-        title = "Pago"
+    model_config = ConfigDict(from_attributes=True, title="Pago")
 
 # --- Modelo para la tabla ciudad_viaje ---
 class CiudadViaje(BaseModel):
@@ -30,9 +26,7 @@ class CiudadViaje(BaseModel):
     pickup_community_area: Optional[int] = None
     dropoff_community_area: Optional[int] = None
 
-    class Config:
-        orm_mode = True
-        title = "CiudadViaje"
+    model_config = ConfigDict(from_attributes=True, title="CiudadViaje")
 
 # --- Modelo para la tabla viajes ---
 class Viaje(BaseModel):
@@ -44,6 +38,162 @@ class Viaje(BaseModel):
 
  
 
-    class Config:
-        orm_mode = True
-        title = "Viaje"
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True, title="Viaje")
+
+# --- Modelos para ?expand= en /viajes ---
+class CiudadViajeExpandida(CiudadViaje):
+    pickup_area: Optional[CommunityArea] = None
+    dropoff_area: Optional[CommunityArea] = None
+
+    model_config = ConfigDict(title="CiudadViajeExpandida")
+
+class ViajeExpandido(Viaje):
+    # Solo aparecen en la respuesta si se pidieron (response_model_exclude_unset)
+    pago: Optional[Pago] = None
+    ciudad: Optional[CiudadViajeExpandida] = None
+
+    model_config = ConfigDict(title="ViajeExpandido")
+
+# --- Modelo para la carga masiva (viaje + pago + zonas en una fila) ---
+class ViajeCompleto(BaseModel):
+    trip_id: str
+    taxi_id: Optional[str] = None
+    trip_start_timestamp: Optional[datetime] = None
+    trip_end_timestamp: Optional[datetime] = None
+    trip_miles: Optional[float] = None
+
+    fare: Optional[float] = 0.0
+    tips: Optional[float] = 0.0
+    tolls: Optional[float] = 0.0
+    extras: Optional[float] = 0.0
+    trip_total: Optional[float] = 0.0
+
+    pickup_community_area: Optional[int] = None
+    dropoff_community_area: Optional[int] = None
+
+    model_config = ConfigDict(title="ViajeCompleto")
+
+# --- Respuesta de la carga masiva ---
+class BulkError(BaseModel):
+    line: int
+    trip_id: Optional[str] = None
+    error: str
+
+class BulkResult(BaseModel):
+    received: int
+    inserted: int
+    errors: List[BulkError] = []
+
+# --- Cambios por filtro (DELETE /viajes, PATCH /pagos) ---
+class PagoPatch(BaseModel):
+    # Solo se escriben los campos enviados en el JSON
+    fare: Optional[float] = None
+    tips: Optional[float] = None
+    tolls: Optional[float] = None
+    extras: Optional[float] = None
+    trip_total: Optional[float] = None
+
+class BulkChange(BaseModel):
+    dry_run: bool
+    affected: int
+
+# --- Búsqueda por lotes de IDs (POST /viajes/lookup, /pagos/lookup) ---
+class LookupRequest(BaseModel):
+    ids: List[str]
+
+class ViajesLookup(BaseModel):
+    found: List[Viaje]
+    missing: List[str]
+
+class PagosLookup(BaseModel):
+    found: List[Pago]
+    missing: List[str]
+
+# --- Modelos de respuesta de /analytics (calculados desde resumen_viajes) ---
+class HorarioStats(BaseModel):
+    anio: int
+    intervalo: str
+    total_viajes: int
+    porcentaje_por_anio: float
+
+class MensualStats(BaseModel):
+    anio: int
+    mes: int
+    total_viajes: int
+    tarifa: Optional[float] = None
+    propinas: Optional[float] = None
+    distancia_millas: Optional[float] = None
+    precio_promedio_por_milla: Optional[float] = None
+
+class ZonaStats(BaseModel):
+    zona_id: int
+    nombre_zona: Optional[str] = None
+    anio: int
+    mes: int
+    total_viajes: int
+    avg_fare: Optional[float] = None
+    avg_tips: Optional[float] = None
+    avg_distance_miles: Optional[float] = None
+    avg_duration_minutes: Optional[float] = None
+    avg_trip_total: Optional[float] = None
+    ingresos_totales: Optional[float] = None
+    millas_totales: Optional[float] = None
+    precio_promedio_por_milla: Optional[float] = None
+
+# --- Estadísticas por taxi (/taxis, calculadas desde resumen_taxis) ---
+class TaxiStats(BaseModel):
+    taxi_id: str
+    total_viajes: int
+    ingresos_totales: Optional[float] = None
+    millas_totales: Optional[float] = None
+    avg_fare: Optional[float] = None
+    avg_tips: Optional[float] = None
+    avg_trip_total: Optional[float] = None
+    avg_distance_miles: Optional[float] = None
+    avg_duration_minutes: Optional[float] = None
+    precio_promedio_por_milla: Optional[float] = None
+
+# --- Matriz origen-destino (GET /analytics/od-matrix, cubo en memoria) ---
+class ODCell(BaseModel):
+    # 0 agrupa los viajes sin zona registrada
+    pickup_community_area: int
+    dropoff_community_area: int
+    viajes: int
+    ingresos: float
+    millas_promedio: Optional[float] = None
+
+class ODMatrix(BaseModel):
+    desde: date
+    hasta: date
+    granularidad_dias: int
+    hora_desde: int
+    hora_hasta: int
+    total_viajes: int
+    celdas: List[ODCell]
+
+
+# --- Modelos de /health/db ---
+class PoolWait(BaseModel):
+    count: int
+    avg_ms: float
+    max_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+class PoolStatus(BaseModel):
+    name: str
+    pool_class: str
+    size: Optional[int] = None
+    checked_out: Optional[int] = None
+    idle: Optional[int] = None
+    overflow: Optional[int] = None
+    max_overflow: Optional[int] = None
+    timeout: Optional[float] = None
+    wait: PoolWait
+
+
+class DBHealth(BaseModel):
+    status: str
+    latency_ms: dict
+    pools: List[PoolStatus]
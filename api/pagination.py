@@ -0,0 +1,82 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+# Nombre del header con el token para pedir la siguiente página
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: dict) -> str:
+    """
+    Convierte la última llave vista en un token opaco (base64 url-safe).
+    Las fechas se serializan en ISO 8601.
+    """
+    payload = {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in values.items()
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> dict:
+    """
+    Inverso de encode_cursor. Un token corrupto se reporta como 400.
+    """
+    try:
+        padding = "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(token + padding))
+        if not isinstance(payload, dict):
+            raise ValueError("payload inválido")
+        return payload
+    except (ValueError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def apply_keyset(query, columns: list, cursor: Optional[str]):
+    """
+    Ordena la consulta por las columnas llave y, si hay cursor,
+    filtra las filas estrictamente posteriores a la última llave vista.
+
+    A diferencia de OFFSET, Postgres puede saltar directo a la posición
+    con el índice de la llave, así que el costo por página no crece
+    con la profundidad.
+    """
+    query = query.order_by(*columns)
+    if cursor is None:
+        return query
+
+    payload = decode_cursor(cursor)
+    try:
+        values = []
+        for column in columns:
+            value = payload[column.key]
+            if column.type.python_type is datetime:
+                value = datetime.fromisoformat(value)
+            values.append(value)
+    except (KeyError, TypeError, ValueError):
+        # El cursor se generó con otra llave (ej. se cambiaron los filtros de tiempo)
+        raise HTTPException(
+            status_code=400,
+            detail="El cursor no corresponde a los filtros de la consulta",
+        )
+
+    if len(columns) == 1:
+        return query.filter(columns[0] > values[0])
+    return query.filter(tuple_(*columns) > tuple_(*values))
+
+
+def next_cursor(rows: list, columns: list, limit: int) -> Optional[str]:
+    """
+    Genera el cursor de la siguiente página a partir de la última fila.
+    Si la página vino incompleta ya no hay más resultados.
+    """
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor({column.key: getattr(last, column.key) for column in columns})
@@ -0,0 +1,66 @@
+import json
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import inspect, select
+
+from api.pagination import NEXT_CURSOR_HEADER
+from util.serialization import json_default
+
+try:
+    import orjson
+except ImportError:  # extra "fast"; sin él se usa json de la biblioteca estándar
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Respuesta para listados grandes. Recibe dicts ya armados a partir de
+    las filas (sin construir un modelo Pydantic por fila) y los codifica
+    con orjson si está instalado.
+    """
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=json_default)
+        return json.dumps(content, default=json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def projected_columns(entity, fields: Optional[str]) -> list:
+    """
+    Columnas pedidas con ?fields=trip_id,trip_miles en el orden de la
+    tabla; sin fields son todas. Un nombre que no existe es 400.
+    """
+    available = {attr.key: getattr(entity, attr.key) for attr in inspect(entity).column_attrs}
+    if not fields:
+        return list(available.values())
+
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(available)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"fields inválido: {', '.join(sorted(unknown))}. Opciones: {', '.join(available)}",
+        )
+    return [column for name, column in available.items() if name in requested]
+
+
+def select_columns(entity, columns: Optional[list], keyset_columns: list):
+    """
+    SELECT de la entidad completa (columns=None) o solo de las columnas
+    proyectadas. Las llaves del cursor se agregan al final si no se
+    pidieron; rows_response las descarta.
+    """
+    if columns is None:
+        return select(entity)
+    selected = {column.key for column in columns}
+    return select(*columns, *[column for column in keyset_columns if column.key not in selected])
+
+
+def rows_response(rows: list, columns: list, cursor: Optional[str], headers: Optional[dict] = None) -> FastJSONResponse:
+    names = [column.key for column in columns]
+    headers = dict(headers or {})
+    if cursor is not None:
+        headers[NEXT_CURSOR_HEADER] = cursor
+    return FastJSONResponse([dict(zip(names, row)) for row in rows], headers=headers)
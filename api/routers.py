@@ -1,22 +1,109 @@
-from typing import List
-from fastapi import APIRouter, HTTPException, Request, Query
-from fastapi.responses import JSONResponse
+import base64
+from datetime import date, timedelta
+from typing import FrozenSet, List, Optional, Set
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import case, func, select
 from sqlalchemy.orm.session import Session
 from sqlalchemy.exc import IntegrityError
 
 
 from api.models import (
     Viaje as ViajeSchema, 
+    ViajeExpandido,
     Pago as PagoSchema, 
     CommunityArea as CommunitySchema,
-    CiudadViaje as CiudadSchema
+    CiudadViaje as CiudadSchema,
+    BulkError,
+    BulkResult,
+    BulkChange,
+    PagoPatch,
+    LookupRequest,
+    ViajesLookup,
+    PagosLookup,
+    HorarioStats,
+    MensualStats,
+    ZonaStats,
+    TaxiStats,
+    ODCell,
+    ODMatrix,
+    DBHealth,
 )
 
-from db.entities import Viaje, Pago, CommunityArea, CiudadViaje
+from db.entities import Viaje, Pago, CommunityArea, CiudadViaje, ResumenViajes, ResumenTaxis
+from api.bulk import BulkStream, iter_line_batches
+from api.charts import CHART_TTL, CHARTS, chart_cache_key, chart_etag, charts_available, render_chart
+from api.conditional import conditional_get, etag_matches
+from api.cost_guard import guard_list, guard_params
+from api.counting import count_statement, total_count
+from api.expand import expand_options, parse_expand, serialize_viaje
+from api.filters import ViajeFilters, PagoFilters
+from api.lookup import iter_lookup_ndjson, lookup_chunks, lookup_columns, lookup_result, unique_ids
+from api.pagination import NEXT_CURSOR_HEADER, apply_keyset, next_cursor
+from api.projection import projected_columns, rows_response, select_columns
+from api.streaming import STREAM_MEDIA_TYPES, iter_format
 
 
-from db.session import DBSessionManager
+from db.bulk import delete_viajes, insert_staged, lock_viajes, stage_changes, stage_viajes, update_pagos
+from db.rollups import Trips, adjust_rollups
+from db.session import STATEMENT_TIMEOUT_KEY, DBSessionManager
+from util.cache import Cache, MemoryCache, bump_data_version, data_version, get_versioned, invalidate, set_versioned
 from util.logger import LoggerSessionManager
+from util.metrics import Metrics, annotate
+
+
+# Llaves del cache de lecturas por ID (compartidas con api/async_routers.py)
+def viaje_cache_key(trip_id: str) -> str:
+    return f"viaje:{trip_id}"
+
+
+def pago_cache_key(trip_id: str) -> str:
+    return f"pago:{trip_id}"
+
+
+def community_cache_key(community_id: int) -> str:
+    return f"community:{community_id}"
+
+
+COMMUNITIES_CACHE_KEY = "communities"
+
+# Versión de las lecturas por ID de viajes y pagos. Las escrituras de un
+# ID borran su llave; los cambios por filtro (DELETE /viajes, PATCH /pagos)
+# cambian esta versión en lugar de borrar una llave por viaje
+BY_ID_VERSION = "por_id"
+
+# El catálogo de zonas no cambia desde la API, puede vivir más tiempo
+CATALOG_TTL = 3600
+
+# Tablas cuya versión valida cada listado (ETag / Last-Modified). Los
+# filtros de monto y ?expand=pago de /viajes también leen pagos.
+VIAJES_TABLES = ("viajes", "pagos")
+PAGOS_TABLES = ("pagos",)
+COMMUNITIES_TABLES = ("community_area",)
+
+
+def _lookup(db_session_manager: DBSessionManager, logger, entity, data: LookupRequest, stream: bool, name: str):
+    """
+    Búsqueda por lotes compartida por viajes y pagos. Es un POST solo por
+    el tamaño del cuerpo: usa la sesión de lectura (réplica si existe) en
+    lugar de request.state.db_session, que para POST abriría una
+    transacción en el primario.
+    """
+    ids = unique_ids(data.ids)
+    columns = [column.key for column in lookup_columns(entity)]
+    logger.info(f"Búsqueda por lotes en {name}: {len(ids)} IDs, stream={stream}")
+
+    if stream:
+        def body():
+            # La sesión vive lo que dure el stream, no lo que dure el handler
+            with db_session_manager.ReadSessionLocal() as db_session:
+                yield from iter_lookup_ndjson(columns, lookup_chunks(db_session, entity, ids))
+
+        return StreamingResponse(body(), media_type=STREAM_MEDIA_TYPES["ndjson"])
+
+    with db_session_manager.ReadSessionLocal() as db_session:
+        return lookup_result(columns, lookup_chunks(db_session, entity, ids))
 
 
 # ==========================================
@@ -28,22 +115,35 @@ class ViajesRouter:
     def __init__(
         self,
         db_session_manager: DBSessionManager, 
-        logger_session_manager: LoggerSessionManager
+        logger_session_manager: LoggerSessionManager,
+        cache: Optional[Cache] = None,
     ):
         self.db_session_manager = db_session_manager
         self.logger_session = logger_session_manager
         self.logger = logger_session_manager.get_logger(__name__)
+        self.cache = cache if cache is not None else MemoryCache()
 
         self.router = APIRouter(prefix="/viajes", tags=["Viajes"])
 
         # GET /viajes/ (Listado con paginación)
+        # exclude_unset: las relaciones solo aparecen si se piden con ?expand=
         self.router.add_api_route(
-            "/", self.list, methods=["GET"], response_model=List[ViajeSchema]
+            "/", self.list, methods=["GET"], response_model=List[ViajeExpandido],
+            response_model_exclude_unset=True,
         )
+        # GET /viajes/export (Exportación completa en NDJSON o CSV)
+        # Debe registrarse antes de /{trip_id} para que no se confunda con un ID
+        self.router.add_api_route("/export", self.export, methods=["GET"])
+
         # GET /viajes/{trip_id} (Detalle de un viaje)
         self.router.add_api_route(
-            "/{trip_id}", self.get, methods=["GET"], response_model=ViajeSchema
+            "/{trip_id}", self.get, methods=["GET"], response_model=ViajeExpandido,
+            response_model_exclude_unset=True,
         )
+        # DELETE /viajes/ (Borrado por filtro, con ?dry_run= para solo contar)
+        self.router.add_api_route(
+            "/", self.delete_many, methods=["DELETE"], response_model=BulkChange)
+
         # DELETE /viajes/{trip_id}
         self.router.add_api_route("/{trip_id}", self.delete, methods=["DELETE"])
 
@@ -51,6 +151,14 @@ class ViajesRouter:
         self.router.add_api_route(
             "/", self.create, methods=["POST"], response_model=ViajeSchema)
 
+        # POST /viajes/bulk (Carga masiva de viajes completos en NDJSON o CSV)
+        self.router.add_api_route(
+            "/bulk", self.bulk, methods=["POST"], response_model=BulkResult)
+
+        # POST /viajes/lookup (Muchos viajes por ID en una sola llamada)
+        self.router.add_api_route(
+            "/lookup", self.lookup, methods=["POST"], response_model=ViajesLookup)
+
         # UPDATE /viajes/{trip_id} se manejan en otro router o endpoint separado
         self.router.add_api_route(
             "/{trip_id}", self.update, methods=["PUT"], response_model=ViajeSchema)
@@ -58,76 +166,218 @@ class ViajesRouter:
     def list(
         self, 
         request: Request, 
+        response: Response,
         skip: int = 0, 
         limit: int = 100,
-        pickup_community_id: int = Query(default=None, ge=1, description="Filtrar por zona de Recogida"),
-        dropoff_community_id: int = Query(default=None, ge=1, description="Filtrar por zona de Llegada"),
-        trip_miles_min: int = Query(default=None, ge=0, description="Distancia minima del viaje"),
-        trip_miles_max: int = Query(default=None, ge=0, description="Distancia maxima del viaje"),
-        trip_start_after: str = Query(default=None, description="Filtrar viajes que iniciaron después de esta fecha (YYYY-MM-DD)"),
-        trip_end_before: str = Query(default=None, description="Filtrar viajes que terminaron antes de esta fecha (YYYY-MM-DD)"),
-        trip_total: float = Query(default=None, ge=0, description="Filtrar por costo total minimo del viaje(propina incluida)")
+        cursor: str = Query(default=None, description="Token de paginación devuelto en el header X-Next-Cursor (reemplaza a skip)"),
+        filters: ViajeFilters = Depends(),
+        expand: FrozenSet[str] = Depends(parse_expand),
+        fields: str = Query(default=None, description="Columnas a devolver separadas por coma (p. ej. trip_id,trip_miles)"),
+        count: str = Query(default="none", pattern="^(none|estimated|exact)$", description="Total en el header X-Total-Count: estimated (planner, casi gratis), exact (COUNT) o none"),
     ):
         """
         Lista viajes. Permite filtrar por zona de recogida o llegada.
+        La paginación por cursor (keyset) mantiene el costo constante
+        sin importar qué tan profunda sea la página; skip se conserva
+        para clientes anteriores. Con ?expand=pago,ciudad,areas cada
+        relación cuesta una sola consulta extra para toda la página.
+
+        Sin expand se leen solo columnas (las de ?fields= o todas) y las
+        filas se codifican directo, sin un modelo Pydantic por fila.
+        ?count= agrega el total que cumple los filtros (cacheado por filtros).
+        Con If-None-Match / If-Modified-Since se responde 304 sin consultar
+        la BD si viajes y pagos no cambiaron. En Postgres la página pasa
+        antes por el guard de costo (api/cost_guard.py): 400 si es
+        demasiado cara y count=exact se degrada a estimated si contar
+        todo lo es.
         """
         db_session: Session = request.state.db_session
-        self.logger.info(f"Listando viajes: skip={skip}, limit={limit}, pickup={pickup_community_id}, dropoff={dropoff_community_id}")
+        self.logger.info(f"Listando viajes: skip={skip}, limit={limit}, cursor={cursor is not None}, filtros={filters.as_dict()}, expand={sorted(expand)}, fields={fields}")
 
-        query = db_session.query(Viaje)
-        if pickup_community_id is not None or dropoff_community_id is not None:
-            query = query.join(CiudadViaje, Viaje.trip_id == CiudadViaje.trip_id)
+        if expand and fields:
+            raise HTTPException(status_code=400, detail="Use fields o expand, no ambos")
+        validators, not_modified = conditional_get(request, self.cache, *VIAJES_TABLES)
+        if not_modified is not None:
+            return not_modified
 
-        if pickup_community_id is not None:
-            query = query.filter(CiudadViaje.pickup_community_area == pickup_community_id)
-        
-        if dropoff_community_id is not None:
-            query = query.filter(CiudadViaje.dropoff_community_area == dropoff_community_id)
+        columns = None if expand else projected_columns(Viaje, fields)
+        stmt, keyset_columns, limit = self._list_statement(skip, limit, cursor, filters, columns)
+        count_base = self._count_base(filters)
+        count = guard_list(db_session, self.cache, "viajes", stmt, count_base, count, guard_params(filters.as_dict(), skip, limit, cursor))
+        headers = {**validators, **total_count(db_session, self.cache, "viajes", count, count_base, filters.as_dict())}
 
-        if trip_miles_min is not None:
-            query = query.filter(Viaje.trip_miles >= trip_miles_min)
-        
-        if trip_miles_max is not None:
-            query = query.filter(Viaje.trip_miles <= trip_miles_max)
-        
-        if trip_start_after is not None:
-            query = query.filter(Viaje.trip_start_timestamp >= trip_start_after)
-        
-        if trip_end_before is not None:
-            query = query.filter(Viaje.trip_end_timestamp <= trip_end_before)
-        
-        if trip_total is not None:
-            query = query.join(Pago, Viaje.trip_id == Pago.trip_id)
-            query = query.filter(Pago.trip_total  >= trip_total)
+        if expand:
+            viajes = db_session.scalars(stmt.options(*expand_options(expand))).all()
+
+            token = next_cursor(viajes, keyset_columns, limit)
+            if token is not None:
+                response.headers[NEXT_CURSOR_HEADER] = token
+            response.headers.update(headers)
+            return [serialize_viaje(viaje, expand) for viaje in viajes]
+
+        rows = db_session.execute(stmt).all()
+        return rows_response(rows, columns, next_cursor(rows, keyset_columns, limit), headers)
+
+    def _count_base(self, filters: ViajeFilters):
+        """Mismo WHERE que _list_statement, sin orden ni paginación, para ?count=."""
+        return filters.apply(select(Viaje.trip_id))
+
+    def _list_statement(self, skip: int, limit: int, cursor: str, filters: ViajeFilters, columns: Optional[list] = None):
+        """
+        Construye el SELECT del listado. Se comparte con la versión async
+        del router; devuelve también las columnas llave y el limit ajustado.
+        Con columns se seleccionan solo esas columnas en lugar de la entidad.
+        """
+        if cursor is not None and skip:
+            raise HTTPException(status_code=400, detail="Use skip o cursor, no ambos")
+
+        # Con trip_start_after se ordena por fecha de inicio para aprovechar
+        # el rango; el trip_id desempata viajes con el mismo timestamp
+        if filters.orders_by_start:
+            keyset_columns = [Viaje.trip_start_timestamp, Viaje.trip_id]
+        else:
+            keyset_columns = [Viaje.trip_id]
+
+        stmt = filters.apply(select_columns(Viaje, columns, keyset_columns))
 
         if  limit > 1000:
-            limit = 1000  
-            print("Limit maximo es 1000. Se ajusta a 1000.")
-        viajes = query.offset(skip).limit(limit).all()
-        return viajes
+            self.logger.warning(f"Limit máximo es 1000 (se pidió {limit}). Se ajusta a 1000.")
+            limit = 1000
+
+        # Los filtros acompañan al SQL en el log de consultas lentas
+        annotate(filtros=filters.as_dict(), limit=limit, cursor=cursor is not None, skip=skip)
+
+        stmt = apply_keyset(stmt, keyset_columns, cursor)
+        if skip:
+            stmt = stmt.offset(skip)
+        return stmt.limit(limit), keyset_columns, limit
+
+    def export(
+        self,
+        request: Request,
+        filters: ViajeFilters = Depends(),
+        format: str = Query(default="ndjson", pattern="^(ndjson|csv)$", description="Formato de salida: ndjson o csv"),
+        include: str = Query(default=None, description="Tablas a unir separadas por coma: pago, ciudad"),
+    ):
+        """
+        Exporta todos los viajes que cumplan los filtros sin límite de filas.
+        Se usa un cursor del lado del servidor (yield_per), así que la memoria
+        se mantiene constante y las primeras filas salen antes de que la
+        consulta termine. Lee de la réplica en una transacción de solo
+        lectura con el statement_timeout de la ruta.
+        """
+        includes = {item.strip() for item in include.split(",") if item.strip()} if include else set()
+        unknown = includes - {"pago", "ciudad"}
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"include no soportado: {', '.join(sorted(unknown))}")
+
+        self.logger.info(f"Exportando viajes: formato={format}, include={sorted(includes)}, filtros={filters.as_dict()}")
 
-    def get(self, trip_id: str, request: Request):
+        columns = [
+            Viaje.trip_id,
+            Viaje.taxi_id,
+            Viaje.trip_start_timestamp,
+            Viaje.trip_end_timestamp,
+            Viaje.trip_miles,
+        ]
+        joined = set()
+        if "pago" in includes:
+            columns += [Pago.fare, Pago.tips, Pago.tolls, Pago.extras, Pago.trip_total]
+            joined.add(Pago)
+        if "ciudad" in includes:
+            columns += [CiudadViaje.pickup_community_area, CiudadViaje.dropoff_community_area]
+            joined.add(CiudadViaje)
+
+        stmt = select(*columns).select_from(Viaje)
+        if Pago in joined:
+            stmt = stmt.outerjoin(Pago, Viaje.trip_id == Pago.trip_id)
+        if CiudadViaje in joined:
+            stmt = stmt.outerjoin(CiudadViaje, Viaje.trip_id == CiudadViaje.trip_id)
+        stmt = filters.apply(stmt, joined=frozenset(joined))
+        stmt = stmt.execution_options(yield_per=2000)
+
+        # statement_timeout de la clase "pesado" (AdmissionMiddleware), si lo hay
+        timeout = getattr(request.state, STATEMENT_TIMEOUT_KEY, None)
+        info = {STATEMENT_TIMEOUT_KEY: timeout} if timeout else {}
+
+        def rows():
+            # La sesión vive lo que dure el stream, no lo que dure el handler
+            with self.db_session_manager.get_read_transaction(info) as db_session:
+                yield from db_session.execute(stmt)
+
+        return StreamingResponse(
+            iter_format(format, [column.key for column in columns], rows()),
+            media_type=STREAM_MEDIA_TYPES[format],
+            headers={"Content-Disposition": f"attachment; filename=viajes.{format}"},
+        )
+
+    def get(self, trip_id: str, request: Request, expand: FrozenSet[str] = Depends(parse_expand)):
         db_session: Session = request.state.db_session
         self.logger.info(f"Buscando viaje ID: {trip_id}")
+
+        # Solo se cachea la versión sin expand; la expandida depende de
+        # otras tablas y se arma en una sola consulta con JOINs
+        if not expand:
+            version, cached = get_versioned(self.cache, viaje_cache_key(trip_id), BY_ID_VERSION)
+            if cached is not None:
+                return cached
         
-        viaje = db_session.query(Viaje).get(trip_id)
+        viaje = db_session.get(Viaje, trip_id, options=expand_options(expand, single=True))
         
         if not viaje:
             return JSONResponse(
                 status_code=404, content={"error_description": "Viaje no encontrado"}
             )
-        return viaje
+        data = serialize_viaje(viaje, expand)
+        if not expand:
+            set_versioned(self.cache, viaje_cache_key(trip_id), version, data)
+        return data
 
     def delete(self, trip_id: str, request: Request):
         db_session: Session = request.state.db_session
-        viaje = db_session.query(Viaje).get(trip_id)
-        
-        if not viaje:
+
+        # Se descuenta del resumen antes de borrar; el commit lo hace el middleware.
+        # delete_viajes no carga el viaje ni sus hijos: un DELETE por tabla
+        if not lock_viajes(db_session, [trip_id]):
             raise HTTPException(status_code=404, detail="Viaje no encontrado")
-        
-        db_session.delete(viaje)
+        adjust_rollups(db_session, [trip_id], -1)
+        delete_viajes(db_session, [trip_id])
+
+        invalidate(db_session, self.cache, viaje_cache_key(trip_id), pago_cache_key(trip_id))
+        bump_data_version(db_session, self.cache, "viajes", "pagos")
         # El middleware o context manager se encarga del commit
         return {"message": f"Viaje {trip_id} eliminado correctamente"}
+
+    def delete_many(
+        self,
+        request: Request,
+        filters: ViajeFilters = Depends(),
+        dry_run: bool = Query(default=False, description="Solo cuenta los viajes que se borrarían"),
+    ):
+        """
+        Borra todos los viajes que cumplen los filtros (con su pago y sus
+        zonas) en la transacción del request: una sentencia por tabla en
+        lugar de un DELETE /viajes/{trip_id} por viaje. Exige al menos un
+        filtro para no vaciar la tabla por accidente.
+        """
+        db_session: Session = request.state.db_session
+        if not filters.as_dict():
+            raise HTTPException(status_code=400, detail="Se requiere al menos un filtro")
+
+        base = self._count_base(filters)
+        if dry_run:
+            affected = db_session.execute(count_statement(base)).scalar()
+            self.logger.info(f"Borrado por filtro (dry run): {affected} viajes, filtros={filters.as_dict()}")
+            return BulkChange(dry_run=True, affected=affected)
+
+        # Los trip_id quedan en una tabla temporal: ni el borrado ni los
+        # resúmenes los traen a Python
+        changes = stage_changes(db_session, base)
+        adjust_rollups(db_session, changes, -1)
+        affected = delete_viajes(db_session, changes)
+        bump_data_version(db_session, self.cache, "viajes", "pagos", BY_ID_VERSION)
+        self.logger.info(f"Borrado por filtro: {affected} viajes, filtros={filters.as_dict()}")
+        return BulkChange(dry_run=False, affected=affected)
     
     def create(self, request: Request, data: ViajeSchema):
         """Crea un nuevo viaje en la BD."""
@@ -139,20 +389,85 @@ class ViajesRouter:
         try:
             db_session.add(new_viaje)
             db_session.flush() # Hacemos flush para detectar errores (ej. ID duplicado)
+            adjust_rollups(db_session, [new_viaje.trip_id], 1)
+            invalidate(db_session, self.cache, viaje_cache_key(new_viaje.trip_id))
+            bump_data_version(db_session, self.cache, "viajes")
             return new_viaje
         except Exception as e:
             self.logger.error(f"Error al crear viaje: {e}")
             raise HTTPException(status_code=400, detail="Error al crear el viaje. Verifique que el ID no exista.")
 
+    async def bulk(
+        self,
+        request: Request,
+        format: str = Query(default=None, pattern="^(ndjson|csv)$", description="ndjson o csv (por defecto se deduce del Content-Type)"),
+    ):
+        """
+        Carga masiva de viajes completos (viaje, pago y zonas) en una sola
+        transacción. Las filas con errores se reportan sin abortar el lote.
+        El cuerpo se lee por partes: cada BULK_BATCH_LINES líneas se validan
+        y se copian a staging mientras llega el resto, así que el lote
+        nunca está completo en memoria.
+        """
+        if format is None:
+            format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+
+        # El COPY es bloqueante, se manda al threadpool igual que los handlers síncronos
+        db_session: Session = request.state.db_session
+        stream = BulkStream(format, await run_in_threadpool(self._community_ids, db_session))
+        async for lines in iter_line_batches(request.stream()):
+            await run_in_threadpool(self._stage_bulk, db_session, stream, lines)
+        return await run_in_threadpool(self._insert_bulk, db_session, stream)
+
+    @staticmethod
+    def _community_ids(db_session: Session) -> Set[int]:
+        return set(db_session.scalars(select(CommunityArea.community_id)))
+
+    @staticmethod
+    def _stage_bulk(db_session: Session, stream: BulkStream, lines: List[str]) -> None:
+        stage_viajes(db_session, [row.model_dump() for row in stream.feed(lines)])
+
+    def _insert_bulk(self, db_session: Session, stream: BulkStream) -> BulkResult:
+        self.logger.info(f"Carga masiva: {stream.received} filas recibidas, {len(stream.errors)} inválidas")
+
+        inserted = insert_staged(db_session)
+        adjust_rollups(db_session, inserted, 1)
+        if inserted:
+            bump_data_version(db_session, self.cache, "viajes", "pagos")
+
+        errors = list(stream.errors)
+        for trip_id, line_number in stream.seen.items():
+            if trip_id not in inserted:
+                errors.append(BulkError(line=line_number, trip_id=trip_id, error="El viaje ya existe"))
+        errors.sort(key=lambda error: error.line)
+
+        return BulkResult(received=stream.received, inserted=len(inserted), errors=errors)
+
+    def lookup(
+        self,
+        data: LookupRequest,
+        stream: bool = Query(default=False, description="Responde en NDJSON a medida que se resuelve cada chunk"),
+    ):
+        """
+        Resuelve muchos trip_id en consultas de LOOKUP_CHUNK_SIZE IDs con
+        = ANY(:ids). Devuelve los viajes encontrados y los IDs que no existen.
+        """
+        return _lookup(self.db_session_manager, self.logger, Viaje, data, stream, "viajes")
+
     def update(self, trip_id: str, request: Request, data: ViajeSchema):
         """Actualiza un viaje existente."""
         db_session: Session = request.state.db_session
         self.logger.info(f"Actualizando viaje ID: {trip_id}")
         
-        viaje = db_session.query(Viaje).get(trip_id)
+        # FOR UPDATE antes de restar (ver lock_viajes); populate_existing
+        # relee la fila aunque ya estuviera en la sesión
+        viaje = db_session.get(Viaje, trip_id, with_for_update=True, populate_existing=True)
         if not viaje:
             raise HTTPException(status_code=404, detail="Viaje no encontrado")
 
+        # El resumen se ajusta restando la versión anterior y sumando la nueva
+        adjust_rollups(db_session, [trip_id], -1)
+
         # Actualizamos los campos
         # exclude_unset=True evita actualizar campos que no enviaste en el JSON
         for key, value in data.model_dump(exclude_unset=True).items():
@@ -162,6 +477,9 @@ class ViajesRouter:
                 setattr(viaje, key, value)
         
         db_session.flush()
+        adjust_rollups(db_session, [trip_id], 1)
+        invalidate(db_session, self.cache, viaje_cache_key(trip_id))
+        bump_data_version(db_session, self.cache, "viajes")
         return viaje
 
 
@@ -171,10 +489,16 @@ class ViajesRouter:
 class PagosRouter:
     router = APIRouter(prefix="/pagos", tags=["Pagos"])
 
-    def __init__(self, db_session_manager: DBSessionManager, logger_session_manager: LoggerSessionManager):
+    def __init__(
+        self,
+        db_session_manager: DBSessionManager,
+        logger_session_manager: LoggerSessionManager,
+        cache: Optional[Cache] = None,
+    ):
         self.db_session_manager = db_session_manager
         self.logger_session = logger_session_manager
         self.logger = logger_session_manager.get_logger(__name__)
+        self.cache = cache if cache is not None else MemoryCache()
 
         self.router = APIRouter(prefix="/pagos", tags=["Pagos"])
 
@@ -186,12 +510,22 @@ class PagosRouter:
         self.router.add_api_route(
             "/{trip_id}", self.get_by_trip_id, methods=["GET"], response_model=PagoSchema
         )
+
+        # POST /pagos/lookup (Muchos pagos por trip_id en una sola llamada)
+        self.router.add_api_route(
+            "/lookup", self.lookup, methods=["POST"], response_model=PagosLookup
+        )
         
         # POST /pagos/ (Crear Pago)
         self.router.add_api_route(
             "/", self.create, methods=["POST"], response_model=PagoSchema
         )
 
+        # PATCH /pagos/ (Actualización por filtro, con ?dry_run= para solo contar)
+        self.router.add_api_route(
+            "/", self.update_many, methods=["PATCH"], response_model=BulkChange
+        )
+
         # PUT /pagos/{trip_id} (Actualizar Pago)
         self.router.add_api_route(
             "/{trip_id}", self.update, methods=["PUT"], response_model=PagoSchema
@@ -203,13 +537,27 @@ class PagosRouter:
         )
 
     def get_by_trip_id(self, trip_id: str, request: Request):
+        version, cached = get_versioned(self.cache, pago_cache_key(trip_id), BY_ID_VERSION)
+        if cached is not None:
+            return cached
+
         db_session: Session = request.state.db_session
         pago = db_session.query(Pago).filter(Pago.trip_id == trip_id).first()
         
         if not pago:
             raise HTTPException(status_code=404, detail="Pago no encontrado para este viaje")
         
-        return pago
+        data = PagoSchema.model_validate(pago, from_attributes=True).model_dump(mode="json")
+        set_versioned(self.cache, pago_cache_key(trip_id), version, data)
+        return data
+
+    def lookup(
+        self,
+        data: LookupRequest,
+        stream: bool = Query(default=False, description="Responde en NDJSON a medida que se resuelve cada chunk"),
+    ):
+        """Igual que POST /viajes/lookup pero sobre la tabla pagos."""
+        return _lookup(self.db_session_manager, self.logger, Pago, data, stream, "pagos")
 
     def create(self, request: Request, data: PagoSchema):
         """
@@ -220,10 +568,17 @@ class PagosRouter:
         self.logger.info(f"Registrando pago para viaje ID: {data.trip_id}")
 
         new_pago = Pago(**data.model_dump())
+        if not lock_viajes(db_session, [data.trip_id]):
+            raise HTTPException(status_code=400, detail="Error: Verifique que el trip_id exista en la tabla Viajes.")
 
         try:
+            # El viaje ya contaba en el resumen sin pago; se recalcula su aporte
+            adjust_rollups(db_session, [data.trip_id], -1)
             db_session.add(new_pago)
             db_session.flush()
+            adjust_rollups(db_session, [data.trip_id], 1)
+            invalidate(db_session, self.cache, pago_cache_key(data.trip_id))
+            bump_data_version(db_session, self.cache, "pagos")
             return new_pago
         except IntegrityError as e:   # Esto pasa si el trip_id no existe en la tabla viajes
             db_session.rollback()
@@ -242,10 +597,12 @@ class PagosRouter:
         db_session: Session = request.state.db_session
         self.logger.info(f"Actualizando pago del viaje ID: {trip_id}")
         
-        pago = db_session.query(Pago).filter(Pago.trip_id == trip_id).first()
+        pago = self._locked_pago(db_session, trip_id)
         if not pago:
             raise HTTPException(status_code=404, detail="Pago no encontrado")
 
+        adjust_rollups(db_session, [trip_id], -1)
+
         for key, value in data.model_dump(exclude_unset=True).items():
             # Evitamos modificar el trip_id ya que es la PK y FK
             if key == "trip_id":
@@ -254,48 +611,127 @@ class PagosRouter:
                 setattr(pago, key, value)
         
         db_session.flush()
+        adjust_rollups(db_session, [trip_id], 1)
+        invalidate(db_session, self.cache, pago_cache_key(trip_id))
+        bump_data_version(db_session, self.cache, "pagos")
         return pago
 
+    @staticmethod
+    def _locked_pago(db_session: Session, trip_id: str) -> Optional[Pago]:
+        """
+        Pago de un viaje con el candado del viaje (lock_viajes) y el suyo,
+        antes de restarlo de los resúmenes. Se comparte con la versión async.
+        """
+        if not lock_viajes(db_session, [trip_id]):
+            return None
+        return db_session.get(Pago, trip_id, with_for_update=True, populate_existing=True)
+
+    def update_many(
+        self,
+        request: Request,
+        data: PagoPatch,
+        filters: PagoFilters = Depends(),
+        viaje_filters: ViajeFilters = Depends(),
+        dry_run: bool = Query(default=False, description="Solo cuenta los pagos que se modificarían"),
+    ):
+        """
+        Escribe los campos enviados en todos los pagos que cumplen los
+        filtros (de monto y de viaje, p. ej. un mes completo) con un solo
+        UPDATE en la transacción del request. Exige al menos un filtro.
+        """
+        db_session: Session = request.state.db_session
+        values = data.model_dump(exclude_unset=True)
+        if not values:
+            raise HTTPException(status_code=400, detail="No se enviaron campos para actualizar")
+        if not filters.as_dict() and not viaje_filters.as_dict():
+            raise HTTPException(status_code=400, detail="Se requiere al menos un filtro")
+
+        base = filters.apply(select(Pago.trip_id))
+        if viaje_filters.as_dict():
+            base = viaje_filters.apply(base.join(Viaje, Viaje.trip_id == Pago.trip_id), joined=frozenset({Pago}))
+
+        if dry_run:
+            affected = db_session.execute(count_statement(base)).scalar()
+            self.logger.info(f"Actualización por filtro (dry run): {affected} pagos")
+            return BulkChange(dry_run=True, affected=affected)
+
+        # El conjunto se fija antes del UPDATE: después los filtros de monto
+        # pueden ya no seleccionar los mismos pagos
+        changes = stage_changes(db_session, base)
+        adjust_rollups(db_session, changes, -1)
+        affected = update_pagos(db_session, changes, values)
+        adjust_rollups(db_session, changes, 1)
+        bump_data_version(db_session, self.cache, "pagos", BY_ID_VERSION)
+        self.logger.info(f"Actualización por filtro: {affected} pagos, campos={sorted(values)}")
+        return BulkChange(dry_run=False, affected=affected)
+
     def delete(self, trip_id: str, request: Request):
         """Elimina el registro de pago asociado a un viaje."""
         db_session: Session = request.state.db_session
         self.logger.info(f"Eliminando pago del viaje ID: {trip_id}")
         
-        pago = db_session.query(Pago).filter(Pago.trip_id == trip_id).first()
-        
+        pago = self._locked_pago(db_session, trip_id)
         if not pago:
             raise HTTPException(status_code=404, detail="Pago no encontrado")
         
+        adjust_rollups(db_session, [trip_id], -1)
         db_session.delete(pago)
+        db_session.flush()
+        adjust_rollups(db_session, [trip_id], 1)
+        invalidate(db_session, self.cache, pago_cache_key(trip_id))
+        bump_data_version(db_session, self.cache, "pagos")
         return {"message": f"Pago del viaje {trip_id} eliminado correctamente"}
 
     def list(
         self, 
         request: Request, 
+        response: Response,
         skip: int = 0, 
         limit: int = 100,
-        min_total: float = Query(default=None, ge=0, description="Filtrar pagos mayores o iguales a esta cantidad"),
-        max_total: float = Query(default=None, ge=0, description="Filtrar pagos menores o iguales a esta cantidad")
+        cursor: str = Query(default=None, description="Token de paginación devuelto en el header X-Next-Cursor (reemplaza a skip)"),
+        filters: PagoFilters = Depends(),
+        fields: str = Query(default=None, description="Columnas a devolver separadas por coma (p. ej. trip_id,trip_total)"),
+        count: str = Query(default="none", pattern="^(none|estimated|exact)$", description="Total en el header X-Total-Count: estimated (planner, casi gratis), exact (COUNT) o none"),
     ):
         """
         Lista pagos con paginación y filtros por rango de monto.
+        Acepta skip (clientes anteriores) o cursor por trip_id. Igual que
+        en viajes, se leen solo columnas y se codifican sin Pydantic, y un
+        GET condicional responde 304 si pagos no cambió. El guard de costo
+        aplica igual que en viajes.
         """
         db_session: Session = request.state.db_session
-        self.logger.info(f"Listando pagos: skip={skip}, limit={limit}, min={min_total}, max={max_total}")
+        self.logger.info(f"Listando pagos: skip={skip}, limit={limit}, cursor={cursor is not None}, filtros={filters.as_dict()}, fields={fields}")
 
-        query = db_session.query(Pago)
-        if min_total is not None:
-            query = query.filter(Pago.trip_total >= min_total)
-        
-        if max_total is not None:
-            query = query.filter(Pago.trip_total <= max_total)
+        validators, not_modified = conditional_get(request, self.cache, *PAGOS_TABLES)
+        if not_modified is not None:
+            return not_modified
+        columns = projected_columns(Pago, fields)
+        stmt, keyset_columns, limit = self._list_statement(skip, limit, cursor, filters, columns)
+        count_base = filters.apply(select(Pago.trip_id))
+        count = guard_list(db_session, self.cache, "pagos", stmt, count_base, count, guard_params(filters.as_dict(), skip, limit, cursor))
+        headers = {**validators, **total_count(db_session, self.cache, "pagos", count, count_base, filters.as_dict())}
+        rows = db_session.execute(stmt).all()
+        return rows_response(rows, columns, next_cursor(rows, keyset_columns, limit), headers)
+
+    def _list_statement(self, skip: int, limit: int, cursor: str, filters: PagoFilters, columns: Optional[list] = None):
+        """SELECT del listado de pagos, compartido con la versión async."""
+        if cursor is not None and skip:
+            raise HTTPException(status_code=400, detail="Use skip o cursor, no ambos")
+
+        keyset_columns = [Pago.trip_id]
+        stmt = filters.apply(select_columns(Pago, columns, keyset_columns))
 
         if limit > 1000:
-            limit = 1000  
-            print("Limit maximo es 1000. Se ajusta a 1000.")
+            self.logger.warning(f"Limit máximo es 1000 (se pidió {limit}). Se ajusta a 1000.")
+            limit = 1000
+
+        annotate(filtros=filters.as_dict(), limit=limit, cursor=cursor is not None, skip=skip)
 
-        pagos = query.offset(skip).limit(limit).all()
-        return pagos
+        stmt = apply_keyset(stmt, keyset_columns, cursor)
+        if skip:
+            stmt = stmt.offset(skip)
+        return stmt.limit(limit), keyset_columns, limit
 
 # ==========================================
 # 3. ROUTER DE COMMUNITY AREAS (Catálogo)
@@ -303,10 +739,16 @@ class PagosRouter:
 class CommunityRouter:
     router = APIRouter(prefix="/communities", tags=["Community Areas"])
 
-    def __init__(self, db_session_manager: DBSessionManager, logger_session_manager: LoggerSessionManager):
+    def __init__(
+        self,
+        db_session_manager: DBSessionManager,
+        logger_session_manager: LoggerSessionManager,
+        cache: Optional[Cache] = None,
+    ):
         self.db_session_manager = db_session_manager
         self.logger_session = logger_session_manager
         self.logger = logger_session_manager.get_logger(__name__)
+        self.cache = cache if cache is not None else MemoryCache()
 
         self.router = APIRouter(prefix="/communities", tags=["Community Areas"])
 
@@ -318,14 +760,489 @@ class CommunityRouter:
             "/{community_id}", self.get, methods=["GET"], response_model=CommunitySchema
         )
 
-    def list(self, request: Request):
+    def list(self, request: Request, response: Response):
+        validators, not_modified = conditional_get(request, self.cache, *COMMUNITIES_TABLES)
+        if not_modified is not None:
+            return not_modified
+        response.headers.update(validators)
+
+        cached = self.cache.get(COMMUNITIES_CACHE_KEY)
+        if cached is not None:
+            return cached
+
         db_session: Session = request.state.db_session
-        return db_session.query(CommunityArea).all()
+        data = [
+            CommunitySchema.model_validate(area, from_attributes=True).model_dump(mode="json")
+            for area in db_session.query(CommunityArea).all()
+        ]
+        self.cache.set(COMMUNITIES_CACHE_KEY, data, ttl=CATALOG_TTL)
+        return data
 
     def get(self, community_id: int, request: Request):
+        cached = self.cache.get(community_cache_key(community_id))
+        if cached is not None:
+            return cached
+
         db_session: Session = request.state.db_session
         area = db_session.query(CommunityArea).get(community_id)
         
         if not area:
             raise HTTPException(status_code=404, detail="Area no encontrada")
-        return area
\ No newline at end of file
+        data = CommunitySchema.model_validate(area, from_attributes=True).model_dump(mode="json")
+        self.cache.set(community_cache_key(community_id), data, ttl=CATALOG_TTL)
+        return data
+
+# ==========================================
+# 4. ROUTER DE ANALYTICS (Reportes de SQL/4_Consultas.sql)
+# ==========================================
+def _ratio(numerator, denominator):
+    """SUM(a) / SUM(b) sin dividir entre cero."""
+    return func.sum(numerator) / func.nullif(func.sum(denominator), 0)
+
+
+class AnalyticsRouter:
+    """
+    Reportes de SQL/4_Consultas.sql servidos desde resumen_viajes en lugar
+    de recorrer viajes/pagos/ciudad_viaje completos en cada request.
+    La matriz origen-destino sale del cubo en memoria (db/od_cube.py).
+    """
+    router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+    def __init__(self, db_session_manager: DBSessionManager, logger_session_manager: LoggerSessionManager, od_cube=None):
+        self.db_session_manager = db_session_manager
+        self.logger_session = logger_session_manager
+        self.logger = logger_session_manager.get_logger(__name__)
+        self.od_cube = od_cube
+
+        self.router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+        # GET /analytics/horarios (Consulta 1: viajes por intervalo del día y año)
+        self.router.add_api_route(
+            "/horarios", self.horarios, methods=["GET"], response_model=List[HorarioStats]
+        )
+
+        # GET /analytics/mensual (Consulta 2: promedios mensuales)
+        self.router.add_api_route(
+            "/mensual", self.mensual, methods=["GET"], response_model=List[MensualStats]
+        )
+
+        # GET /analytics/zonas (Consultas 3 a 6: por zona de origen o destino)
+        self.router.add_api_route(
+            "/zonas", self.zonas, methods=["GET"], response_model=List[ZonaStats]
+        )
+
+        # GET /analytics/od-matrix (viajes entre pares de zonas, sin tocar la BD)
+        self.router.add_api_route(
+            "/od-matrix", self.od_matrix, methods=["GET"], response_model=ODMatrix
+        )
+
+    def horarios(
+        self,
+        request: Request,
+        detalle: str = Query(default="intervalo", pattern="^(intervalo|hora)$", description="Agrupar por intervalo de 6 horas o por hora exacta"),
+    ):
+        db_session: Session = request.state.db_session
+        self.logger.info(f"Analytics horarios: detalle={detalle}")
+
+        if detalle == "hora":
+            intervalo = ResumenViajes.hora
+        else:
+            intervalo = case(
+                (ResumenViajes.hora < 6, "Madrugada (00:00 - 05:59)"),
+                (ResumenViajes.hora < 12, "Mañana (06:00 - 11:59)"),
+                (ResumenViajes.hora < 18, "Tarde (12:00 - 17:59)"),
+                else_="Noche (18:00 - 23:59)",
+            )
+
+        rows = db_session.execute(
+            select(
+                ResumenViajes.anio,
+                intervalo.label("intervalo"),
+                func.sum(ResumenViajes.viajes).label("total_viajes"),
+            )
+            .group_by(ResumenViajes.anio, intervalo)
+            .order_by(ResumenViajes.anio, intervalo)
+        ).all()
+
+        totales_por_anio = {}
+        for row in rows:
+            totales_por_anio[row.anio] = totales_por_anio.get(row.anio, 0) + row.total_viajes
+
+        return [
+            HorarioStats(
+                anio=row.anio,
+                intervalo=f"{row.intervalo:02d}:00" if detalle == "hora" else row.intervalo,
+                total_viajes=row.total_viajes,
+                porcentaje_por_anio=round(row.total_viajes * 100.0 / totales_por_anio[row.anio], 2)
+                if totales_por_anio[row.anio] else 0.0,
+            )
+            for row in rows
+        ]
+
+    def mensual(
+        self,
+        request: Request,
+        anio: int = Query(default=None, description="Filtrar por año"),
+    ):
+        db_session: Session = request.state.db_session
+        self.logger.info(f"Analytics mensual: anio={anio}")
+
+        query = select(
+            ResumenViajes.anio,
+            ResumenViajes.mes,
+            func.sum(ResumenViajes.viajes).label("total_viajes"),
+            _ratio(ResumenViajes.suma_fare, ResumenViajes.viajes_con_pago).label("tarifa"),
+            _ratio(ResumenViajes.suma_tips, ResumenViajes.viajes_con_pago).label("propinas"),
+            _ratio(ResumenViajes.suma_millas, ResumenViajes.viajes_con_millas).label("distancia_millas"),
+            _ratio(ResumenViajes.suma_trip_total, ResumenViajes.suma_millas).label("precio_promedio_por_milla"),
+        )
+        if anio is not None:
+            query = query.where(ResumenViajes.anio == anio)
+
+        query = (
+            query.group_by(ResumenViajes.anio, ResumenViajes.mes)
+            .having(func.sum(ResumenViajes.viajes) > 0)
+            .order_by(ResumenViajes.anio, ResumenViajes.mes)
+        )
+        return [row._asdict() for row in db_session.execute(query)]
+
+    def zonas(
+        self,
+        request: Request,
+        tipo: str = Query(default="pickup", pattern="^(pickup|dropoff)$", description="Agrupar por zona de origen (pickup) o destino (dropoff)"),
+        community_id: int = Query(default=None, ge=1, description="Filtrar por una zona"),
+        anio: int = Query(default=None, description="Filtrar por año"),
+    ):
+        db_session: Session = request.state.db_session
+        self.logger.info(f"Analytics zonas: tipo={tipo}, community_id={community_id}, anio={anio}")
+
+        zona = (
+            ResumenViajes.pickup_community_area if tipo == "pickup"
+            else ResumenViajes.dropoff_community_area
+        )
+
+        query = (
+            select(
+                zona.label("zona_id"),
+                CommunityArea.community.label("nombre_zona"),
+                ResumenViajes.anio,
+                ResumenViajes.mes,
+                func.sum(ResumenViajes.viajes).label("total_viajes"),
+                _ratio(ResumenViajes.suma_fare, ResumenViajes.viajes_con_pago).label("avg_fare"),
+                _ratio(ResumenViajes.suma_tips, ResumenViajes.viajes_con_pago).label("avg_tips"),
+                _ratio(ResumenViajes.suma_millas, ResumenViajes.viajes_con_millas).label("avg_distance_miles"),
+                (_ratio(ResumenViajes.suma_duracion_segundos, ResumenViajes.viajes_con_duracion) / 60).label("avg_duration_minutes"),
+                _ratio(ResumenViajes.suma_trip_total, ResumenViajes.viajes_con_pago).label("avg_trip_total"),
+                func.sum(ResumenViajes.suma_trip_total).label("ingresos_totales"),
+                func.sum(ResumenViajes.suma_millas).label("millas_totales"),
+                _ratio(ResumenViajes.suma_trip_total, ResumenViajes.suma_millas).label("precio_promedio_por_milla"),
+            )
+            .join(CommunityArea, CommunityArea.community_id == zona)
+        )
+        if community_id is not None:
+            query = query.where(zona == community_id)
+        if anio is not None:
+            query = query.where(ResumenViajes.anio == anio)
+
+        query = (
+            query.group_by(zona, CommunityArea.community, ResumenViajes.anio, ResumenViajes.mes)
+            .having(func.sum(ResumenViajes.viajes) > 0)
+            .order_by(zona, ResumenViajes.anio, ResumenViajes.mes)
+        )
+        return [row._asdict() for row in db_session.execute(query)]
+
+    def od_matrix(
+        self,
+        desde: Optional[date] = Query(default=None, description="Primer día (incluido); por omisión el inicio del cubo"),
+        hasta: Optional[date] = Query(default=None, description="Último día (incluido); por omisión el final del cubo"),
+        hora_desde: int = Query(default=0, ge=0, le=23, description="Primera hora del día (incluida)"),
+        hora_hasta: int = Query(default=23, ge=0, le=23, description="Última hora del día (incluida)"),
+    ):
+        """
+        Viajes, ingresos y millas promedio por par (zona de recogida, zona
+        de llegada). Solo se devuelven los pares con viajes. Si el cubo
+        agrupa varios días por bloque, el rango se amplía a bloques
+        completos y desde/hasta de la respuesta indican el rango efectivo.
+        """
+        cube = self.od_cube
+        if cube is None or not cube.loaded:
+            raise HTTPException(status_code=503, detail="El cubo origen-destino no está disponible")
+        # Escrituras de otros workers o de la CLI: recarga en segundo plano
+        cube.refresh(self.db_session_manager.ReadSessionLocal)
+        desde = desde or cube.start
+        hasta = hasta or (cube.end - timedelta(days=1))
+        if hasta < desde or hora_hasta < hora_desde:
+            raise HTTPException(status_code=400, detail="Rango inválido: desde/hora_desde deben ser menores o iguales que hasta/hora_hasta")
+        self.logger.info(f"Analytics od-matrix: desde={desde}, hasta={hasta}, horas={hora_desde}-{hora_hasta}")
+
+        result = cube.matrix(desde, hasta, hora_desde, hora_hasta)
+        viajes = result["viajes"]
+        pickups, dropoffs = cube.np.nonzero(viajes)
+        celdas = [
+            ODCell(
+                pickup_community_area=int(pickup),
+                dropoff_community_area=int(dropoff),
+                viajes=int(viajes[pickup, dropoff]),
+                ingresos=round(float(result["ingresos"][pickup, dropoff]), 2),
+                millas_promedio=round(float(result["millas"][pickup, dropoff] / result["viajes_con_millas"][pickup, dropoff]), 2)
+                if result["viajes_con_millas"][pickup, dropoff] else None,
+            )
+            for pickup, dropoff in zip(pickups, dropoffs)
+        ]
+        return ODMatrix(
+            desde=result["desde"],
+            hasta=result["hasta"],
+            granularidad_dias=cube.day_step,
+            hora_desde=hora_desde,
+            hora_hasta=hora_hasta,
+            total_viajes=int(viajes.sum()),
+            celdas=celdas,
+        )
+
+
+# ==========================================
+# 5. ROUTER DE TAXIS (Estadísticas por taxi desde resumen_taxis)
+# ==========================================
+def _per_taxi(numerator, denominator):
+    """a / b de una fila de resumen_taxis sin dividir entre cero."""
+    return numerator / func.nullif(denominator, 0)
+
+
+# Columna de resumen_taxis por la que se ordena /taxis/top?by=
+TAXI_RANKINGS = {
+    "revenue": ResumenTaxis.suma_trip_total,
+    "trips": ResumenTaxis.viajes,
+    "miles": ResumenTaxis.suma_millas,
+}
+
+
+class TaxisRouter:
+    """
+    Estadísticas por taxi (gráficas viajes_por_taxi / ingreso_por_taxi)
+    leídas de resumen_taxis: una fila por taxi, sin agregar viajes en cada
+    request.
+    """
+    router = APIRouter(prefix="/taxis", tags=["Taxis"])
+
+    def __init__(self, db_session_manager: DBSessionManager, logger_session_manager: LoggerSessionManager):
+        self.db_session_manager = db_session_manager
+        self.logger_session = logger_session_manager
+        self.logger = logger_session_manager.get_logger(__name__)
+
+        self.router = APIRouter(prefix="/taxis", tags=["Taxis"])
+
+        # GET /taxis/top (ranking de la flota)
+        self.router.add_api_route(
+            "/top", self.top, methods=["GET"], response_model=List[TaxiStats]
+        )
+
+        # GET /taxis/{taxi_id}/stats
+        self.router.add_api_route(
+            "/{taxi_id}/stats", self.stats, methods=["GET"], response_model=TaxiStats
+        )
+
+    @staticmethod
+    def _select():
+        return select(
+            ResumenTaxis.taxi_id,
+            ResumenTaxis.viajes.label("total_viajes"),
+            ResumenTaxis.suma_trip_total.label("ingresos_totales"),
+            ResumenTaxis.suma_millas.label("millas_totales"),
+            _per_taxi(ResumenTaxis.suma_fare, ResumenTaxis.viajes_con_pago).label("avg_fare"),
+            _per_taxi(ResumenTaxis.suma_tips, ResumenTaxis.viajes_con_pago).label("avg_tips"),
+            _per_taxi(ResumenTaxis.suma_trip_total, ResumenTaxis.viajes_con_pago).label("avg_trip_total"),
+            _per_taxi(ResumenTaxis.suma_millas, ResumenTaxis.viajes_con_millas).label("avg_distance_miles"),
+            (_per_taxi(ResumenTaxis.suma_duracion_segundos, ResumenTaxis.viajes_con_duracion) / 60).label("avg_duration_minutes"),
+            _per_taxi(ResumenTaxis.suma_trip_total, ResumenTaxis.suma_millas).label("precio_promedio_por_milla"),
+        ).where(ResumenTaxis.viajes > 0)
+
+    def stats(self, taxi_id: str, request: Request):
+        db_session: Session = request.state.db_session
+        self.logger.info(f"Taxis stats: taxi_id={taxi_id}")
+
+        row = db_session.execute(self._select().where(ResumenTaxis.taxi_id == taxi_id)).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Taxi no encontrado")
+        return row._asdict()
+
+    def top(
+        self,
+        request: Request,
+        by: str = Query(default="revenue", pattern="^(revenue|trips|miles)$", description="Ordenar por ingresos, número de viajes o millas"),
+        limit: int = Query(default=10, ge=1, le=1000, description="Número de taxis"),
+    ):
+        db_session: Session = request.state.db_session
+        self.logger.info(f"Taxis top: by={by}, limit={limit}")
+
+        query = (
+            self._select()
+            .order_by(TAXI_RANKINGS[by].desc(), ResumenTaxis.taxi_id)
+            .limit(limit)
+        )
+        return [row._asdict() for row in db_session.execute(query)]
+
+
+# ==========================================
+# 6. ROUTER DE GRÁFICAS (imágenes de "ERD y graficas/" desde los resúmenes)
+# ==========================================
+class ChartsRouter:
+    """
+    Gráficas PNG generadas a partir de resumen_viajes / resumen_taxis. La
+    consulta corre en el threadpool y el dibujo en un pool de procesos
+    (api/charts.py), así que ninguna de las dos bloquea el event loop.
+    """
+    router = APIRouter(prefix="/charts", tags=["Charts"])
+
+    def __init__(
+        self,
+        db_session_manager: DBSessionManager,
+        logger_session_manager: LoggerSessionManager,
+        cache: Optional[Cache] = None,
+    ):
+        self.db_session_manager = db_session_manager
+        self.logger_session = logger_session_manager
+        self.logger = logger_session_manager.get_logger(__name__)
+        self.cache = cache if cache is not None else MemoryCache()
+
+        self.router = APIRouter(prefix="/charts", tags=["Charts"])
+
+        # GET /charts/ (Gráficas disponibles)
+        self.router.add_api_route("/", self.list, methods=["GET"], response_model=List[str])
+
+        # GET /charts/{name} (PNG)
+        self.router.add_api_route(
+            "/{name}", self.chart, methods=["GET"], response_class=Response,
+            responses={200: {"content": {"image/png": {}}}, 304: {"description": "La imagen no cambió (If-None-Match)"}},
+        )
+
+    def on_write(self, db_session: Session, trip_ids: Trips, sign: int) -> None:
+        """
+        Hook de adjust_rollups (main.py lo agrega a rollup_hooks): cada
+        escritura que ajusta los resúmenes cambia la versión de los datos,
+        y con ella la llave y el ETag de todas las gráficas.
+        """
+        bump_data_version(db_session, self.cache)
+
+    def list(self):
+        return list(CHARTS)
+
+    async def chart(
+        self,
+        name: str,
+        request: Request,
+        anio: int = Query(default=None, description="Filtrar por año (gráficas de resumen_viajes)"),
+        top: int = Query(default=10, ge=1, le=50, description="Número de zonas o taxis en los rankings"),
+    ):
+        """
+        Devuelve la gráfica en PNG. Se cachea por (gráfica, parámetros,
+        versión de los datos) y se responde 304 si el ETag del cliente
+        coincide; solo se vuelve a dibujar después de una escritura.
+        """
+        if name not in CHARTS:
+            raise HTTPException(status_code=404, detail=f"Gráfica no encontrada. Opciones: {', '.join(CHARTS)}")
+        if not charts_available():
+            raise HTTPException(status_code=503, detail="matplotlib no está instalado (extra 'charts')")
+
+        params = {"anio": anio, "top": top}
+        version = data_version(self.cache)
+        etag = chart_etag(name, params, version)
+        # no-cache: el navegador guarda la imagen pero revalida con el ETag
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+
+        key = chart_cache_key(name, params, version)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return Response(base64.b64decode(cached), media_type="image/png", headers=headers)
+
+        self.logger.info(f"Dibujando gráfica {name}: {params}")
+        db_session: Session = request.state.db_session
+        data = await run_in_threadpool(CHARTS[name], db_session, anio, top)
+        png = await render_chart(data)
+        # El cache guarda valores JSON: la imagen va en base64
+        self.cache.set(key, base64.b64encode(png).decode("ascii"), ttl=CHART_TTL)
+        return Response(png, media_type="image/png", headers=headers)
+
+
+# ==========================================
+# 7. ROUTER DE SALUD (Pool de conexiones)
+# ==========================================
+class HealthRouter:
+    router = APIRouter(prefix="/health", tags=["Health"])
+
+    def __init__(self, db_session_manager: DBSessionManager, logger_session_manager: LoggerSessionManager):
+        self.db_session_manager = db_session_manager
+        self.logger_session = logger_session_manager
+        self.logger = logger_session_manager.get_logger(__name__)
+
+        self.router = APIRouter(prefix="/health", tags=["Health"])
+
+        # GET /health/db (SELECT 1 + estado del pool)
+        self.router.add_api_route(
+            "/db", self.db, methods=["GET"], response_model=DBHealth
+        )
+
+    def db(self):
+        """
+        Verifica la conexión (SELECT 1) y reporta el estado de cada pool:
+        conexiones prestadas, libres, en overflow y el tiempo que los
+        requests esperan por una conexión. Responde 503 si la BD no contesta.
+        No usa la sesión del request para no quedar atrás de otros en el pool.
+        """
+        latency_ms = {}
+        status = "ok"
+        # Los engines async no se pueden usar desde el threadpool; se reporta su pool
+        for name in ("primary", "replica"):
+            engine = self.db_session_manager.engines().get(name)
+            if engine is None:
+                continue
+            try:
+                latency_ms[name] = self.db_session_manager.ping(engine)
+            except Exception as e:
+                self.logger.error(f"Health check de {name} falló: {e}")
+                latency_ms[name] = None
+                status = "error"
+
+        health = DBHealth(status=status, latency_ms=latency_ms, pools=self.db_session_manager.pool_report())
+        if status != "ok":
+            return JSONResponse(status_code=503, content=health.model_dump())
+        return health
+
+
+# ==========================================
+# 8. ROUTER DE MÉTRICAS (Prometheus)
+# ==========================================
+class MetricsRouter:
+    router = APIRouter(tags=["Health"])
+
+    def __init__(
+        self,
+        db_session_manager: DBSessionManager,
+        logger_session_manager: LoggerSessionManager,
+        metrics: Metrics,
+        cache: Optional[Cache] = None,
+    ):
+        self.db_session_manager = db_session_manager
+        self.logger_session = logger_session_manager
+        self.logger = logger_session_manager.get_logger(__name__)
+        self.metrics = metrics
+        self.cache = cache
+
+        self.router = APIRouter(tags=["Health"])
+
+        # GET /metrics (formato de texto de Prometheus)
+        self.router.add_api_route("/metrics", self.export, methods=["GET"], response_class=PlainTextResponse)
+
+    def export(self):
+        """
+        Latencia por ruta, sentencias SQL y tiempo de BD por request,
+        consultas lentas, estado/espera de cada pool de conexiones y
+        aciertos/fallos/tamaño del cache.
+        """
+        cache_stats = self.cache.stats() if self.cache is not None else None
+        return PlainTextResponse(
+            self.metrics.render(self.db_session_manager.pool_report(), cache_stats),
+            media_type="text/plain; version=0.0.4",
+        )
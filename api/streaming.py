@@ -0,0 +1,55 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterable, Iterator, List
+
+from util.serialization import json_default
+
+# Formatos soportados por los endpoints que transmiten filas
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def iter_ndjson(columns: List[str], rows: Iterable[tuple], batch_size: int = 500) -> Iterator[bytes]:
+    """
+    Convierte filas (tuplas) en líneas JSON. Se agrupan en bloques para
+    no mandar un chunk HTTP por fila.
+    """
+    buffer = []
+    for row in rows:
+        buffer.append(json.dumps(dict(zip(columns, row)), default=json_default))
+        if len(buffer) >= batch_size:
+            yield ("\n".join(buffer) + "\n").encode()
+            buffer.clear()
+    if buffer:
+        yield ("\n".join(buffer) + "\n").encode()
+
+
+def iter_csv(columns: List[str], rows: Iterable[tuple], batch_size: int = 500) -> Iterator[bytes]:
+    """Igual que iter_ndjson pero en CSV, con la fila de encabezados primero."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    pending = 1
+    for row in rows:
+        writer.writerow(
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in row
+        )
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode()
+
+
+def iter_format(fmt: str, columns: List[str], rows: Iterable[tuple]) -> Iterator[bytes]:
+    if fmt == "csv":
+        return iter_csv(columns, rows)
+    return iter_ndjson(columns, rows)
@@ -0,0 +1,107 @@
+"""
+Compara el modo síncrono contra el modo async de la API con la misma
+mezcla de requests y el mismo nivel de concurrencia.
+
+Levantar ambos servidores (un worker cada uno) y correr:
+
+    DB_ASYNC=0 uvicorn main:app --port 8000
+    DB_ASYNC=1 uvicorn main:app --port 8001
+    python benchmarks/async_vs_sync.py --sync http://localhost:8000 --async http://localhost:8001
+
+Reporta requests/s y latencias p50/p95/p99 por modo.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+# Mezcla de lecturas típica de los dashboards
+REQUEST_MIX = [
+    "/viajes/?limit=100",
+    "/viajes/?limit=100&pickup_community_id=8",
+    "/viajes/?limit=100&trip_start_after=2021-06-01&trip_end_before=2021-06-02",
+    "/pagos/?limit=100&min_total=50",
+    "/communities/",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(base_url: str, total: int, concurrency: int, timeout: float) -> dict:
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+
+        async def worker():
+            nonlocal errors
+            for index in counter:
+                path = REQUEST_MIX[index % len(REQUEST_MIX)]
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "url": base_url,
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sync", dest="sync_url", default="http://localhost:8000")
+    parser.add_argument("--async", dest="async_url", default="http://localhost:8001")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for mode, url in (("sync", args.sync_url), ("async", args.async_url)):
+        # Calentamiento para llenar el pool de conexiones
+        asyncio.run(run(url, min(200, args.requests), min(20, args.concurrency), args.timeout))
+        results[mode] = asyncio.run(run(url, args.requests, args.concurrency, args.timeout))
+
+    print(f"{'modo':<6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errores':>8}")
+    for mode, result in results.items():
+        print(
+            f"{mode:<6} {result['rps']:>9} {result['p50_ms']:>9} "
+            f"{result['p95_ms']:>9} {result['p99_ms']:>9} {result['errors']:>8}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Mide con EXPLAIN ANALYZE las consultas de los filtros de la API y de los
+reportes de SQL/4_Consultas.sql, para comparar antes y después de aplicar
+las migraciones de índices/particiones.
+
+    alembic stamp 0001_esquema_base          # BD creada con los scripts de SQL/ (ver 0001)
+    python benchmarks/explain_indices.py --output antes.json
+    alembic upgrade head                     # o: alembic -x particionar=true upgrade head
+    python benchmarks/explain_indices.py --output despues.json
+    python benchmarks/explain_indices.py --compare antes.json despues.json
+
+Cada consulta se ejecuta --repeat veces y se reporta la mediana del tiempo
+de ejecución, los tipos de scan por tabla y los buffers leídos.
+"""
+import argparse
+import json
+import statistics
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, select, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from api.filters import ViajeFilters  # noqa: E402
+from db.config import DBSettings  # noqa: E402
+from db.entities import Viaje  # noqa: E402
+
+
+def viaje_filters(**values) -> ViajeFilters:
+    """ViajeFilters fuera de FastAPI: los Query() por defecto se reemplazan por None."""
+    params = dict.fromkeys(
+        [
+            "taxi_id",
+            "pickup_community_id",
+            "dropoff_community_id",
+            "trip_miles_min",
+            "trip_miles_max",
+            "trip_start_after",
+            "trip_end_before",
+            "trip_total",
+        ]
+    )
+    params.update(values)
+    return ViajeFilters(**params)
+
+
+def api_query(filters: ViajeFilters):
+    """Mismo SELECT que arma ViajesRouter.list para la primera página."""
+    stmt = filters.apply(select(Viaje))
+    if filters.orders_by_start:
+        stmt = stmt.order_by(Viaje.trip_start_timestamp, Viaje.trip_id)
+    else:
+        stmt = stmt.order_by(Viaje.trip_id)
+    return stmt.limit(100)
+
+
+API_QUERIES = {
+    "api_pickup": viaje_filters(pickup_community_id=8),
+    "api_dropoff": viaje_filters(dropoff_community_id=32),
+    "api_millas": viaje_filters(trip_miles_min=20, trip_miles_max=30),
+    "api_ventana_dia": viaje_filters(trip_start_after="2021-06-01", trip_end_before="2021-06-02"),
+    "api_trip_total": viaje_filters(trip_total=150),
+    "api_zona_y_fecha": viaje_filters(pickup_community_id=76, trip_start_after="2022-01-01", trip_end_before="2022-02-01"),
+}
+
+# Reportes de SQL/4_Consultas.sql; los que tienen rango de fechas son los
+# que se benefician de BRIN y de la poda de particiones
+REPORT_QUERIES = {
+    "reporte_horas": """
+        SELECT EXTRACT(YEAR FROM trip_start_timestamp) AS anio,
+               EXTRACT(HOUR FROM trip_start_timestamp) AS hora,
+               COUNT(*)
+        FROM viajes
+        GROUP BY 1, 2
+    """,
+    "reporte_mensual_2021": """
+        SELECT EXTRACT(MONTH FROM v.trip_start_timestamp) AS mes,
+               AVG(p.fare), AVG(p.tips), COUNT(*)
+        FROM viajes v
+        JOIN pagos p ON p.trip_id = v.trip_id
+        WHERE v.trip_start_timestamp >= '2021-01-01' AND v.trip_start_timestamp < '2022-01-01'
+        GROUP BY 1
+    """,
+    "reporte_zona_pickup_mes": """
+        SELECT ca.community, COUNT(*), AVG(p.trip_total)
+        FROM viajes v
+        JOIN ciudad_viaje cv ON cv.trip_id = v.trip_id
+        JOIN pagos p ON p.trip_id = v.trip_id
+        JOIN community_area ca ON ca.community_id = cv.pickup_community_area
+        WHERE v.trip_start_timestamp >= '2020-03-01' AND v.trip_start_timestamp < '2020-04-01'
+        GROUP BY ca.community
+    """,
+    "reporte_una_zona": """
+        SELECT EXTRACT(YEAR FROM v.trip_start_timestamp) AS anio, COUNT(*), AVG(p.tips)
+        FROM ciudad_viaje cv
+        JOIN viajes v ON v.trip_id = cv.trip_id
+        JOIN pagos p ON p.trip_id = cv.trip_id
+        WHERE cv.pickup_community_area = 8
+        GROUP BY 1
+    """,
+}
+
+
+def scans(plan: dict, found=None) -> list:
+    """Recorre el plan y junta (tipo de nodo, tabla, índice) de cada scan."""
+    found = [] if found is None else found
+    if "Scan" in plan.get("Node Type", ""):
+        found.append(
+            {
+                "node": plan["Node Type"],
+                "relation": plan.get("Relation Name"),
+                "index": plan.get("Index Name"),
+            }
+        )
+    for child in plan.get("Plans", []):
+        scans(child, found)
+    return found
+
+
+def explain(connection, sql: str, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        (result,) = connection.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")).one()
+        runs.append(result[0])
+
+    last = runs[-1]
+    plan = last["Plan"]
+    return {
+        "execution_ms": statistics.median(run["Execution Time"] for run in runs),
+        "planning_ms": statistics.median(run["Planning Time"] for run in runs),
+        "shared_hit": plan.get("Shared Hit Blocks"),
+        "shared_read": plan.get("Shared Read Blocks"),
+        "scans": scans(plan),
+    }
+
+
+def measure(database_url: str, repeat: int) -> dict:
+    engine = create_engine(database_url)
+    queries = {
+        name: str(api_query(filters).compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+        for name, filters in API_QUERIES.items()
+    }
+    queries.update(REPORT_QUERIES)
+
+    results = {}
+    with engine.connect() as connection:
+        for name, sql in queries.items():
+            results[name] = explain(connection, sql, repeat)
+            print(f"{name:<26} {results[name]['execution_ms']:>10.1f} ms  "
+                  f"{', '.join(sorted({scan['node'] for scan in results[name]['scans']}))}")
+    return results
+
+
+def compare(before_path: str, after_path: str) -> None:
+    before = json.loads(Path(before_path).read_text())
+    after = json.loads(Path(after_path).read_text())
+    print(f"{'consulta':<26} {'antes ms':>10} {'después ms':>11} {'mejora':>8}")
+    for name in before:
+        if name not in after:
+            continue
+        a, b = before[name]["execution_ms"], after[name]["execution_ms"]
+        print(f"{name:<26} {a:>10.1f} {b:>11.1f} {a / b if b else float('inf'):>7.1f}x")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DBSettings.from_env().database_url)
+    parser.add_argument("--repeat", type=int, default=3, help="Ejecuciones por consulta (se usa la mediana)")
+    parser.add_argument("--output", help="Archivo JSON con los resultados")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "DESPUES"), help="Compara dos resultados guardados")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    results = measure(args.database_url, args.repeat)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
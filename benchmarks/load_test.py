@@ -0,0 +1,337 @@
+"""
+Prueba de carga reproducible: siembra una BD con viajes sintéticos y
+reproduce (amplificada) una mezcla de requests grabada contra main:app.
+
+    # 1. BD de pruebas con 1M de viajes (no usar la BD real: se agregan filas bench*)
+    DATABASE_URL=postgresql+psycopg2://postgres:@localhost:5432/taxis_bench \\
+        python benchmarks/load_test.py seed --trips 1000000
+
+    # 2. Reproducir benchmarks/traffic.jsonl: en proceso (ASGI, sin red) o contra un servidor
+    python benchmarks/load_test.py run --requests 20000 --concurrency 50 --output antes.json
+    METRICS_SERVER_TIMING=1 python cli.py serve --workers 4 &
+    python benchmarks/load_test.py run --url http://localhost:8000 --output antes.json
+
+    # 3. Comparar entre commits
+    python benchmarks/load_test.py compare antes.json despues.json
+
+El tráfico es un JSONL con una línea por tipo de request:
+
+    {"name": "viajes_detalle", "method": "GET", "path": "/viajes/{trip_id}", "weight": 25}
+
+{trip_id} y {community_id} se reemplazan por valores sembrados al azar y el
+valor "{trip_ids}" en el body por una lista de --lookup-size IDs. Las líneas
+sin "path" se ignoran. Con la misma --seed se generan los mismos requests.
+
+Por endpoint se reportan p50/p95/p99, requests/s y sentencias SQL por
+request (del header Server-Timing de util/metrics.py).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.async_vs_sync import percentile  # noqa: E402
+from db.config import DBSettings  # noqa: E402
+
+DEFAULT_TRAFFIC = Path(__file__).with_name("traffic.jsonl")
+
+# Prefijo de los viajes sintéticos; los IDs son deterministas para que el
+# replay pueda pedir viajes que existen sin consultar la BD
+TRIP_PREFIX = "bench"
+
+# Las 77 zonas de Chicago (community_area)
+COMMUNITY_IDS = range(1, 78)
+
+# Ventana de fechas del análisis (2019-2022)
+START = datetime(2019, 1, 1)
+SPAN_SECONDS = int((datetime(2023, 1, 1) - START).total_seconds())
+
+_SQL_STATEMENTS = re.compile(r'desc="(\d+) sentencias"')
+
+
+def trip_id(index: int) -> str:
+    return f"{TRIP_PREFIX}{index:010d}"
+
+
+# --- Siembra ---
+def synthetic_trips(count: int, seed: int, offset: int = 0):
+    """Viajes completos (columnas de Viaje, Pago y CiudadViaje de db/entities.py)."""
+    rng = random.Random(seed + offset)
+    for index in range(offset, offset + count):
+        start = START + timedelta(seconds=rng.randrange(SPAN_SECONDS))
+        minutes = rng.randint(3, 60)
+        miles = Decimal(rng.randint(1, 300)) / 10
+        fare = Decimal(325 + int(miles * 225)) / 100
+        tips = Decimal(rng.choice([0, 0, 100, 200, 300, 500])) / 100
+        extras = Decimal(rng.choice([0, 0, 0, 100, 400])) / 100
+        yield {
+            "trip_id": trip_id(index),
+            "taxi_id": f"{TRIP_PREFIX}-taxi-{rng.randrange(5000)}",
+            "trip_start_timestamp": start,
+            "trip_end_timestamp": start + timedelta(minutes=minutes),
+            "trip_miles": miles,
+            "fare": fare,
+            "tips": tips,
+            "tolls": Decimal(0),
+            "extras": extras,
+            "trip_total": fare + tips + extras,
+            "pickup_community_area": rng.choice(COMMUNITY_IDS),
+            "dropoff_community_area": rng.choice(COMMUNITY_IDS),
+        }
+
+
+def cmd_seed(args) -> int:
+    from sqlalchemy import text
+    from sqlalchemy.dialects.postgresql import insert
+
+    from db.bulk import copy_viajes
+    from db.entities import Base, CommunityArea
+    from db.rollups import rebuild_rollups
+    from db.session import DBSessionManager
+    from util.logger import LoggerSessionManager
+
+    logger_session_manager = LoggerSessionManager()
+    logger = logger_session_manager.get_logger("bench")
+    db_session_manager = DBSessionManager(logger_session_manager, DBSettings.from_env())
+    Base.metadata.create_all(bind=db_session_manager.engine)
+
+    with db_session_manager.get_managed_session() as db_session:
+        db_session.execute(
+            insert(CommunityArea)
+            .values([{"community_id": area, "community": f"ZONA {area}"} for area in COMMUNITY_IDS])
+            .on_conflict_do_nothing()
+        )
+
+    started = time.perf_counter()
+    inserted = 0
+    for offset in range(0, args.trips, args.batch_size):
+        rows = list(synthetic_trips(min(args.batch_size, args.trips - offset), args.seed, offset))
+        with db_session_manager.get_managed_session() as db_session:
+            inserted += len(copy_viajes(db_session, rows))
+        logger.info(f"{offset + len(rows):,}/{args.trips:,} viajes generados ({inserted:,} nuevos)")
+
+    with db_session_manager.get_managed_session() as db_session:
+        rebuild_rollups(db_session)
+        db_session.execute(text("ANALYZE"))
+    logger.info(f"Siembra terminada en {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+# --- Replay ---
+def load_traffic(path: str) -> list:
+    entries = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        if "path" not in entry:
+            continue
+        entry.setdefault("method", "GET")
+        entry.setdefault("name", f"{entry['method']} {entry['path'].split('?')[0]}")
+        entry.setdefault("weight", 1)
+        entries.append(entry)
+    if not entries:
+        raise SystemExit(f"{path} no tiene requests (se esperan líneas con method/path)")
+    return entries
+
+
+def build_requests(entries: list, total: int, trips: int, lookup_size: int, seed: int) -> list:
+    """Muestra ponderada de la mezcla, con los placeholders ya resueltos."""
+    rng = random.Random(seed)
+
+    def fill(value):
+        if value == "{trip_ids}":
+            return [trip_id(rng.randrange(trips)) for _ in range(lookup_size)]
+        if isinstance(value, str):
+            return (
+                value.replace("{trip_id}", trip_id(rng.randrange(trips)))
+                .replace("{community_id}", str(rng.choice(COMMUNITY_IDS)))
+            )
+        if isinstance(value, dict):
+            return {key: fill(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [fill(item) for item in value]
+        return value
+
+    chosen = rng.choices(entries, weights=[entry["weight"] for entry in entries], k=total)
+    return [(entry["name"], entry["method"], fill(entry["path"]), fill(entry.get("body"))) for entry in chosen]
+
+
+def make_client(url, concurrency: int, timeout: float) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if url:
+        return httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout)
+
+    # En proceso: mide la app y la BD sin la red ni uvicorn de por medio
+    os.environ.setdefault("METRICS_SERVER_TIMING", "1")
+    from main import app
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, raise_app_exceptions=False), base_url="http://bench", timeout=timeout)
+
+
+@asynccontextmanager
+async def app_lifespan(url):
+    """ASGITransport no corre el lifespan de main.py (engines y routers); en proceso se corre aquí."""
+    if url:
+        yield
+        return
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        yield
+
+
+async def replay(client: httpx.AsyncClient, requests: list, concurrency: int) -> tuple:
+    samples = defaultdict(list)
+    queue = iter(requests)
+
+    async def worker():
+        for name, method, path, body in queue:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                status = response.status_code
+                match = _SQL_STATEMENTS.search(response.headers.get("server-timing", ""))
+                statements = int(match.group(1)) if match else None
+            except httpx.HTTPError:
+                status, statements = None, None
+            samples[name].append(((time.perf_counter() - started) * 1000, status, statements))
+
+    started = time.perf_counter()
+    async with client:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    latencies = [latency for latency, _, _ in samples]
+    statements = [count for _, _, count in samples if count is not None]
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, status, _ in samples if status is None or status >= 500),
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "sql_per_request": round(statistics.fmean(statements), 2) if statements else None,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parents[1],
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def cmd_run(args) -> int:
+    entries = load_traffic(args.traffic)
+    requests = build_requests(entries, args.requests, args.trips, args.lookup_size, args.seed)
+
+    async def measure():
+        async with app_lifespan(args.url):
+            # Calentamiento: pool de conexiones, caches y planes de Postgres
+            if args.warmup:
+                await replay(make_client(args.url, args.concurrency, args.timeout), requests[:args.warmup], args.concurrency)
+            return await replay(make_client(args.url, args.concurrency, args.timeout), requests, args.concurrency)
+
+    samples, elapsed = asyncio.run(measure())
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "target": args.url or "main:app (en proceso)",
+            "traffic": str(args.traffic),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "trips": args.trips,
+            "seed": args.seed,
+            "elapsed_s": round(elapsed, 3),
+        },
+        "total": summarize([sample for values in samples.values() for sample in values], elapsed),
+        "endpoints": {name: summarize(values, elapsed) for name, values in sorted(samples.items())},
+    }
+
+    print(f"{'endpoint':<28} {'req':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'sql/req':>8} {'err':>5}")
+    for name, result in [*results["endpoints"].items(), ("TOTAL", results["total"])]:
+        print(
+            f"{name:<28} {result['requests']:>7} {result['rps']:>8} {result['p50_ms']:>8} "
+            f"{result['p95_ms']:>8} {result['p99_ms']:>8} {str(result['sql_per_request']):>8} {result['errors']:>5}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+def cmd_compare(args) -> int:
+    before = json.loads(Path(args.before).read_text())
+    after = json.loads(Path(args.after).read_text())
+    print(f"{before['meta'].get('commit')} -> {after['meta'].get('commit')}")
+    print(f"{'endpoint':<28} {'p95 antes':>10} {'p95 después':>12} {'cambio':>8} {'sql antes':>10} {'sql después':>12}")
+    rows = [*after["endpoints"].items(), ("TOTAL", after["total"])]
+    for name, result in rows:
+        previous = before["total"] if name == "TOTAL" else before["endpoints"].get(name)
+        if previous is None:
+            continue
+        change = (result["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100 if previous["p95_ms"] else 0.0
+        print(
+            f"{name:<28} {previous['p95_ms']:>10} {result['p95_ms']:>12} {change:>+7.1f}% "
+            f"{str(previous['sql_per_request']):>10} {str(result['sql_per_request']):>12}"
+        )
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    seed = subparsers.add_parser("seed", help="Siembra viajes sintéticos en DATABASE_URL")
+    seed.add_argument("--trips", type=int, default=100_000)
+    seed.add_argument("--batch-size", type=int, default=50_000, help="Viajes por COPY/transacción")
+    seed.add_argument("--seed", type=int, default=42)
+    seed.set_defaults(handler=cmd_seed)
+
+    run = subparsers.add_parser("run", help="Reproduce la mezcla de requests y mide")
+    run.add_argument("--traffic", default=DEFAULT_TRAFFIC, help="JSONL con la mezcla de requests")
+    run.add_argument("--url", help="Servidor a medir (por defecto main:app en proceso)")
+    run.add_argument("--requests", type=int, default=10_000, help="Total de requests (amplifica la mezcla)")
+    run.add_argument("--concurrency", type=int, default=50)
+    run.add_argument("--warmup", type=int, default=500, help="Requests de calentamiento que no se miden")
+    run.add_argument("--trips", type=int, default=100_000, help="Mismo valor que en seed")
+    run.add_argument("--lookup-size", type=int, default=1000, help="IDs por {trip_ids}")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--timeout", type=float, default=60.0)
+    run.add_argument("--output", help="Archivo JSON con los resultados")
+    run.set_defaults(handler=cmd_run)
+
+    compare = subparsers.add_parser("compare", help="Compara dos resultados guardados")
+    compare.add_argument("before")
+    compare.add_argument("after")
+    compare.set_defaults(handler=cmd_compare)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,17 @@
+-- Datos de benchmarks/resultados: sobre una BD en 0001_esquema_base
+INSERT INTO community_area SELECT g, 'Zona ' || g FROM generate_series(1, 77) g;
+-- 2M viajes en orden cronológico (como llegan del portal), 2019-2022
+CREATE TEMP TABLE t AS
+SELECT g,
+       md5(g::text) AS trip_id,
+       'taxi' || (g::bigint * 7919 % 5000) AS taxi_id,
+       timestamp '2019-01-01' + (g::float / 2000000) * interval '1461 days' + (random() * interval '10 minutes') AS inicio,
+       round((random() * random() * 40)::numeric, 2) AS millas,
+       1 + (floor(random() * random() * 77))::int AS pickup,
+       1 + (floor(random() * 77))::int AS dropoff
+FROM generate_series(1, 2000000) g;
+INSERT INTO viajes SELECT trip_id, taxi_id, inicio, inicio + (5 + millas * 3) * interval '1 minute', millas FROM t;
+INSERT INTO pagos SELECT trip_id, round(3.25 + millas * 2.25, 2), round((random() * 5)::numeric, 2), 0, 0,
+       round(3.25 + millas * 2.25 + (random() * 5)::numeric, 2) FROM t;
+INSERT INTO ciudad_viaje SELECT trip_id, pickup, dropoff FROM t;
+VACUUM ANALYZE;
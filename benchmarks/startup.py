@@ -0,0 +1,113 @@
+"""
+Mide el arranque de la API, lo que paga cada worker nuevo, cada reinicio
+de uvicorn --reload y cada réplica que agrega el autoscaling.
+
+    # Import de main.py y lifespan en proceso (5 intérpretes nuevos)
+    python benchmarks/startup.py
+
+    # Además, desde lanzar `cli.py serve` hasta el primer 200
+    # (más de un worker requiere CACHE_URL)
+    CACHE_URL=redis://localhost:6379/0 python benchmarks/startup.py --workers 4 --port 8010 --output arranque.json
+
+Se reporta por fase (mediana, mín. y máx. en ms):
+
+    import_ms    `import main` en un intérprete nuevo (no debe tocar la BD)
+    lifespan_ms  engines, routers y cubo O-D, antes de aceptar requests
+    ready_ms     de `cli.py serve` al primer 200 en --path (incluye el arranque de uvicorn)
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Corre en un intérprete nuevo: así el import no está cacheado
+_PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def run():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(run())
+print(json.dumps({"import_ms": (imported - started) * 1000, "lifespan_ms": (ready - imported) * 1000}))
+"""
+
+
+def summary(values: list) -> dict:
+    return {
+        "median_ms": round(statistics.median(values), 1),
+        "min_ms": round(min(values), 1),
+        "max_ms": round(max(values), 1),
+    }
+
+
+def measure_in_process(runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE], cwd=ROOT, check=True, capture_output=True, text=True,
+        ).stdout
+        # El JSON es la última línea; antes puede haber logs
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {phase: summary([sample[phase] for sample in samples]) for phase in ("import_ms", "lifespan_ms")}
+
+
+def measure_ready(workers: int, port: int, path: str, timeout: float) -> float:
+    """Desde lanzar `cli.py serve` hasta el primer 200 en path."""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "cli.py", "serve", "--workers", str(workers), "--port", str(port), "--host", "127.0.0.1"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    if client.get(path).status_code == 200:
+                        return (time.perf_counter() - started) * 1000
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.05)
+        raise TimeoutError(f"La API no respondió en {timeout}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Repeticiones por fase")
+    parser.add_argument("--workers", type=int, default=0, help="Workers para ready_ms (0 = no levantar servidor)")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--path", default="/health/db", help="Endpoint que marca al worker como listo")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Archivo JSON con los resultados")
+    args = parser.parse_args()
+
+    results = {"meta": {"python": sys.version.split()[0], "runs": args.runs, "od_cube": os.getenv("OD_CUBE", "1")}}
+    results.update(measure_in_process(args.runs))
+    if args.workers:
+        results["meta"]["workers"] = args.workers
+        results["ready_ms"] = summary([measure_ready(args.workers, args.port, args.path, args.timeout) for _ in range(args.runs)])
+
+    for phase, values in results.items():
+        if phase != "meta":
+            print(f"{phase:<12} mediana {values['median_ms']:>9} ms   mín {values['min_ms']:>9}   máx {values['max_ms']:>9}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""
+Comandos de mantenimiento que no pasan por la API.
+
+Uso:
+    python cli.py schema --sql
+    python cli.py serve --workers 4
+    python cli.py bulk viajes.ndjson
+    python cli.py bulk viajes.csv --batch-size 20000
+    python cli.py ingest Taxi_Trips_2019_2022.csv --workers 8
+    python cli.py rollups
+    python cli.py snapshot snapshot/
+    python cli.py reportes snapshot/ mensual zonas_pickup --formato csv
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Optional
+
+from sqlalchemy import create_mock_engine, select
+
+from api.bulk import parse_bulk
+from db.bulk import copy_viajes
+from db.ingest import completed_chunks, ingest_csv, source_key
+from db.rollups import adjust_rollups, rebuild_rollups
+from db.entities import Base, CommunityArea, ResumenTaxis, ResumenViajes
+from db.session import DBSessionManager
+from util.cache import DATA_VERSION, Cache, bump_data_version, create_cache
+from util.logger import LoggerSessionManager
+
+# Versiones de los datos (ETag/304 de los listados, /charts) que cambian
+# los comandos que escriben viajes y pagos
+WRITTEN_VERSIONS = ("viajes", "pagos", DATA_VERSION)
+
+
+def shared_cache() -> Optional[Cache]:
+    """
+    El cache de la API si es compartido (CACHE_URL), para que las cargas
+    de la CLI descarten las versiones de los datos como una escritura de
+    la API. El cache en memoria es del proceso del worker: ahí una carga
+    de la CLI se nota cuando la versión expira (DATA_VERSION_TTL).
+    """
+    return create_cache() if os.getenv("CACHE_URL") else None
+
+
+def cmd_schema(args, db_session_manager: DBSessionManager, logger: logging.Logger) -> int:
+    """
+    Crea las tablas que falten según db/entities.py (BD local o de
+    pruebas; la BD real se administra con `alembic upgrade head`). Con
+    --sql solo imprime el DDL, sin conectarse.
+    """
+    engine = db_session_manager.engine
+    if args.sql:
+        def executor(sql, *multiparams, **params):
+            print(f"{str(sql.compile(dialect=mock_engine.dialect)).strip()};\n")
+
+        mock_engine = create_mock_engine(engine.url, executor)
+        Base.metadata.create_all(bind=mock_engine, checkfirst=False)
+        return 0
+
+    started = time.perf_counter()
+    Base.metadata.create_all(bind=engine)
+    logger.info(f"Esquema creado/verificado en {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+def cmd_serve(args, db_session_manager: DBSessionManager, logger: logging.Logger) -> int:
+    """
+    Levanta la API con varios workers de uvicorn (procesos independientes,
+    cada uno con sus pools y su cubo O-D).
+    WEB_CONCURRENCY se fija antes de crear los workers para que cada uno
+    reparta DB_MAX_CONNECTIONS entre todos (ver db/config.py).
+
+    Con más de un worker se exige CACHE_URL: las invalidaciones, las
+    versiones del ETag y las gráficas cacheadas tienen que ser las mismas
+    en todos (el cubo O-D se recarga solo, ver OD_CUBE_REFRESH).
+    """
+    import uvicorn
+
+    workers = 1 if args.reload else args.workers
+    if workers > 1 and not os.getenv("CACHE_URL"):
+        logger.error(
+            f"--workers {workers} requiere un cache compartido: configure CACHE_URL=redis://... "
+            "(extra 'cache') o use --workers 1"
+        )
+        return 1
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    logger.info(f"API en http://{args.host}:{args.port} con {workers} worker(s)")
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=None if args.reload else workers,
+        reload=args.reload,
+        # Sin esto un worker ocupado no suelta las conexiones al reiniciar
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_config=None,
+    )
+    return 0
+
+
+def cmd_bulk(args, db_session_manager: DBSessionManager, logger: logging.Logger) -> int:
+    """Carga un archivo NDJSON o CSV de viajes completos por lotes."""
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+
+    with db_session_manager.get_managed_session() as db_session:
+        valid_area_ids = set(db_session.scalars(select(CommunityArea.community_id)))
+    cache = shared_cache()
+
+    received = inserted = failed = 0
+    started = time.perf_counter()
+
+    with open(args.path, encoding="utf-8", newline="") as source:
+        # En CSV cada lote se valida con el encabezado al frente
+        header = source.readline() if fmt == "csv" else None
+        # Línea del archivo donde empieza el lote actual
+        next_line = 2 if header is not None else 1
+
+        while True:
+            batch = list(islice(source, args.batch_size))
+            if not batch:
+                break
+            if header is not None:
+                rows, errors = parse_bulk(fmt, [header] + batch, valid_area_ids, first_line=next_line - 1)
+            else:
+                rows, errors = parse_bulk(fmt, batch, valid_area_ids, first_line=next_line)
+
+            # Una transacción por lote: un error de BD no tira lo ya cargado
+            with db_session_manager.get_managed_session() as db_session:
+                new_ids = copy_viajes(db_session, [row.model_dump() for _, row in rows])
+                adjust_rollups(db_session, new_ids, 1)
+                if cache is not None and new_ids:
+                    bump_data_version(db_session, cache, *WRITTEN_VERSIONS)
+
+            for error in errors:
+                logger.warning(f"Línea {error.line} ({error.trip_id}): {error.error}")
+            duplicates = len(rows) - len(new_ids)
+            if duplicates:
+                logger.warning(f"{duplicates} viajes del lote ya existían")
+
+            received += len(rows) + len(errors)
+            inserted += len(new_ids)
+            failed += len(errors) + duplicates
+            next_line += len(batch)
+
+            elapsed = time.perf_counter() - started
+            logger.info(f"{received} filas leídas, {inserted} insertadas ({received / elapsed:,.0f} filas/s)")
+
+    return 0 if failed == 0 else 1
+
+
+def cmd_ingest(args, db_session_manager: DBSessionManager, logger: logging.Logger) -> int:
+    """
+    Carga el CSV crudo del portal de Chicago directo a las tablas
+    normalizadas, reemplazando SQL/1, SQL/2 y SQL/3. Si se interrumpe,
+    volver a correrlo con el mismo --chunk-size continúa donde se quedó.
+    """
+    source = source_key(args.path)
+    with db_session_manager.get_managed_session() as db_session:
+        valid_area_ids = set(db_session.scalars(select(CommunityArea.community_id)))
+        done = completed_chunks(db_session, source, args.chunk_size)
+
+    if not valid_area_ids:
+        logger.error("community_area está vacía; cárgala antes (SQL/3_Normalización.sql)")
+        return 1
+    if done:
+        logger.info(f"Reanudando {source}: {len(done)} chunks ya cargados")
+
+    def progress(totals, elapsed):
+        logger.info(
+            f"{totals['chunks']} chunks, {totals['read']:,} filas leídas, "
+            f"{totals['inserted']:,} insertadas ({totals['read'] / elapsed:,.0f} filas/s)"
+        )
+
+    started = time.perf_counter()
+    totals = ingest_csv(
+        args.path,
+        db_session_manager.settings.database_url,
+        valid_area_ids,
+        done,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        on_progress=progress,
+    )
+    elapsed = time.perf_counter() - started
+
+    cache = shared_cache()
+    if cache is not None and totals["inserted"]:
+        with db_session_manager.get_managed_session() as db_session:
+            bump_data_version(db_session, cache, *WRITTEN_VERSIONS)
+
+    logger.info(f"Ingesta terminada en {elapsed:.1f}s: {totals['read']:,} filas leídas, {totals['inserted']:,} insertadas")
+    for key, count in sorted(totals.items()):
+        if key.startswith("rejected_"):
+            logger.info(f"  descartadas por {key.removeprefix('rejected_')}: {count:,}")
+
+    if not args.sin_resumen:
+        # Una reconstrucción al final es más barata que ajustar el resumen
+        # por chunk y evita bloqueos entre procesos sobre las mismas filas
+        cmd_rollups(args, db_session_manager, logger)
+    return 0
+
+
+def cmd_rollups(args, db_session_manager: DBSessionManager, logger: logging.Logger) -> int:
+    """
+    Reconstruye resumen_viajes y resumen_taxis desde cero (ej. después de
+    cargar con psql). Las crea si faltan: una BD hecha con los scripts de
+    SQL/ y marcada con `alembic stamp` no tiene resumen_viajes.
+    """
+    started = time.perf_counter()
+    Base.metadata.create_all(bind=db_session_manager.engine, tables=[ResumenViajes.__table__, ResumenTaxis.__table__])
+    cache = shared_cache()
+    with db_session_manager.get_managed_session() as db_session:
+        rebuild_rollups(db_session)
+        if cache is not None:
+            bump_data_version(db_session, cache)
+    logger.info(f"Tablas de resumen reconstruidas en {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+def cmd_snapshot(args, db_session_manager: DBSessionManager, logger: logging.Logger) -> int:
+    """
+    Exporta viajes + pagos + zonas a Parquet por año/mes para correr los
+    reportes fuera de la BD (extra "columnar"). Lee de la réplica si hay.
+    """
+    from db.snapshot import write_snapshot
+
+    def progress(month, rows, elapsed):
+        logger.info(f"{month:%Y-%m}: {rows:,} viajes en {elapsed:.1f}s")
+
+    started = time.perf_counter()
+    totals = write_snapshot(
+        db_session_manager.read_engine,
+        args.directory,
+        desde=datetime.strptime(args.desde, "%Y-%m") if args.desde else None,
+        hasta=datetime.strptime(args.hasta, "%Y-%m") if args.hasta else None,
+        on_month=progress,
+    )
+    logger.info(f"Snapshot en {args.directory}: {totals['meses']} meses, {totals['filas']:,} viajes en {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+def cmd_reportes(args, db_session_manager: DBSessionManager, logger: logging.Logger) -> int:
+    """Corre los reportes de SQL/4_Consultas.sql sobre un snapshot con DuckDB."""
+    from db.snapshot import REPORTS, connect_snapshot, run_report
+
+    names = args.reportes or list(REPORTS)
+    unknown = [name for name in names if name not in REPORTS]
+    if unknown:
+        logger.error(f"Reportes desconocidos: {', '.join(unknown)}. Opciones: {', '.join(REPORTS)}")
+        return 1
+
+    connection = connect_snapshot(args.directory, threads=args.threads)
+    for name in names:
+        started = time.perf_counter()
+        columns, rows = run_report(connection, name)
+        logger.info(f"Reporte {name}: {len(rows)} filas en {time.perf_counter() - started:.2f}s")
+
+        if args.formato == "json":
+            for row in rows:
+                print(json.dumps({"reporte": name, **dict(zip(columns, row))}, default=str, ensure_ascii=False))
+        elif args.formato == "csv":
+            writer = csv.writer(sys.stdout)
+            writer.writerow(["reporte"] + columns)
+            writer.writerows([name, *row] for row in rows)
+        else:
+            print(f"\n== {name} ==")
+            print("\t".join(columns))
+            for row in rows:
+                print("\t".join("" if value is None else str(value) for value in row))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Herramientas de la API de Taxis Chicago")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    schema = subparsers.add_parser("schema", help="Crea las tablas que falten (desarrollo; en producción usar alembic)")
+    schema.add_argument("--sql", action="store_true", help="Solo imprime el DDL, sin conectarse")
+    schema.set_defaults(handler=cmd_schema)
+
+    serve = subparsers.add_parser("serve", help="Levanta la API con varios workers de uvicorn")
+    # Sin cache compartido el valor por defecto es un solo worker
+    default_workers = (os.cpu_count() or 1) if os.getenv("CACHE_URL") else 1
+    serve.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", default_workers)), help="Procesos (por defecto WEB_CONCURRENCY, o los núcleos con CACHE_URL; más de uno requiere CACHE_URL)")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--reload", action="store_true", help="Recarga al cambiar el código (un solo worker, desarrollo)")
+    serve.add_argument("--graceful-timeout", type=int, default=30, help="Segundos para terminar los requests en curso al detenerse")
+    serve.set_defaults(handler=cmd_serve)
+
+    bulk = subparsers.add_parser("bulk", help="Carga masiva de viajes completos (NDJSON o CSV)")
+    bulk.add_argument("path", help="Archivo a cargar")
+    bulk.add_argument("--format", choices=["ndjson", "csv"], default=None, help="Por defecto se deduce de la extensión")
+    bulk.add_argument("--batch-size", type=int, default=50_000, help="Filas por transacción")
+    bulk.set_defaults(handler=cmd_bulk)
+
+    ingest = subparsers.add_parser("ingest", help="Carga y limpieza en paralelo del CSV crudo del portal de Chicago")
+    ingest.add_argument("path", help="CSV descargado del portal (12 columnas, ver SQL/1_SubidaDeDatos.sql)")
+    ingest.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos en paralelo")
+    ingest.add_argument("--chunk-size", type=int, default=100_000, help="Filas por chunk (y por transacción)")
+    ingest.add_argument("--sin-resumen", action="store_true", help="No reconstruir las tablas de resumen al terminar")
+    ingest.set_defaults(handler=cmd_ingest)
+
+    rollups = subparsers.add_parser("rollups", help="Reconstruye las tablas de resumen para /analytics")
+    rollups.set_defaults(handler=cmd_rollups)
+
+    snapshot = subparsers.add_parser("snapshot", help="Exporta las tablas normalizadas a Parquet por año/mes (extra columnar)")
+    snapshot.add_argument("directory", help="Directorio de salida")
+    snapshot.add_argument("--desde", default=None, help="Primer mes a exportar (YYYY-MM); por defecto el del primer viaje")
+    snapshot.add_argument("--hasta", default=None, help="Último mes a exportar (YYYY-MM); por defecto el del último viaje")
+    snapshot.set_defaults(handler=cmd_snapshot)
+
+    reportes = subparsers.add_parser("reportes", help="Reportes de SQL/4_Consultas.sql sobre un snapshot, con DuckDB")
+    reportes.add_argument("directory", help="Directorio escrito por snapshot")
+    reportes.add_argument("reportes", nargs="*", help="Reportes a correr (por defecto todos)")
+    reportes.add_argument("--formato", choices=["tabla", "csv", "json"], default="tabla")
+    reportes.add_argument("--threads", type=int, default=None, help="Hilos de DuckDB (por defecto todos los núcleos)")
+    reportes.set_defaults(handler=cmd_reportes)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    logger_session_manager = LoggerSessionManager()
+    logger = logger_session_manager.get_logger("cli")
+    db_session_manager = DBSessionManager(logger_session_manager)
+
+    return args.handler(args, db_session_manager, logger)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
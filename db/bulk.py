@@ -0,0 +1,217 @@
+import csv
+import io
+from typing import Any, Dict, Iterable, List, Set, Union
+
+from sqlalchemy import Select, any_, bindparam, column, delete, insert, select, table, text, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from sqlalchemy.types import Text
+
+from db.entities import CiudadViaje, Pago, Viaje
+from db.rollups import CHANGES_TABLE, StagedTrips, Trips, as_trips
+
+# Orden de columnas en la tabla temporal de staging
+STAGING_COLUMNS = [
+    "trip_id",
+    "taxi_id",
+    "trip_start_timestamp",
+    "trip_end_timestamp",
+    "trip_miles",
+    "fare",
+    "tips",
+    "tolls",
+    "extras",
+    "trip_total",
+    "pickup_community_area",
+    "dropoff_community_area",
+]
+
+CREATE_STAGING = """
+CREATE TEMP TABLE IF NOT EXISTS staging_viajes (
+    trip_id TEXT,
+    taxi_id TEXT,
+    trip_start_timestamp TIMESTAMP,
+    trip_end_timestamp TIMESTAMP,
+    trip_miles NUMERIC,
+    fare NUMERIC,
+    tips NUMERIC,
+    tolls NUMERIC,
+    extras NUMERIC,
+    trip_total NUMERIC,
+    pickup_community_area INT,
+    dropoff_community_area INT
+) ON COMMIT DELETE ROWS
+"""
+
+# Una sola sentencia escribe las tres tablas. Solo se insertan pagos y zonas
+# de los viajes que realmente entraron (los trip_id existentes se omiten).
+INSERT_FROM_STAGING = """
+WITH nuevos AS (
+    INSERT INTO viajes (trip_id, taxi_id, trip_start_timestamp, trip_end_timestamp, trip_miles)
+    SELECT s.trip_id, s.taxi_id, s.trip_start_timestamp, s.trip_end_timestamp, s.trip_miles
+    FROM staging_viajes s
+    -- Con viajes particionada (0003) la llave es (trip_id, trip_start_timestamp):
+    -- un trip_id existente con otra fecha no choca en ON CONFLICT
+    WHERE NOT EXISTS (SELECT 1 FROM viajes v WHERE v.trip_id = s.trip_id)
+    -- Sin columna objetivo para que valga con cualquiera de las dos llaves
+    ON CONFLICT DO NOTHING
+    RETURNING trip_id
+),
+pagos_nuevos AS (
+    INSERT INTO pagos (trip_id, fare, tips, tolls, extras, trip_total)
+    SELECT s.trip_id, s.fare, s.tips, s.tolls, s.extras, s.trip_total
+    FROM staging_viajes s
+    JOIN nuevos n ON n.trip_id = s.trip_id
+),
+ciudad_nuevos AS (
+    INSERT INTO ciudad_viaje (trip_id, pickup_community_area, dropoff_community_area)
+    SELECT s.trip_id, s.pickup_community_area, s.dropoff_community_area
+    FROM staging_viajes s
+    JOIN nuevos n ON n.trip_id = s.trip_id
+)
+SELECT trip_id FROM nuevos
+"""
+
+NULL_MARKER = "\\N"
+
+
+def _to_csv(rows: List[dict]) -> io.StringIO:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(
+            NULL_MARKER if row.get(column) is None else row[column]
+            for column in STAGING_COLUMNS
+        )
+    buffer.seek(0)
+    return buffer
+
+
+def stage_viajes(db_session: Session, rows: List[dict]) -> None:
+    """
+    COPY FROM STDIN de un lote hacia la tabla temporal de staging, dentro
+    de la transacción de la sesión. Se puede llamar varias veces antes de
+    insert_staged (POST /viajes/bulk copia el cuerpo por partes).
+    """
+    # Conexión psycopg2 de la transacción en curso
+    driver_connection = db_session.connection().connection.driver_connection
+    with driver_connection.cursor() as cursor:
+        cursor.execute(CREATE_STAGING)
+        if rows:
+            cursor.copy_expert(
+                f"COPY staging_viajes ({', '.join(STAGING_COLUMNS)}) "
+                f"FROM STDIN WITH (FORMAT csv, NULL '{NULL_MARKER}')",
+                _to_csv(rows),
+            )
+
+
+def insert_staged(db_session: Session) -> Set[str]:
+    """
+    Un solo INSERT ... SELECT de lo que haya en staging hacia las tablas
+    normalizadas. Devuelve los trip_id insertados; los que falten ya existían.
+    """
+    driver_connection = db_session.connection().connection.driver_connection
+    with driver_connection.cursor() as cursor:
+        cursor.execute(CREATE_STAGING)
+        cursor.execute(INSERT_FROM_STAGING)
+        inserted = {trip_id for (trip_id,) in cursor.fetchall()}
+        # ON COMMIT DELETE ROWS limpia al final, pero el CLI puede mandar
+        # varios lotes en la misma transacción
+        cursor.execute("TRUNCATE staging_viajes")
+    return inserted
+
+
+def copy_viajes(db_session: Session, rows: List[dict]) -> Set[str]:
+    """
+    Inserta viajes completos (viaje + pago + zonas) con COPY FROM STDIN
+    hacia una tabla temporal y un solo INSERT ... SELECT hacia las tablas
+    normalizadas, dentro de la transacción de la sesión.
+
+    Devuelve los trip_id insertados; los que falten ya existían.
+    """
+    if not rows:
+        return set()
+    stage_viajes(db_session, rows)
+    return insert_staged(db_session)
+
+
+# --- Borrado y actualización por conjuntos (DELETE /viajes, PATCH /pagos) ---
+# No se cargan objetos: una sentencia por tabla con trip_id = ANY(:trip_ids)
+# o, para un cambio por filtro, trip_id IN (SELECT trip_id FROM cambio_viajes)
+_NO_SYNC = {"synchronize_session": False}
+
+CREATE_CHANGES = f"""
+CREATE TEMP TABLE IF NOT EXISTS {CHANGES_TABLE} (
+    trip_id TEXT PRIMARY KEY
+) ON COMMIT DELETE ROWS
+"""
+
+_changes = table(CHANGES_TABLE, column("trip_id", Text))
+
+
+def stage_changes(db_session: Session, trip_ids: Select) -> StagedTrips:
+    """
+    Guarda en la tabla temporal CHANGES_TABLE los trip_id que devuelve el
+    SELECT (los filtros de DELETE /viajes o PATCH /pagos) con un
+    INSERT ... SELECT, sin traerlos a Python. El conjunto queda fijo para
+    el resto de la transacción: el UPDATE de pagos puede cambiar qué filas
+    cumplen el filtro, y los ajustes antes y después deben ver las mismas.
+    """
+    db_session.execute(text(CREATE_CHANGES))
+    # ON COMMIT DELETE ROWS limpia al final; un request podría hacer dos cambios
+    db_session.execute(text(f"TRUNCATE {CHANGES_TABLE}"))
+    count = db_session.execute(insert(_changes).from_select(["trip_id"], trip_ids)).rowcount
+    # Las tablas temporales no las analiza autovacuum: sin estadísticas el
+    # planner supone unas pocas filas y elige nested loops para millones
+    db_session.execute(text(f"ANALYZE {CHANGES_TABLE}"))
+    staged = StagedTrips(count)
+    lock_viajes(db_session, staged)
+    return staged
+
+
+def _any_trip_id(entity, trip_ids: Trips):
+    if isinstance(trip_ids, StagedTrips):
+        return entity.trip_id.in_(select(_changes.c.trip_id))
+    return entity.trip_id == any_(bindparam("trip_ids", trip_ids, type_=ARRAY(Text)))
+
+
+def lock_viajes(db_session: Session, trip_ids: Union[Iterable[str], StagedTrips]) -> int:
+    """
+    SELECT ... FOR UPDATE de los viajes antes de restarlos de los
+    resúmenes (adjust_rollups con sign=-1). Todo cambio a un viaje, a su
+    pago o a sus zonas toma este candado, así que dos requests sobre el
+    mismo viaje se serializan: el segundo espera el commit del primero y
+    resta la versión ya escrita en lugar de la que ambos leyeron. Se
+    bloquea en orden de trip_id para que dos cambios por lote no se
+    esperen en orden inverso. Devuelve cuántos viajes existen.
+    """
+    trip_ids = as_trips(trip_ids)
+    if not trip_ids:
+        return 0
+    locked = select(Viaje.trip_id).where(_any_trip_id(Viaje, trip_ids)).order_by(Viaje.trip_id).with_for_update()
+    return len(db_session.execute(locked).all())
+
+
+def delete_viajes(db_session: Session, trip_ids: Union[Iterable[str], StagedTrips]) -> int:
+    """
+    Borra viajes junto con su pago y sus zonas, un DELETE por tabla.
+    Pagos y zonas se borran explícitamente en lugar de esperar al
+    ON DELETE CASCADE porque con viajes particionada (0003) no hay llaves
+    foráneas. Devuelve cuántos viajes se borraron.
+    """
+    trip_ids = as_trips(trip_ids)
+    if not trip_ids:
+        return 0
+    for entity in (Pago, CiudadViaje):
+        db_session.execute(delete(entity).where(_any_trip_id(entity, trip_ids)), execution_options=_NO_SYNC)
+    return db_session.execute(delete(Viaje).where(_any_trip_id(Viaje, trip_ids)), execution_options=_NO_SYNC).rowcount
+
+
+def update_pagos(db_session: Session, trip_ids: Union[Iterable[str], StagedTrips], values: Dict[str, Any]) -> int:
+    """UPDATE pagos SET ... de todos los trip_id en una sentencia; devuelve las filas cambiadas."""
+    trip_ids = as_trips(trip_ids)
+    if not trip_ids or not values:
+        return 0
+    return db_session.execute(
+        update(Pago).where(_any_trip_id(Pago, trip_ids)).values(**values), execution_options=_NO_SYNC
+    ).rowcount
@@ -2,12 +2,15 @@ from datetime import datetime
 from typing import Optional
 
 from sqlalchemy import (
+    BigInteger,
     Integer,
     String,
     Text,
     Numeric,
     DateTime,
     ForeignKey,
+    Index,
+    func,
 )
 from sqlalchemy.orm import relationship, declarative_base, Mapped, mapped_column
 
@@ -28,6 +31,15 @@ class CommunityArea(Base):
 # ==========================================
 class Viaje(Base):
     __tablename__ = "viajes"
+    # Índices de migrations/versions/0002_indices_filtros.py
+    __table_args__ = (
+        Index("ix_viajes_trip_start_brin", "trip_start_timestamp", postgresql_using="brin"),
+        Index("ix_viajes_trip_end_brin", "trip_end_timestamp", postgresql_using="brin"),
+        Index("ix_viajes_trip_start_trip_id", "trip_start_timestamp", "trip_id"),
+        Index("ix_viajes_trip_miles", "trip_miles"),
+        # migrations/versions/0005_resumen_taxis.py
+        Index("ix_viajes_taxi_id", "taxi_id"),
+    )
 
     trip_id: Mapped[str] = mapped_column(Text, primary_key=True)
     taxi_id: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
@@ -52,6 +64,9 @@ class Viaje(Base):
 # ==========================================
 class Pago(Base):
     __tablename__ = "pagos"
+    __table_args__ = (
+        Index("ix_pagos_trip_total", "trip_total"),
+    )
 
     trip_id: Mapped[str] = mapped_column(
         ForeignKey("viajes.trip_id", ondelete="CASCADE"), 
@@ -73,6 +88,10 @@ class Pago(Base):
 # ==========================================
 class CiudadViaje(Base):
     __tablename__ = "ciudad_viaje"
+    __table_args__ = (
+        Index("ix_ciudad_viaje_pickup", "pickup_community_area", "trip_id"),
+        Index("ix_ciudad_viaje_dropoff", "dropoff_community_area", "trip_id"),
+    )
 
 
     trip_id: Mapped[str] = mapped_column(
@@ -96,4 +115,71 @@ class CiudadViaje(Base):
     )
     dropoff_area_obj: Mapped["CommunityArea"] = relationship(
         "CommunityArea", foreign_keys=[dropoff_community_area]
-    )
\ No newline at end of file
+    )
+
+# ==========================================
+# 5. TABLA DE RESUMEN: RESUMEN_VIAJES
+# ==========================================
+# Agregados precalculados para los endpoints de /analytics. Se mantienen al
+# día de forma incremental (ver db/rollups.py) y se reconstruyen completos
+# con `python cli.py rollups`. Las zonas desconocidas se guardan como 0.
+class ResumenViajes(Base):
+    __tablename__ = "resumen_viajes"
+
+    anio: Mapped[int] = mapped_column(Integer, primary_key=True)
+    mes: Mapped[int] = mapped_column(Integer, primary_key=True)
+    hora: Mapped[int] = mapped_column(Integer, primary_key=True)
+    pickup_community_area: Mapped[int] = mapped_column(Integer, primary_key=True)
+    dropoff_community_area: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    viajes: Mapped[int] = mapped_column(BigInteger, default=0)
+    viajes_con_pago: Mapped[int] = mapped_column(BigInteger, default=0)
+    viajes_con_millas: Mapped[int] = mapped_column(BigInteger, default=0)
+    viajes_con_duracion: Mapped[int] = mapped_column(BigInteger, default=0)
+
+    suma_fare: Mapped[float] = mapped_column(Numeric, default=0)
+    suma_tips: Mapped[float] = mapped_column(Numeric, default=0)
+    suma_trip_total: Mapped[float] = mapped_column(Numeric, default=0)
+    suma_millas: Mapped[float] = mapped_column(Numeric, default=0)
+    suma_duracion_segundos: Mapped[float] = mapped_column(Numeric, default=0)
+
+
+# ==========================================
+# 6. TABLA DE RESUMEN: RESUMEN_TAXIS
+# ==========================================
+# Mismas métricas que resumen_viajes pero por taxi, para /taxis. Se
+# mantiene junto con resumen_viajes (db/rollups.py); los viajes sin
+# taxi_id no se cuentan.
+class ResumenTaxis(Base):
+    __tablename__ = "resumen_taxis"
+
+    taxi_id: Mapped[str] = mapped_column(Text, primary_key=True)
+
+    viajes: Mapped[int] = mapped_column(BigInteger, default=0)
+    viajes_con_pago: Mapped[int] = mapped_column(BigInteger, default=0)
+    viajes_con_millas: Mapped[int] = mapped_column(BigInteger, default=0)
+    viajes_con_duracion: Mapped[int] = mapped_column(BigInteger, default=0)
+
+    suma_fare: Mapped[float] = mapped_column(Numeric, default=0)
+    suma_tips: Mapped[float] = mapped_column(Numeric, default=0)
+    suma_trip_total: Mapped[float] = mapped_column(Numeric, default=0)
+    suma_millas: Mapped[float] = mapped_column(Numeric, default=0)
+    suma_duracion_segundos: Mapped[float] = mapped_column(Numeric, default=0)
+
+
+# ==========================================
+# 7. TABLA DE CONTROL: INGESTA_CHECKPOINT
+# ==========================================
+# Un registro por chunk del CSV ya cargado por `python cli.py ingest`.
+# Se escribe en la misma transacción que el COPY del chunk, así que si la
+# carga se interrumpe basta con volver a correr el comando.
+class IngestaCheckpoint(Base):
+    __tablename__ = "ingesta_checkpoint"
+
+    archivo: Mapped[str] = mapped_column(Text, primary_key=True)
+    tamano_chunk: Mapped[int] = mapped_column(Integer, primary_key=True)
+    chunk: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    filas_leidas: Mapped[int] = mapped_column(Integer)
+    filas_insertadas: Mapped[int] = mapped_column(Integer)
+    completado: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
@@ -0,0 +1,260 @@
+import csv
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from db.bulk import copy_viajes
+from db.entities import IngestaCheckpoint
+
+# Columnas del CSV del portal de Chicago, en el orden de SQL/1_SubidaDeDatos.sql
+# (col1 ... col12 de taxis_raw_text)
+CSV_COLUMNS = [
+    "trip_id",
+    "taxi_id",
+    "trip_start_timestamp",
+    "trip_end_timestamp",
+    "pickup_community_area",
+    "dropoff_community_area",
+    "fare",
+    "tips",
+    "tolls",
+    "extras",
+    "trip_total",
+    "trip_miles",
+]
+
+MONEY_COLUMNS = ["fare", "tips", "tolls", "extras", "trip_total", "trip_miles"]
+
+# Ventana de años del análisis (WHERE ... BETWEEN 2019 AND 2022)
+MIN_YEAR = 2019
+MAX_YEAR = 2022
+
+# El portal exporta "01/31/2019 11:45:00 PM" (datestyle MDY en SQL/2)
+TIMESTAMP_FORMATS = ["%m/%d/%Y %I:%M:%S %p", "%m/%d/%Y %H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"]
+
+# Igual que REGEXP_REPLACE(col, '[^0-9\.]', '', 'g'): quita $, comas, etc.
+_NON_NUMERIC = re.compile(r"[^0-9.]")
+
+# Motivos de descarte, en el orden en que SQL/2_LimpiezaDeDatos.sql los aplica
+FORMATO_INVALIDO = "formato_invalido"
+FUERA_DE_RANGO = "fuera_de_rango"
+TIEMPOS_INVALIDOS = "tiempos_invalidos"
+SIN_ZONA = "sin_zona"
+ZONA_INEXISTENTE = "zona_inexistente"
+CERO_MILLAS_CON_COSTO = "cero_millas_con_costo"
+SIN_TARIFA = "sin_tarifa"
+
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    value = value.strip()
+    if not value:
+        return None
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Fecha inválida: {value}")
+
+
+def _parse_money(value: str) -> Optional[Decimal]:
+    cleaned = _NON_NUMERIC.sub("", value)
+    if not cleaned:
+        return None
+    try:
+        return Decimal(cleaned)
+    except InvalidOperation:
+        raise ValueError(f"Número inválido: {value}")
+
+
+def _parse_int(value: str) -> Optional[int]:
+    value = value.strip()
+    return int(value) if value else None
+
+
+def clean_row(fields: List[str], valid_area_ids: Set[int]) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Aplica a una fila del CSV las mismas reglas que SQL/2_LimpiezaDeDatos.sql.
+    Devuelve (fila, None) si se conserva o (None, motivo) si se descarta.
+    """
+    if len(fields) != len(CSV_COLUMNS):
+        return None, FORMATO_INVALIDO
+    raw = dict(zip(CSV_COLUMNS, fields))
+
+    try:
+        row = {
+            "trip_id": raw["trip_id"],
+            "taxi_id": raw["taxi_id"] or None,
+            "trip_start_timestamp": _parse_timestamp(raw["trip_start_timestamp"]),
+            "trip_end_timestamp": _parse_timestamp(raw["trip_end_timestamp"]),
+            "pickup_community_area": _parse_int(raw["pickup_community_area"]),
+            "dropoff_community_area": _parse_int(raw["dropoff_community_area"]),
+        }
+        for column in MONEY_COLUMNS:
+            row[column] = _parse_money(raw[column])
+    except ValueError:
+        return None, FORMATO_INVALIDO
+
+    start, end = row["trip_start_timestamp"], row["trip_end_timestamp"]
+    if not row["trip_id"]:
+        return None, FORMATO_INVALIDO
+    if start is None or not MIN_YEAR <= start.year <= MAX_YEAR:
+        return None, FUERA_DE_RANGO
+
+    # 1. Nulos en propinas y peajes
+    if row["tips"] is None:
+        row["tips"] = Decimal(0)
+    if row["tolls"] is None:
+        row["tolls"] = Decimal(0)
+
+    # 2. Tiempos inválidos
+    if end is not None and end <= start:
+        return None, TIEMPOS_INVALIDOS
+
+    # 3. Sin geografía (y zonas que no están en el catálogo, que romperían la FK)
+    pickup, dropoff = row["pickup_community_area"], row["dropoff_community_area"]
+    if pickup is None or dropoff is None:
+        return None, SIN_ZONA
+    if pickup not in valid_area_ids or dropoff not in valid_area_ids:
+        return None, ZONA_INEXISTENTE
+
+    # 4. Cero millas con costo
+    if row["trip_miles"] is not None and row["trip_total"] is not None:
+        if row["trip_miles"] <= 0 and row["trip_total"] > 0:
+            return None, CERO_MILLAS_CON_COSTO
+
+    # 5. Sin tarifa o total
+    if row["fare"] is None or row["trip_total"] is None:
+        return None, SIN_TARIFA
+
+    return row, None
+
+
+# --- Trabajo de cada proceso del pool ---
+# Cada proceso abre su propio engine una sola vez (no se comparten
+# conexiones entre procesos) y carga sus chunks en paralelo con COPY.
+_worker_sessions: Optional[sessionmaker] = None
+_worker_area_ids: Set[int] = set()
+
+
+def _init_worker(database_url: str, valid_area_ids: Set[int]) -> None:
+    global _worker_sessions, _worker_area_ids
+    engine = create_engine(database_url, pool_size=1, max_overflow=0)
+    _worker_sessions = sessionmaker(bind=engine, autoflush=False, future=True)
+    _worker_area_ids = valid_area_ids
+
+
+def _load_chunk(source: str, chunk_size: int, chunk: int, lines: List[str]) -> Dict[str, int]:
+    """
+    Limpia un chunk y lo carga con COPY. El checkpoint se escribe en la
+    misma transacción, así que un chunk queda cargado completo o no cargado.
+    """
+    rows = []
+    rejected = Counter()
+    for fields in csv.reader(lines):
+        row, reason = clean_row(fields, _worker_area_ids)
+        if row is None:
+            rejected[reason] += 1
+        else:
+            rows.append(row)
+
+    with _worker_sessions() as db_session, db_session.begin():
+        inserted = copy_viajes(db_session, rows)
+        db_session.execute(
+            insert(IngestaCheckpoint)
+            .values(
+                archivo=source,
+                tamano_chunk=chunk_size,
+                chunk=chunk,
+                filas_leidas=len(lines),
+                filas_insertadas=len(inserted),
+            )
+            .on_conflict_do_nothing()
+        )
+
+    return {
+        "chunks": 1,
+        "read": len(lines),
+        "valid": len(rows),
+        "inserted": len(inserted),
+        **{f"rejected_{reason}": count for reason, count in rejected.items()},
+    }
+
+
+def source_key(path: str) -> str:
+    """Identifica el archivo por nombre y tamaño para reanudar la carga correcta."""
+    return f"{os.path.basename(path)}:{os.path.getsize(path)}"
+
+
+def completed_chunks(db_session: Session, source: str, chunk_size: int) -> Set[int]:
+    return set(
+        db_session.scalars(
+            select(IngestaCheckpoint.chunk).where(
+                IngestaCheckpoint.archivo == source,
+                IngestaCheckpoint.tamano_chunk == chunk_size,
+            )
+        )
+    )
+
+
+def _chunks(path: str, chunk_size: int) -> Iterator[Tuple[int, List[str]]]:
+    with open(path, encoding="utf-8", newline="") as handle:
+        handle.readline()  # encabezado
+        chunk = 0
+        while True:
+            lines = list(islice(handle, chunk_size))
+            if not lines:
+                return
+            yield chunk, lines
+            chunk += 1
+
+
+def ingest_csv(
+    path: str,
+    database_url: str,
+    valid_area_ids: Set[int],
+    done: Set[int],
+    workers: int,
+    chunk_size: int,
+    on_progress: Callable[[Counter, float], None],
+) -> Counter:
+    """
+    Lee el CSV por chunks y los reparte entre un pool de procesos. Se
+    mantienen a lo más 2 chunks por proceso en memoria. Los chunks que ya
+    están en ingesta_checkpoint (done) se saltan sin parsearlos.
+    """
+    source = source_key(path)
+    totals = Counter()
+    started = time.perf_counter()
+    pending = set()
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(database_url, valid_area_ids)
+    ) as pool:
+        for chunk, lines in _chunks(path, chunk_size):
+            if chunk in done:
+                totals["skipped_chunks"] += 1
+                continue
+            pending.add(pool.submit(_load_chunk, source, chunk_size, chunk, lines))
+
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    totals.update(future.result())
+                    on_progress(totals, time.perf_counter() - started)
+
+        for future in pending:
+            totals.update(future.result())
+            on_progress(totals, time.perf_counter() - started)
+
+    return totals
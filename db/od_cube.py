@@ -0,0 +1,316 @@
+import math
+import os
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from sqlalchemy.types import Text
+
+from db.ingest import MAX_YEAR, MIN_YEAR
+from db.rollups import IN_CHANGES, StagedTrips, Trips, as_trips
+
+# --- CONFIGURACIÓN DEL CUBO ORIGEN-DESTINO ---
+# Presupuesto de memoria por proceso; si el cubo diario no cabe, los días
+# se agrupan en bloques de varios días (granularidad_dias en la respuesta)
+DEFAULT_MAX_MB = 512
+# Cada cuántos segundos (a lo más) se revisa si hubo escrituras que el
+# cubo no vio: de otros workers, de cli.py ingest / rollups o de psql
+DEFAULT_REFRESH_SECONDS = 60
+
+# Zonas 1..77 de community_area; la posición 0 agrupa las zonas nulas
+# (igual que resumen_viajes)
+N_AREAS = 78
+HOURS = 24
+
+# Llaves de session.info con los cambios que se aplican al hacer commit y
+# las escrituras de la transacción que los acompañan
+_PENDING_KEY = "od_cube_updates"
+_WRITES_KEY = "od_cube_writes"
+
+# Agregación al grano del cubo: (día, hora, zona de recogida, zona de llegada)
+_AGGREGATE = """
+SELECT
+    v.trip_start_timestamp::date                    AS dia,
+    EXTRACT(HOUR FROM v.trip_start_timestamp)::int  AS hora,
+    COALESCE(cv.pickup_community_area, 0)           AS pickup,
+    COALESCE(cv.dropoff_community_area, 0)          AS dropoff,
+    COUNT(*)                                        AS viajes,
+    COALESCE(SUM(p.trip_total), 0)                  AS ingresos,
+    COALESCE(SUM(v.trip_miles), 0)                  AS millas,
+    COUNT(v.trip_miles)                             AS viajes_con_millas
+FROM viajes v
+LEFT JOIN pagos p ON p.trip_id = v.trip_id
+LEFT JOIN ciudad_viaje cv ON cv.trip_id = v.trip_id
+WHERE v.trip_start_timestamp >= :desde AND v.trip_start_timestamp < :hasta {where}
+GROUP BY 1, 2, 3, 4
+"""
+
+_LOAD = text(_AGGREGATE.format(where=""))
+
+# Escrituras acumuladas en las tablas que alimentan el cubo, de cualquier
+# proceso. Postgres publica las estadísticas al terminar cada transacción:
+# una escritura que la carga no alcanzó a ver cambia la firma de la
+# siguiente revisión. Con viajes particionada cuenta cada partición.
+_WRITES = """
+SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0)
+FROM {view}
+WHERE relname IN ('pagos', 'ciudad_viaje') OR relname LIKE 'viajes%'
+"""
+_WRITE_SIGNATURE = text(_WRITES.format(view="pg_stat_user_tables"))
+# Las mismas escrituras, pero solo las de la transacción en curso: lo que
+# la firma va a sumar cuando haga commit
+_TRANSACTION_WRITES = text(_WRITES.format(view="pg_stat_xact_user_tables"))
+_LOAD_TRIPS = text(_AGGREGATE.format(where="AND v.trip_id = ANY(:trip_ids)")).bindparams(
+    bindparam("trip_ids", type_=ARRAY(Text))
+)
+_LOAD_STAGED = text(_AGGREGATE.format(where=IN_CHANGES))
+
+
+class ODCube:
+    """
+    Cubo preagregado en memoria (NumPy) indexado por
+    (bloque de días, hora, zona de recogida, zona de llegada). Las
+    consultas por rango de fechas son un slice y una suma sobre los dos
+    primeros ejes, sin tocar la BD.
+
+    Cubre la ventana del análisis (MIN_YEAR..MAX_YEAR); los viajes fuera
+    de ella no se cuentan.
+
+    Las escrituras de la API se suman al cubo del worker que las atendió
+    al hacer commit; las de otros procesos se recogen con refresh().
+    Las propias también mueven la firma de escrituras, así que se llevan
+    en local_writes y no provocan recargas.
+    """
+
+    def __init__(
+        self,
+        max_mb: float = DEFAULT_MAX_MB,
+        start: date = date(MIN_YEAR, 1, 1),
+        end: date = date(MAX_YEAR + 1, 1, 1),
+        refresh_seconds: float = DEFAULT_REFRESH_SECONDS,
+        logger=None,
+    ):
+        # Import perezoso: numpy solo se instala con el extra "analytics"
+        import numpy
+
+        self.np = numpy
+        self.start = start
+        self.end = end
+        self.refresh_seconds = refresh_seconds
+        self.logger = logger
+        self._lock = threading.Lock()
+        self.loaded = False
+        # Firma de escrituras vista en la última carga (None fuera de Postgres)
+        # y escrituras que este proceso ya sumó al cubo desde entonces
+        self.signature: Optional[int] = None
+        self.local_writes = 0
+        self._checked_at = time.monotonic()
+        self._refreshing = False
+
+        total_days = (end - start).days
+        # viajes y viajes_con_millas (int32), ingresos y millas (float64:
+        # con float32 las sumas y restas de cada escritura se desvían en
+        # totales de millones de dólares)
+        bytes_per_day = HOURS * N_AREAS * N_AREAS * (4 + 4 + 8 + 8)
+        self.day_step = max(1, math.ceil(total_days * bytes_per_day / (max_mb * 1024 * 1024)))
+        self.n_buckets = math.ceil(total_days / self.day_step)
+
+        shape = (self.n_buckets, HOURS, N_AREAS, N_AREAS)
+        self.viajes = numpy.zeros(shape, dtype=numpy.int32)
+        self.viajes_con_millas = numpy.zeros(shape, dtype=numpy.int32)
+        self.ingresos = numpy.zeros(shape, dtype=numpy.float64)
+        self.millas = numpy.zeros(shape, dtype=numpy.float64)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.viajes, self.viajes_con_millas, self.ingresos, self.millas))
+
+    def _window(self) -> Dict[str, Any]:
+        return {"desde": self.start, "hasta": self.end}
+
+    def load(self, db_session: Session) -> None:
+        """
+        Llena el cubo con un solo GROUP BY sobre las tablas normalizadas.
+        La consulta corre fuera del lock: las lecturas solo esperan el
+        llenado de los arrays, no a Postgres.
+        """
+        signature = write_signature(db_session)
+        rows = db_session.execute(_LOAD, self._window()).all()
+        with self._lock:
+            for array in (self.viajes, self.viajes_con_millas, self.ingresos, self.millas):
+                array.fill(0)
+            self._add(rows, 1)
+            self.loaded = True
+            self.signature = signature
+            self.local_writes = 0
+            self._checked_at = time.monotonic()
+
+    def refresh(self, session_factory: Callable[[], Session]) -> None:
+        """
+        A lo más cada refresh_seconds revisa la firma de escrituras y, si
+        cambió desde la carga más de lo que explican las escrituras propias,
+        recarga el cubo en un hilo aparte; mientras tanto se responde con
+        el cubo actual. Fuera de Postgres no hay firma y se recarga en cada
+        revisión.
+        """
+        if not self.refresh_seconds:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._refreshing or now - self._checked_at < self.refresh_seconds:
+                return
+            self._refreshing, self._checked_at = True, now
+        threading.Thread(target=self._refresh, args=(session_factory,), name="od-cube-refresh", daemon=True).start()
+
+    def _refresh(self, session_factory: Callable[[], Session]) -> None:
+        try:
+            with session_factory() as session:
+                signature = write_signature(session)
+                if self._stale(signature):
+                    started = time.perf_counter()
+                    self.load(session)
+                    if self.logger is not None:
+                        self.logger.info(f"Cubo O-D recargado en {time.perf_counter() - started:.1f} s")
+        except Exception as e:
+            if self.logger is not None:
+                self.logger.warning(f"No se pudo recargar el cubo O-D: {e}")
+        finally:
+            self._refreshing = False
+
+    def _stale(self, signature: Optional[int]) -> bool:
+        if signature is None or self.signature is None:
+            return True
+        # Por debajo de lo esperado: Postgres aún no publica las escrituras
+        # propias (o se reiniciaron las estadísticas, si baja de la carga)
+        expected = self.signature + self.local_writes
+        return signature > expected or signature < self.signature
+
+    def stage(self, db_session: Session, trip_ids: Trips, sign: int) -> None:
+        """
+        Lee la contribución actual de los viajes y la deja pendiente en la
+        sesión; se suma al cubo solo si la transacción hace commit. main.py
+        lo pasa como hook de adjust_rollups (DBSessionManager.rollup_hooks).
+        """
+        trip_ids = as_trips(trip_ids)
+        if not trip_ids:
+            return
+        if isinstance(trip_ids, StagedTrips):
+            rows = db_session.execute(_LOAD_STAGED, self._window()).all()
+        else:
+            rows = db_session.execute(_LOAD_TRIPS, {**self._window(), "trip_ids": trip_ids}).all()
+        db_session.info.setdefault(_PENDING_KEY, []).append((self, rows, sign))
+
+    def _add(self, rows: List, sign: int) -> None:
+        np = self.np
+        rows = [
+            row for row in rows
+            if self.start <= row.dia < self.end and 0 <= row.pickup < N_AREAS and 0 <= row.dropoff < N_AREAS
+        ]
+        if not rows:
+            return
+        buckets = np.array([(row.dia - self.start).days // self.day_step for row in rows])
+        index = (
+            buckets,
+            np.array([row.hora for row in rows]),
+            np.array([row.pickup for row in rows]),
+            np.array([row.dropoff for row in rows]),
+        )
+        # add.at acumula aunque un mismo índice aparezca varias veces
+        np.add.at(self.viajes, index, sign * np.array([row.viajes for row in rows], dtype=np.int32))
+        np.add.at(self.viajes_con_millas, index, sign * np.array([row.viajes_con_millas for row in rows], dtype=np.int32))
+        np.add.at(self.ingresos, index, sign * np.array([float(row.ingresos) for row in rows], dtype=np.float64))
+        np.add.at(self.millas, index, sign * np.array([float(row.millas) for row in rows], dtype=np.float64))
+
+    def apply(self, rows: List, sign: int) -> None:
+        with self._lock:
+            self._add(rows, sign)
+
+    def count_local_writes(self, writes: int) -> None:
+        """Escrituras de una transacción propia ya sumada al cubo."""
+        with self._lock:
+            self.local_writes += writes
+
+    def matrix(self, desde: date, hasta: date, hora_desde: int = 0, hora_hasta: int = HOURS - 1) -> Dict[str, Any]:
+        """
+        Suma el rango [desde, hasta] (incluido) y [hora_desde, hora_hasta].
+        El rango se amplía a bloques completos de day_step días; las fechas
+        efectivas se devuelven junto con las matrices de N_AREAS x N_AREAS.
+        """
+        np = self.np
+        first = max(0, (desde - self.start).days // self.day_step)
+        last = min(self.n_buckets, (hasta - self.start).days // self.day_step + 1)
+        block = (slice(first, max(first, last)), slice(hora_desde, hora_hasta + 1))
+
+        with self._lock:
+            viajes = self.viajes[block].sum(axis=(0, 1), dtype=np.int64)
+            viajes_con_millas = self.viajes_con_millas[block].sum(axis=(0, 1), dtype=np.int64)
+            ingresos = self.ingresos[block].sum(axis=(0, 1), dtype=np.float64)
+            millas = self.millas[block].sum(axis=(0, 1), dtype=np.float64)
+
+        return {
+            "desde": self.start + timedelta(days=first * self.day_step),
+            "hasta": min(self.end, self.start + timedelta(days=max(first, last) * self.day_step)) - timedelta(days=1),
+            "viajes": viajes,
+            "ingresos": ingresos,
+            "millas": millas,
+            "viajes_con_millas": viajes_con_millas,
+        }
+
+
+def write_signature(db_session: Session) -> Optional[int]:
+    """Firma de escrituras de viajes, pagos y ciudad_viaje (solo Postgres)."""
+    if db_session.get_bind().dialect.name != "postgresql":
+        return None
+    return int(db_session.execute(_WRITE_SIGNATURE).scalar())
+
+
+def create_od_cube(logger) -> Optional[ODCube]:
+    """
+    Crea el cubo según el entorno (None si está desactivado o falta numpy):
+
+        OD_CUBE          0 para no cargar el cubo (GET /analytics/od-matrix responde 503)
+        OD_CUBE_MAX_MB   presupuesto de memoria por proceso
+        OD_CUBE_REFRESH  segundos entre revisiones de escrituras ajenas (0 = nunca)
+    """
+    if os.getenv("OD_CUBE", "1").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    try:
+        cube = ODCube(
+            max_mb=float(os.getenv("OD_CUBE_MAX_MB", DEFAULT_MAX_MB)),
+            refresh_seconds=float(os.getenv("OD_CUBE_REFRESH", DEFAULT_REFRESH_SECONDS)),
+            logger=logger,
+        )
+    except ImportError:
+        logger.warning("numpy no está instalado (extra 'analytics'); /analytics/od-matrix queda deshabilitado")
+        return None
+    logger.info(f"Cubo O-D: bloques de {cube.day_step} día(s), {cube.nbytes / 1024 / 1024:.0f} MB")
+    return cube
+
+
+@event.listens_for(Session, "before_commit")
+def _count_transaction_writes(session: Session):
+    # Se cuenta después del último flush: es lo que la transacción suma a
+    # la firma al hacer commit
+    if session.info.get(_PENDING_KEY) and session.get_bind().dialect.name == "postgresql":
+        session.flush()
+        session.info[_WRITES_KEY] = int(session.execute(_TRANSACTION_WRITES).scalar())
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session: Session):
+    pending = session.info.pop(_PENDING_KEY, [])
+    writes = session.info.pop(_WRITES_KEY, 0)
+    for cube, rows, sign in pending:
+        cube.apply(rows, sign)
+    for cube in {id(cube): cube for cube, _, _ in pending}.values():
+        cube.count_local_writes(writes)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session: Session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_WRITES_KEY, None)
@@ -0,0 +1,106 @@
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+
+# Llave de session.info con el instante en que la sesión empezó a pedir conexión
+_WAIT_STARTED_KEY = "pool_wait_started"
+
+# Muestras recientes que se guardan para calcular percentiles
+_RECENT_SAMPLES = 1000
+
+
+class PoolWaitStats:
+    """
+    Tiempos de espera para obtener una conexión del pool. Se mide desde que
+    la sesión abre su transacción hasta que tiene la conexión (incluye el
+    pre_ping), que es lo que de verdad espera un request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=_RECENT_SAMPLES)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self._recent.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = sorted(self._recent)
+            count, total, maximum = self.count, self.total, self.max
+
+        def percentile(p: float) -> float:
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(p * len(recent)))] * 1000
+
+        return {
+            "count": count,
+            "avg_ms": total / count * 1000 if count else 0.0,
+            "max_ms": maximum * 1000,
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+
+# Un registro por pool; si el engine hace dispose() el pool nuevo empieza en cero
+_WAIT_STATS: "weakref.WeakKeyDictionary[Pool, PoolWaitStats]" = weakref.WeakKeyDictionary()
+_WAIT_STATS_LOCK = threading.Lock()
+
+
+def wait_stats(engine: Engine) -> PoolWaitStats:
+    with _WAIT_STATS_LOCK:
+        stats = _WAIT_STATS.get(engine.pool)
+        if stats is None:
+            stats = _WAIT_STATS[engine.pool] = PoolWaitStats()
+        return stats
+
+
+def pool_status(engine: Engine) -> Dict[str, Any]:
+    """
+    Estado del pool: conexiones prestadas, libres y en overflow. Los pools
+    que no son QueuePool (p. ej. SQLite) no exponen todos los contadores.
+    """
+    pool = engine.pool
+
+    def counter(name: str):
+        method = getattr(pool, name, None)
+        return method() if callable(method) else None
+
+    return {
+        "pool_class": type(pool).__name__,
+        "size": counter("size"),
+        "checked_out": counter("checkedout"),
+        "idle": counter("checkedin"),
+        # QueuePool arranca overflow en -pool_size; se reporta desde cero
+        "overflow": max(counter("overflow"), 0) if counter("overflow") is not None else None,
+        "max_overflow": getattr(pool, "_max_overflow", None),
+        "timeout": counter("timeout"),
+        "wait": wait_stats(engine).snapshot(),
+    }
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _mark_wait_started(session: Session, transaction):
+    if transaction.parent is None:
+        session.info[_WAIT_STARTED_KEY] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_begin")
+def _record_wait(session: Session, transaction, connection):
+    started = session.info.pop(_WAIT_STARTED_KEY, None)
+    if started is not None:
+        wait_stats(connection.engine).record(time.perf_counter() - started)
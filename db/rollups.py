@@ -0,0 +1,164 @@
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Union
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from sqlalchemy.types import Text
+
+# Tabla temporal con los trip_id de un cambio por filtro (DELETE /viajes,
+# PATCH /pagos; la llena db.bulk.stage_changes). El conjunto se resuelve
+# una vez en Postgres: el borrado, el UPDATE y los ajustes de los
+# resúmenes lo leen de ahí sin que los IDs pasen por Python.
+CHANGES_TABLE = "cambio_viajes"
+IN_CHANGES = f"AND v.trip_id IN (SELECT trip_id FROM {CHANGES_TABLE})"
+
+
+@dataclass(frozen=True)
+class StagedTrips:
+    """Viajes de un cambio por filtro, ya guardados en CHANGES_TABLE."""
+
+    count: int
+
+    def __len__(self) -> int:
+        return self.count
+
+
+# Lo que reciben adjust_rollups y sus hooks: IDs sueltos o un StagedTrips
+Trips = Union[List[str], StagedTrips]
+
+
+def as_trips(trip_ids: Union[Iterable[str], StagedTrips]) -> Trips:
+    return trip_ids if isinstance(trip_ids, StagedTrips) else list(trip_ids)
+
+
+# Métricas comunes a las tablas de resumen; {sign} es 1 o -1
+_SUMS = """
+    {sign} * COUNT(*)                                AS viajes,
+    {sign} * COUNT(p.trip_id)                        AS viajes_con_pago,
+    {sign} * COUNT(v.trip_miles)                     AS viajes_con_millas,
+    {sign} * COUNT(v.trip_end_timestamp)             AS viajes_con_duracion,
+    {sign} * COALESCE(SUM(p.fare), 0)                AS suma_fare,
+    {sign} * COALESCE(SUM(p.tips), 0)                AS suma_tips,
+    {sign} * COALESCE(SUM(p.trip_total), 0)          AS suma_trip_total,
+    {sign} * COALESCE(SUM(v.trip_miles), 0)          AS suma_millas,
+    {sign} * COALESCE(SUM(EXTRACT(EPOCH FROM v.trip_end_timestamp - v.trip_start_timestamp)), 0)
+                                                     AS suma_duracion_segundos"""
+
+# Agregación de un conjunto de viajes al grano de resumen_viajes:
+# (año, mes, hora, zona de recogida, zona de llegada).
+# Las zonas nulas se agrupan en 0 porque forman parte de la llave primaria.
+_AGGREGATE = """
+SELECT
+    EXTRACT(YEAR FROM v.trip_start_timestamp)::int  AS anio,
+    EXTRACT(MONTH FROM v.trip_start_timestamp)::int AS mes,
+    EXTRACT(HOUR FROM v.trip_start_timestamp)::int  AS hora,
+    COALESCE(cv.pickup_community_area, 0)           AS pickup_community_area,
+    COALESCE(cv.dropoff_community_area, 0)          AS dropoff_community_area,""" + _SUMS + """
+FROM viajes v
+LEFT JOIN pagos p ON p.trip_id = v.trip_id
+LEFT JOIN ciudad_viaje cv ON cv.trip_id = v.trip_id
+WHERE v.trip_start_timestamp IS NOT NULL {where}
+GROUP BY 1, 2, 3, 4, 5
+"""
+
+# Agregación al grano de resumen_taxis (un registro por taxi). Los viajes
+# sin taxi_id no se cuentan.
+_TAXI_AGGREGATE = """
+SELECT
+    v.taxi_id                                       AS taxi_id,""" + _SUMS + """
+FROM viajes v
+LEFT JOIN pagos p ON p.trip_id = v.trip_id
+WHERE v.taxi_id IS NOT NULL {where}
+GROUP BY 1
+"""
+
+_METRICS = [
+    "viajes",
+    "viajes_con_pago",
+    "viajes_con_millas",
+    "viajes_con_duracion",
+    "suma_fare",
+    "suma_tips",
+    "suma_trip_total",
+    "suma_millas",
+    "suma_duracion_segundos",
+]
+
+
+def _upsert(table: str, keys: List[str], aggregate: str) -> str:
+    """INSERT ... ON CONFLICT que suma la agregación a la tabla de resumen."""
+    updates = ", ".join(f"{metric} = {table}.{metric} + EXCLUDED.{metric}" for metric in _METRICS)
+    return (
+        f"INSERT INTO {table} ({', '.join(keys + _METRICS)})\n"
+        f"{aggregate}"
+        f"ON CONFLICT ({', '.join(keys)})\n"
+        f"DO UPDATE SET {updates}\n"
+    )
+
+
+# Tablas de resumen que se mantienen juntas (en este orden)
+_UPSERTS = {
+    "resumen_viajes": _upsert(
+        "resumen_viajes",
+        ["anio", "mes", "hora", "pickup_community_area", "dropoff_community_area"],
+        _AGGREGATE,
+    ),
+    "resumen_taxis": _upsert("resumen_taxis", ["taxi_id"], _TAXI_AGGREGATE),
+}
+
+# El signo va literal (una sentencia por signo) para que el tipo del
+# parámetro no dependa de cómo lo infiera cada driver (psycopg2/asyncpg)
+_ADJUST = {
+    sign: [
+        text(upsert.format(sign=str(sign), where="AND v.trip_id = ANY(:trip_ids)"))
+        .bindparams(bindparam("trip_ids", type_=ARRAY(Text)))
+        for upsert in _UPSERTS.values()
+    ]
+    for sign in (1, -1)
+}
+
+_ADJUST_STAGED = {
+    sign: [text(upsert.format(sign=str(sign), where=IN_CHANGES)) for upsert in _UPSERTS.values()]
+    for sign in (1, -1)
+}
+
+_REBUILD = [text(upsert.format(sign="1", where="")) for upsert in _UPSERTS.values()]
+
+# Otros agregados que se ajustan en los mismos puntos que las tablas de resumen
+# (p. ej. el cubo origen-destino en memoria de db/od_cube.py). Reciben los
+# mismos argumentos que adjust_rollups. Cada DBSessionManager tiene su
+# lista (rollup_hooks) y la deja en session.info con esta llave; main.py
+# la llena en el lifespan de cada app.
+RollupHook = Callable[[Session, Trips, int], None]
+ROLLUP_HOOKS_KEY = "rollup_hooks"
+
+
+def adjust_rollups(db_session: Session, trip_ids: Union[Iterable[str], StagedTrips], sign: int) -> None:
+    """
+    Suma (sign=1) o resta (sign=-1) la contribución actual de los viajes
+    indicados en resumen_viajes y resumen_taxis, dentro de la transacción
+    de la sesión.
+
+    Para reflejar una modificación se resta antes del cambio y se suma
+    después del flush; así el resumen queda igual que si se recalculara.
+    Con un StagedTrips los viajes se leen de CHANGES_TABLE.
+    """
+    trip_ids = as_trips(trip_ids)
+    if not trip_ids:
+        return
+    if isinstance(trip_ids, StagedTrips):
+        for statement in _ADJUST_STAGED[sign]:
+            db_session.execute(statement)
+    else:
+        for statement in _ADJUST[sign]:
+            db_session.execute(statement, {"trip_ids": trip_ids})
+    for hook in db_session.info.get(ROLLUP_HOOKS_KEY, ()):
+        hook(db_session, trip_ids, sign)
+
+
+def rebuild_rollups(db_session: Session) -> None:
+    """Recalcula las tablas de resumen completas a partir de las tablas normalizadas."""
+    db_session.execute(text(f"TRUNCATE {', '.join(_UPSERTS)}"))
+    for statement in _REBUILD:
+        db_session.execute(statement)
@@ -0,0 +1,283 @@
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.engine import Engine
+
+from db.entities import CiudadViaje, CommunityArea, Pago, Viaje
+
+# --- SNAPSHOT COLUMNAR (Parquet) PARA LOS REPORTES DE SQL/4_Consultas.sql ---
+# Estructura del directorio que escribe write_snapshot:
+#
+#   <dir>/community_area.parquet                 diccionario community_id -> nombre
+#   <dir>/viajes/anio=2019/mes=1/data.parquet    viaje + pago + zonas ya unidos
+#   ...
+#
+# El particionado anio=/mes= es el de Hive, así DuckDB descarta archivos
+# completos cuando un reporte filtra por fecha.
+
+# Filas por lote leído de la BD y por row group de Parquet
+BATCH_ROWS = 250_000
+
+
+def _as_float(column):
+    # NUMERIC -> double en la BD, sin pasar por Decimal en Python
+    return cast(column, Float).label(column.key)
+
+
+SNAPSHOT_COLUMNS = [
+    Viaje.trip_id,
+    Viaje.taxi_id,
+    Viaje.trip_start_timestamp,
+    Viaje.trip_end_timestamp,
+    _as_float(Viaje.trip_miles),
+    _as_float(Pago.fare),
+    _as_float(Pago.tips),
+    _as_float(Pago.tolls),
+    _as_float(Pago.extras),
+    _as_float(Pago.trip_total),
+    # Distingue "sin pago" de "pago con montos nulos" (JOIN pagos en SQL/4)
+    Pago.trip_id.is_not(None).label("con_pago"),
+    CiudadViaje.pickup_community_area,
+    CiudadViaje.dropoff_community_area,
+]
+
+
+def _schema():
+    import pyarrow as pa
+
+    money = pa.float64()
+    return pa.schema([
+        ("trip_id", pa.string()),
+        # Pocos taxis distintos: se guarda como diccionario
+        ("taxi_id", pa.dictionary(pa.int32(), pa.string())),
+        ("trip_start_timestamp", pa.timestamp("us")),
+        ("trip_end_timestamp", pa.timestamp("us")),
+        ("trip_miles", money),
+        ("fare", money),
+        ("tips", money),
+        ("tolls", money),
+        ("extras", money),
+        ("trip_total", money),
+        ("con_pago", pa.bool_()),
+        # 77 zonas: int16 en lugar de int64
+        ("pickup_community_area", pa.int16()),
+        ("dropoff_community_area", pa.int16()),
+    ])
+
+
+def _months(first: datetime, last: datetime) -> List[Tuple[datetime, datetime]]:
+    """Rangos [inicio, fin) de cada mes entre first y last."""
+    months = []
+    current = datetime(first.year, first.month, 1)
+    while current <= last:
+        following = datetime(current.year + current.month // 12, current.month % 12 + 1, 1)
+        months.append((current, following))
+        current = following
+    return months
+
+
+def _month_statement(start: datetime, end: datetime):
+    return (
+        select(*SNAPSHOT_COLUMNS)
+        .outerjoin(Pago, Pago.trip_id == Viaje.trip_id)
+        .outerjoin(CiudadViaje, CiudadViaje.trip_id == Viaje.trip_id)
+        .where(Viaje.trip_start_timestamp >= start, Viaje.trip_start_timestamp < end)
+    )
+
+
+def _write_month(engine: Engine, path: Path, start: datetime, end: datetime) -> int:
+    """Escribe un mes en un archivo temporal y lo renombra al terminar."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _schema()
+    rows_written = 0
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+
+    # stream_results: cursor del lado del servidor, la memoria no crece con el mes
+    with engine.connect().execution_options(stream_results=True, yield_per=BATCH_ROWS) as connection:
+        result = connection.execute(_month_statement(start, end))
+        writer = None
+        try:
+            for batch in result.partitions():
+                columns = list(zip(*batch))
+                table = pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                    schema=schema,
+                )
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+                writer.write_table(table, row_group_size=BATCH_ROWS)
+                rows_written += len(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    if rows_written:
+        os.replace(tmp_path, path)
+    elif path.exists():
+        path.unlink()
+    return rows_written
+
+
+def write_snapshot(
+    engine: Engine,
+    directory: str,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    on_month: Optional[Callable[[datetime, int, float], None]] = None,
+) -> Dict[str, int]:
+    """
+    Escribe el snapshot en Parquet, un archivo por mes. Sin desde/hasta se
+    cubre del primer al último viaje. Volver a correrlo reemplaza los
+    meses del rango (p. ej. solo el mes en curso).
+
+    Conviene pasar el engine de la réplica: cada mes es una lectura
+    secuencial del rango (BRIN / partición del mes).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+
+    with engine.connect() as connection:
+        areas = connection.execute(
+            select(CommunityArea.community_id, CommunityArea.community).order_by(CommunityArea.community_id)
+        ).all()
+        first, last = connection.execute(
+            select(func.min(Viaje.trip_start_timestamp), func.max(Viaje.trip_start_timestamp))
+        ).one()
+
+    pq.write_table(
+        pa.table({
+            "community_id": pa.array([area.community_id for area in areas], type=pa.int16()),
+            "community": pa.array([area.community for area in areas], type=pa.string()),
+        }),
+        root / "community_area.parquet",
+    )
+
+    totals = {"meses": 0, "filas": 0}
+    if first is None:
+        return totals
+    first = max(first, desde) if desde else first
+    last = min(last, hasta) if hasta else last
+
+    for start, end in _months(first, last):
+        started = time.perf_counter()
+        path = root / "viajes" / f"anio={start.year}" / f"mes={start.month}" / "data.parquet"
+        rows = _write_month(engine, path, start, end)
+        totals["meses"] += 1
+        totals["filas"] += rows
+        if on_month is not None:
+            on_month(start, rows, time.perf_counter() - started)
+    return totals
+
+
+# --- REPORTES SOBRE EL SNAPSHOT (DuckDB) ---
+# Mismas consultas que SQL/4_Consultas.sql. "viajes" es la vista del
+# snapshot (ya trae pago y zonas) y "community_area" el diccionario.
+_INTERVALO = """
+    CASE
+        WHEN hour(trip_start_timestamp) < 6 THEN 'Madrugada (00:00 - 05:59)'
+        WHEN hour(trip_start_timestamp) < 12 THEN 'Mañana (06:00 - 11:59)'
+        WHEN hour(trip_start_timestamp) < 18 THEN 'Tarde (12:00 - 17:59)'
+        ELSE 'Noche (18:00 - 23:59)'
+    END"""
+
+_ZONAS = """
+SELECT
+    v.{zona}_community_area AS zona_id,
+    ca.community AS nombre_zona,
+    v.anio, v.mes,
+    COUNT(*) AS total_viajes,
+    AVG(v.fare) AS avg_fare,
+    AVG(v.tips) AS avg_tips,
+    AVG(v.trip_miles) AS avg_distance_miles,
+    AVG(epoch(v.trip_end_timestamp - v.trip_start_timestamp)) / 60 AS avg_duration_minutes,
+    AVG(v.trip_total) AS avg_trip_total,
+    SUM(v.trip_total) AS ingresos_totales,
+    SUM(v.trip_miles) AS millas_totales,
+    SUM(v.trip_total) / NULLIF(SUM(v.trip_miles), 0) AS precio_promedio_por_milla
+FROM viajes v
+JOIN community_area ca ON ca.community_id = v.{zona}_community_area
+WHERE v.con_pago
+GROUP BY ALL
+ORDER BY zona_id, v.anio, v.mes
+"""
+
+REPORTS: Dict[str, str] = {
+    # Consulta 1: viajes por intervalo del día y año
+    "horarios": f"""
+        SELECT anio, {_INTERVALO} AS intervalo, COUNT(*) AS total_viajes,
+               ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (PARTITION BY anio), 2) AS porcentaje_por_anio
+        FROM viajes GROUP BY 1, 2 ORDER BY anio, intervalo
+    """,
+    # Consulta 1 (hora por hora)
+    "horas": """
+        SELECT anio, hour(trip_start_timestamp) AS hora, COUNT(*) AS total_viajes,
+               ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (PARTITION BY anio), 2) AS porcentaje_por_anio
+        FROM viajes GROUP BY 1, 2 ORDER BY anio, hora
+    """,
+    # Consulta 1 (entre semana vs. fin de semana)
+    "dias": f"""
+        SELECT anio,
+               CASE WHEN isodow(trip_start_timestamp) IN (6, 7) THEN 'Fin de Semana' ELSE 'Entre Semana (Lunes-Viernes)' END AS tipo_dia,
+               {_INTERVALO} AS momento_dia,
+               COUNT(*) AS total_viajes,
+               ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (PARTITION BY anio, tipo_dia), 2) AS porcentaje_relativo
+        FROM viajes GROUP BY 1, 2, 3 ORDER BY anio, tipo_dia DESC, momento_dia
+    """,
+    # Consulta 2: promedios mensuales
+    "mensual": """
+        SELECT anio, mes, COUNT(*) AS total_viajes, AVG(fare) AS tarifa, AVG(tips) AS propinas,
+               AVG(trip_miles) AS distancia_millas
+        FROM viajes WHERE con_pago GROUP BY ALL ORDER BY anio, mes
+    """,
+    # Consultas 3 y 5: por zona de origen
+    "zonas_pickup": _ZONAS.format(zona="pickup"),
+    # Consultas 4 y 6: por zona de destino
+    "zonas_dropoff": _ZONAS.format(zona="dropoff"),
+    # Consulta 7: propinas por año
+    "propinas_anio": """
+        SELECT anio, SUM(tips) AS total_propinas, AVG(tips) AS promedio_propinas,
+               MAX(tips) AS maximo, MIN(tips) AS minimo
+        FROM viajes WHERE con_pago GROUP BY ALL ORDER BY anio
+    """,
+    # Consulta 7: propinas por zona de destino
+    "propinas_zona": """
+        SELECT ca.community AS comunidad, SUM(v.tips) AS total_propinas, AVG(v.tips) AS promedio_propinas
+        FROM viajes v JOIN community_area ca ON ca.community_id = v.dropoff_community_area
+        WHERE v.con_pago GROUP BY ALL ORDER BY total_propinas DESC
+    """,
+}
+
+
+def connect_snapshot(directory: str, threads: Optional[int] = None):
+    """
+    Conexión DuckDB en memoria con las vistas viajes y community_area
+    sobre los archivos del snapshot. DuckDB paraleliza cada consulta en
+    todos los núcleos (o en threads).
+    """
+    import duckdb
+
+    root = Path(directory)
+    connection = duckdb.connect()
+    if threads:
+        connection.execute(f"SET threads = {int(threads)}")
+    viajes = (root / "viajes" / "**" / "*.parquet").as_posix().replace("'", "''")
+    areas = (root / "community_area.parquet").as_posix().replace("'", "''")
+    connection.execute(f"CREATE VIEW viajes AS SELECT * FROM read_parquet('{viajes}', hive_partitioning = true)")
+    connection.execute(f"CREATE VIEW community_area AS SELECT * FROM read_parquet('{areas}')")
+    return connection
+
+
+def run_report(connection, name: str) -> Tuple[List[str], List[tuple]]:
+    """Ejecuta un reporte de REPORTS; devuelve (columnas, filas)."""
+    cursor = connection.execute(REPORTS[name])
+    return [column[0] for column in cursor.description], cursor.fetchall()
@@ -1,32 +1,151 @@
+import os
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from db.entities import Base
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import OperationalError
+from db.config import DBSettings
+from db.od_cube import create_od_cube
 from db.session import DBSessionManager, DBSessionMiddleware
-from api.routers import PagosRouter, ViajesRouter, CommunityRouter
+from api.charts import shutdown_render_pool
+from api.routers import PagosRouter, ViajesRouter, CommunityRouter, AnalyticsRouter, TaxisRouter, ChartsRouter, HealthRouter, MetricsRouter
+from util.admission import DEFAULT_MAX_WAIT, AdmissionMiddleware, statement_timeout_handler
+from util.cache import create_cache
+from util.compression import DEFAULT_MINIMUM_SIZE, CompressionMiddleware
 from util.logger import LoggerSessionManager
+from util.metrics import MetricsMiddleware, create_metrics
+
+# Importar este módulo no toca la BD: los engines, los routers y el cubo
+# O-D se crean en el lifespan de cada worker, y el esquema se crea aparte
+# (`alembic upgrade head` o `python cli.py schema`). Así uvicorn --reload,
+# cada worker nuevo y las pruebas arrancan sin abrir conexiones.
+# Varios workers: `python cli.py serve --workers 4` (ver README).
 
-# 1. Inicialización de Gestores (Logger y DB)
+# 1. Inicialización del Logger (no abre conexiones)
 logger_session_manager = LoggerSessionManager()
+logger = logger_session_manager.get_logger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranque y cierre de un worker. Todo lo que abre conexiones o ocupa
+    memoria vive aquí; al salir se cierran los pools y el pool de
+    procesos de /charts.
+    """
+    started = time.perf_counter()
+    base_routes = list(app.router.routes)
+
+    # 2. Gestor de la DB. La configuración viene del entorno (DATABASE_URL,
+    # DB_ASYNC, DB_POOL_SIZE, DB_MAX_CONNECTIONS, WEB_CONCURRENCY, ...)
+    db_settings = DBSettings.from_env()
+    db_session_manager = DBSessionManager(logger_session_manager, db_settings)
+
+    # Se cuentan las sentencias de todos los engines (METRICS_SLOW_QUERY_MS)
+    metrics = app.state.metrics
+    for engine in db_session_manager.engines().values():
+        metrics.instrument_engine(engine)
+
+    # 3. Inicialización de Routers (Inyección de dependencias)
+    # Un solo cache compartido para que las escrituras de un router invaliden
+    # lo que leen los demás (CACHE_URL, CACHE_TTL, CACHE_MAX_ENTRIES)
+    cache = create_cache()
+    # Las versiones de las tablas (ETag / 304 de los listados y de /charts)
+    # y las invalidaciones viven en el cache. Con uno por proceso cada
+    # worker tendría las suyas y respondería 304 con datos que otro worker
+    # ya cambió: con más de un worker se exige CACHE_URL
+    if db_settings.workers > 1 and not cache.shared:
+        raise RuntimeError(
+            f"{db_settings.workers} workers (WEB_CONCURRENCY) con el cache en memoria de cada proceso: "
+            "configure CACHE_URL (Redis) o use un solo worker"
+        )
+
+    # Con DB_ASYNC=1 se usan las versiones async de los routers principales
+    if db_session_manager.async_mode:
+        from api.async_routers import AsyncPagosRouter, AsyncViajesRouter, AsyncCommunityRouter
+
+        viajes_router = AsyncViajesRouter(db_session_manager, logger_session_manager, cache)
+        pagos_router = AsyncPagosRouter(db_session_manager, logger_session_manager, cache)
+        community_router = AsyncCommunityRouter(db_session_manager, logger_session_manager, cache)
+    else:
+        viajes_router = ViajesRouter(db_session_manager, logger_session_manager, cache)
+        pagos_router = PagosRouter(db_session_manager, logger_session_manager, cache)
+        community_router = CommunityRouter(db_session_manager, logger_session_manager, cache)
+
+    # Cubo origen-destino en memoria para /analytics/od-matrix (OD_CUBE,
+    # OD_CUBE_MAX_MB, OD_CUBE_REFRESH); se carga una vez por worker, se
+    # mantiene con las escrituras de la API y se recarga si otro proceso escribió
+    od_cube = create_od_cube(logger)
+    if od_cube is not None:
+        def load_od_cube():
+            with db_session_manager.ReadSessionLocal() as session:
+                od_cube.load(session)
+
+        await run_in_threadpool(load_od_cube)
+
+    charts_router = ChartsRouter(db_session_manager, logger_session_manager, cache)
+
+    # Lo que se ajusta junto con las tablas de resumen en cada escritura
+    # (db.rollups.adjust_rollups). La lista es del gestor de este lifespan,
+    # así que una app nueva (pruebas, --reload) empieza sin hooks viejos
+    if od_cube is not None:
+        db_session_manager.rollup_hooks.append(od_cube.stage)
+    db_session_manager.rollup_hooks.append(charts_router.on_write)
+
+    routers = [
+        viajes_router,
+        pagos_router,
+        community_router,
+        AnalyticsRouter(db_session_manager, logger_session_manager, od_cube),
+        TaxisRouter(db_session_manager, logger_session_manager),
+        charts_router,
+        HealthRouter(db_session_manager, logger_session_manager),
+        MetricsRouter(db_session_manager, logger_session_manager, metrics, cache),
+    ]
+    # Registrar rutas
+    for router in routers:
+        app.include_router(router.router)
+
+    # DBSessionMiddleware toma el gestor de aquí
+    app.state.db_session_manager = db_session_manager
+    app.state.startup_ms = (time.perf_counter() - started) * 1000
+    logger.info(
+        f"Worker {os.getpid()} listo en {app.state.startup_ms:.0f} ms "
+        f"(pool {db_settings.pool_size}+{db_settings.max_overflow}, {db_settings.workers} worker(s))"
+    )
+    try:
+        yield
+    finally:
+        shutdown_render_pool()
+        app.router.routes[:] = base_routes
+        app.openapi_schema = None
+        await db_session_manager.dispose()
 
-# Se pasa el logger al manager de la DB
-db_session_manager = DBSessionManager(logger_session_manager)
 
-# 2. Creación de tablas (si no existen)
-# Nota: Como te conectas a una BD existente, esto no borrará datos, 
-# solo crearía tablas que falten según tus entidades.
-Base.metadata.create_all(bind=db_session_manager.engine)
+def create_app() -> FastAPI:
+    """App sin conexiones abiertas; también sirve con `uvicorn --factory main:create_app`."""
+    # 4. Configuración de la App
+    app = FastAPI(title="API Taxis Chicago (FastAPI + SQLAlchemy)", lifespan=lifespan)
 
-# 3. Inicialización de Routers (Inyección de dependencias)
-viajes_router = ViajesRouter(db_session_manager, logger_session_manager)
-pagos_router = PagosRouter(db_session_manager, logger_session_manager)
-community_router = CommunityRouter(db_session_manager, logger_session_manager)
+    # Métricas por request y log de consultas lentas (METRICS_SLOW_QUERY_MS,
+    # METRICS_SERVER_TIMING); los engines se instrumentan en el lifespan
+    app.state.metrics = create_metrics(logger_session_manager)
 
-# 4. Configuración de la App
-app = FastAPI(title="API Taxis Chicago (FastAPI + SQLAlchemy)")
+    # 5. Registrar Middleware (Crucial para request.state.db_session)
+    # El gestor de la DB se toma de app.state al llegar cada request
+    app.add_middleware(DBSessionMiddleware)
+    # gzip / brotli según Accept-Encoding (COMPRESSION_MIN_SIZE en bytes)
+    app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", DEFAULT_MINIMUM_SIZE)))
+    # Cupo de requests simultáneos y statement_timeout por clase de ruta
+    # (ADMISSION, ADMISSION_LIMITS, ADMISSION_TIMEOUTS_MS, ADMISSION_MAX_WAIT);
+    # por fuera de la sesión para que un 503 no pida conexión
+    app.add_middleware(AdmissionMiddleware, max_wait=float(os.getenv("ADMISSION_MAX_WAIT", DEFAULT_MAX_WAIT)))
+    # Una consulta cancelada por su statement_timeout responde 503, no 500
+    app.add_exception_handler(OperationalError, statement_timeout_handler)
+    # Se agrega al final para quedar por fuera y medir también el commit
+    app.add_middleware(MetricsMiddleware, metrics=app.state.metrics)
+    return app
 
-# Registrar rutas
-app.include_router(viajes_router.router)
-app.include_router(pagos_router.router)
-app.include_router(community_router.router)
 
-# 5. Registrar Middleware (Crucial para request.state.db_session)
-app.add_middleware(DBSessionMiddleware, db_session_manager=db_session_manager)
\ No newline at end of file
+app = create_app()
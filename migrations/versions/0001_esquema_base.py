@@ -0,0 +1,96 @@
+"""Esquema base: tablas normalizadas y resumen_viajes
+
+Equivale a SQL/3_Normalización.sql más la tabla de resumen de /analytics.
+Para una BD que ya se creó con los scripts de SQL/ no se ejecuta: se marca
+con `alembic stamp 0001_esquema_base`, se sube con `alembic upgrade head` y
+luego `python cli.py rollups` crea resumen_viajes (los scripts de SQL/ no
+la tienen) y llena las tablas de resumen. Sin ese paso /analytics falla.
+
+Revision ID: 0001_esquema_base
+Revises:
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_esquema_base"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "community_area",
+        sa.Column("community_id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("community", sa.String(30), nullable=True),
+    )
+    op.create_table(
+        "viajes",
+        sa.Column("trip_id", sa.Text(), primary_key=True),
+        sa.Column("taxi_id", sa.Text(), nullable=True),
+        sa.Column("trip_start_timestamp", sa.DateTime(), nullable=True),
+        sa.Column("trip_end_timestamp", sa.DateTime(), nullable=True),
+        sa.Column("trip_miles", sa.Numeric(), nullable=True),
+    )
+    op.create_table(
+        "pagos",
+        sa.Column(
+            "trip_id", sa.Text(),
+            sa.ForeignKey("viajes.trip_id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("fare", sa.Numeric(), nullable=True),
+        sa.Column("tips", sa.Numeric(), nullable=True),
+        sa.Column("tolls", sa.Numeric(), nullable=True),
+        sa.Column("extras", sa.Numeric(), nullable=True),
+        sa.Column("trip_total", sa.Numeric(), nullable=True),
+    )
+    op.create_table(
+        "ciudad_viaje",
+        sa.Column(
+            "trip_id", sa.Text(),
+            sa.ForeignKey("viajes.trip_id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "pickup_community_area", sa.Integer(),
+            sa.ForeignKey("community_area.community_id"), nullable=True,
+        ),
+        sa.Column(
+            "dropoff_community_area", sa.Integer(),
+            sa.ForeignKey("community_area.community_id"), nullable=True,
+        ),
+    )
+    op.create_table(
+        "resumen_viajes",
+        sa.Column("anio", sa.Integer(), primary_key=True),
+        sa.Column("mes", sa.Integer(), primary_key=True),
+        sa.Column("hora", sa.Integer(), primary_key=True),
+        sa.Column("pickup_community_area", sa.Integer(), primary_key=True),
+        sa.Column("dropoff_community_area", sa.Integer(), primary_key=True),
+        sa.Column("viajes", sa.BigInteger(), nullable=True),
+        sa.Column("viajes_con_pago", sa.BigInteger(), nullable=True),
+        sa.Column("viajes_con_millas", sa.BigInteger(), nullable=True),
+        sa.Column("viajes_con_duracion", sa.BigInteger(), nullable=True),
+        sa.Column("suma_fare", sa.Numeric(), nullable=True),
+        sa.Column("suma_tips", sa.Numeric(), nullable=True),
+        sa.Column("suma_trip_total", sa.Numeric(), nullable=True),
+        sa.Column("suma_millas", sa.Numeric(), nullable=True),
+        sa.Column("suma_duracion_segundos", sa.Numeric(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("resumen_viajes")
+    op.drop_table("ciudad_viaje")
+    op.drop_table("pagos")
+    op.drop_table("viajes")
+    op.drop_table("community_area")
@@ -0,0 +1,68 @@
+"""Índices para los filtros de la API y los reportes por tiempo
+
+Cada índice corresponde a una ruta de acceso existente:
+
+- viajes.trip_start_timestamp / trip_end_timestamp: BRIN. La tabla se
+  carga en orden cronológico, así que un BRIN de unos cuantos KB descarta
+  bloques completos en los reportes por año/mes y en trip_start_after /
+  trip_end_before.
+- (trip_start_timestamp, trip_id): B-tree para el listado con ventana de
+  tiempo, que pagina por keyset con ese mismo ORDER BY (ver api/routers.py).
+- viajes.trip_miles y pagos.trip_total: B-tree para los filtros por rango.
+- ciudad_viaje (zona, trip_id): B-tree que permite index-only scan al
+  filtrar por zona y unir con viajes por trip_id.
+
+Se crean con CONCURRENTLY para no bloquear escrituras en una BD con datos.
+
+Revision ID: 0002_indices_filtros
+Revises: 0001_esquema_base
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_indices_filtros"
+down_revision: Union[str, Sequence[str], None] = "0001_esquema_base"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (nombre, tabla, columnas, método)
+INDICES = [
+    ("ix_viajes_trip_start_brin", "viajes", ["trip_start_timestamp"], "brin"),
+    ("ix_viajes_trip_end_brin", "viajes", ["trip_end_timestamp"], "brin"),
+    ("ix_viajes_trip_start_trip_id", "viajes", ["trip_start_timestamp", "trip_id"], "btree"),
+    ("ix_viajes_trip_miles", "viajes", ["trip_miles"], "btree"),
+    ("ix_pagos_trip_total", "pagos", ["trip_total"], "btree"),
+    ("ix_ciudad_viaje_pickup", "ciudad_viaje", ["pickup_community_area", "trip_id"], "btree"),
+    ("ix_ciudad_viaje_dropoff", "ciudad_viaje", ["dropoff_community_area", "trip_id"], "btree"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+    with op.get_context().autocommit_block():
+        for name, table, columns, method in INDICES:
+            op.create_index(
+                name, table, columns,
+                postgresql_using=method,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+    # Estadísticas frescas para que el planner considere los índices nuevos
+    op.execute("ANALYZE viajes")
+    op.execute("ANALYZE pagos")
+    op.execute("ANALYZE ciudad_viaje")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDICES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,193 @@
+"""Partición opcional de viajes por mes (trip_start_timestamp)
+
+Solo se aplica si se pide explícitamente:
+
+    alembic -x particionar=true upgrade head
+
+Sin el flag la revisión queda registrada pero no cambia nada; para
+particionar después hay que bajar a 0002 y volver a subir con el flag.
+
+Qué cambia al particionar (por eso es opcional):
+
+- La llave primaria pasa a ser (trip_id, trip_start_timestamp): Postgres
+  exige que incluya la columna de partición, así que trip_start_timestamp
+  queda NOT NULL. Si hay viajes sin fecha de inicio la migración se detiene.
+- pagos y ciudad_viaje ya no pueden tener FOREIGN KEY hacia viajes(trip_id);
+  no hay ON DELETE CASCADE, así que delete_viajes (db/bulk.py) borra pagos,
+  zonas y viajes con un DELETE explícito por tabla.
+- Un trip_id ya no es único por sí solo: el mismo trip_id con otra fecha
+  de inicio no choca con la llave. La carga masiva (db/bulk.py) lo revisa
+  con NOT EXISTS antes de insertar; dos cargas simultáneas con el mismo
+  trip_id todavía podrían insertarlo dos veces.
+- GET /viajes/{trip_id} revisa el índice de cada partición; los filtros y
+  reportes con rango de fechas solo leen las particiones del rango.
+
+Se crea una partición por mes entre el mínimo y el máximo existentes, más
+una partición DEFAULT para fechas fuera de ese rango.
+
+Revision ID: 0003_particion_viajes
+Revises: 0002_indices_filtros
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_particion_viajes"
+down_revision: Union[str, Sequence[str], None] = "0002_indices_filtros"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Mismos índices que 0002 (CONCURRENTLY no aplica a tablas particionadas)
+INDICES_VIAJES = [
+    "CREATE INDEX ix_viajes_trip_start_brin ON viajes USING brin (trip_start_timestamp)",
+    "CREATE INDEX ix_viajes_trip_end_brin ON viajes USING brin (trip_end_timestamp)",
+    "CREATE INDEX ix_viajes_trip_start_trip_id ON viajes (trip_start_timestamp, trip_id)",
+    "CREATE INDEX ix_viajes_trip_miles ON viajes (trip_miles)",
+]
+
+DROP_INDICES_VIAJES = [
+    "DROP INDEX IF EXISTS ix_viajes_trip_start_brin",
+    "DROP INDEX IF EXISTS ix_viajes_trip_end_brin",
+    "DROP INDEX IF EXISTS ix_viajes_trip_start_trip_id",
+    "DROP INDEX IF EXISTS ix_viajes_trip_miles",
+]
+
+CREAR_PARTICIONES = """
+DO $$
+DECLARE
+    desde date;
+    hasta date;
+    mes date;
+BEGIN
+    SELECT date_trunc('month', min(trip_start_timestamp)),
+           date_trunc('month', max(trip_start_timestamp)) + interval '1 month'
+    INTO desde, hasta
+    FROM viajes_sin_particion;
+
+    IF desde IS NULL THEN
+        desde := date_trunc('month', now());
+        hasta := desde + interval '1 month';
+    END IF;
+
+    mes := desde;
+    WHILE mes < hasta LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF viajes FOR VALUES FROM (%L) TO (%L)',
+            'viajes_' || to_char(mes, 'YYYY_MM'), mes, mes + interval '1 month'
+        );
+        mes := mes + interval '1 month';
+    END LOOP;
+END $$
+"""
+
+VERIFICAR_FECHAS = """
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM viajes WHERE trip_start_timestamp IS NULL) THEN
+        RAISE EXCEPTION 'Hay viajes sin trip_start_timestamp; no se pueden particionar';
+    END IF;
+END $$
+"""
+
+
+def _particionar_solicitado() -> bool:
+    value = context.get_x_argument(as_dictionary=True).get("particionar", "")
+    return value.lower() in ("1", "true", "yes", "si")
+
+
+def _viajes_particionada() -> bool:
+    """En modo offline (--sql) no hay conexión; se confía en el flag."""
+    if context.is_offline_mode():
+        return _particionar_solicitado()
+    relkind = op.get_bind().execute(
+        sa.text("SELECT relkind FROM pg_class WHERE oid = to_regclass('viajes')")
+    ).scalar()
+    return relkind == "p"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _particionar_solicitado():
+        return
+    if not context.is_offline_mode() and _viajes_particionada():
+        return
+
+    op.execute(VERIFICAR_FECHAS)
+
+    op.execute("ALTER TABLE pagos DROP CONSTRAINT IF EXISTS pagos_trip_id_fkey")
+    op.execute("ALTER TABLE ciudad_viaje DROP CONSTRAINT IF EXISTS ciudad_viaje_trip_id_fkey")
+
+    op.execute("ALTER TABLE viajes RENAME TO viajes_sin_particion")
+    op.execute("ALTER TABLE viajes_sin_particion RENAME CONSTRAINT viajes_pkey TO viajes_sin_particion_pkey")
+    for statement in DROP_INDICES_VIAJES:
+        op.execute(statement)
+
+    op.execute("""
+        CREATE TABLE viajes (
+            trip_id TEXT NOT NULL,
+            taxi_id TEXT,
+            trip_start_timestamp TIMESTAMP NOT NULL,
+            trip_end_timestamp TIMESTAMP,
+            trip_miles NUMERIC,
+            CONSTRAINT viajes_pkey PRIMARY KEY (trip_id, trip_start_timestamp)
+        ) PARTITION BY RANGE (trip_start_timestamp)
+    """)
+    op.execute(CREAR_PARTICIONES)
+    op.execute("CREATE TABLE viajes_default PARTITION OF viajes DEFAULT")
+
+    op.execute("""
+        INSERT INTO viajes (trip_id, taxi_id, trip_start_timestamp, trip_end_timestamp, trip_miles)
+        SELECT trip_id, taxi_id, trip_start_timestamp, trip_end_timestamp, trip_miles
+        FROM viajes_sin_particion
+    """)
+    # Los índices se crean después de copiar: es más rápido que mantenerlos fila por fila
+    for statement in INDICES_VIAJES:
+        op.execute(statement)
+
+    op.execute("DROP TABLE viajes_sin_particion")
+    op.execute("ANALYZE viajes")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not _viajes_particionada():
+        return
+
+    op.execute("ALTER TABLE viajes RENAME TO viajes_particionada")
+    op.execute("ALTER TABLE viajes_particionada RENAME CONSTRAINT viajes_pkey TO viajes_particionada_pkey")
+    for statement in DROP_INDICES_VIAJES:
+        op.execute(statement)
+
+    op.execute("""
+        CREATE TABLE viajes (
+            trip_id TEXT PRIMARY KEY,
+            taxi_id TEXT,
+            trip_start_timestamp TIMESTAMP,
+            trip_end_timestamp TIMESTAMP,
+            trip_miles NUMERIC
+        )
+    """)
+    op.execute("""
+        INSERT INTO viajes (trip_id, taxi_id, trip_start_timestamp, trip_end_timestamp, trip_miles)
+        SELECT trip_id, taxi_id, trip_start_timestamp, trip_end_timestamp, trip_miles
+        FROM viajes_particionada
+    """)
+    op.execute("DROP TABLE viajes_particionada CASCADE")
+    for statement in INDICES_VIAJES:
+        op.execute(statement)
+
+    op.execute("""
+        ALTER TABLE pagos ADD CONSTRAINT pagos_trip_id_fkey
+        FOREIGN KEY (trip_id) REFERENCES viajes (trip_id) ON DELETE CASCADE
+    """)
+    op.execute("""
+        ALTER TABLE ciudad_viaje ADD CONSTRAINT ciudad_viaje_trip_id_fkey
+        FOREIGN KEY (trip_id) REFERENCES viajes (trip_id) ON DELETE CASCADE
+    """)
+    op.execute("ANALYZE viajes")
@@ -0,0 +1,36 @@
+"""Tabla de checkpoints de la ingesta por chunks (cli.py ingest)
+
+Revision ID: 0004_ingesta_checkpoint
+Revises: 0003_particion_viajes
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_ingesta_checkpoint"
+down_revision: Union[str, Sequence[str], None] = "0003_particion_viajes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "ingesta_checkpoint",
+        sa.Column("archivo", sa.Text(), primary_key=True),
+        sa.Column("tamano_chunk", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("chunk", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("filas_leidas", sa.Integer(), nullable=True),
+        sa.Column("filas_insertadas", sa.Integer(), nullable=True),
+        sa.Column("completado", sa.DateTime(), server_default=sa.func.now(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("ingesta_checkpoint")
@@ -0,0 +1,98 @@
+"""Resumen por taxi (resumen_taxis) e índice en viajes.taxi_id
+
+- resumen_taxis: un registro por taxi con las mismas métricas que
+  resumen_viajes; lo usan /taxis/{taxi_id}/stats y /taxis/top y se
+  mantiene junto con resumen_viajes (db/rollups.py). Se llena aquí con
+  los viajes existentes.
+- ix_viajes_taxi_id: B-tree para filtrar viajes por taxi (?taxi_id= en
+  /viajes) sin recorrer la tabla completa.
+
+El índice se crea con CONCURRENTLY salvo que viajes esté particionada
+(0003), donde no aplica.
+
+Revision ID: 0005_resumen_taxis
+Revises: 0004_ingesta_checkpoint
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_resumen_taxis"
+down_revision: Union[str, Sequence[str], None] = "0004_ingesta_checkpoint"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+LLENAR_RESUMEN = """
+INSERT INTO resumen_taxis (
+    taxi_id, viajes, viajes_con_pago, viajes_con_millas, viajes_con_duracion,
+    suma_fare, suma_tips, suma_trip_total, suma_millas, suma_duracion_segundos
+)
+SELECT
+    v.taxi_id,
+    COUNT(*),
+    COUNT(p.trip_id),
+    COUNT(v.trip_miles),
+    COUNT(v.trip_end_timestamp),
+    COALESCE(SUM(p.fare), 0),
+    COALESCE(SUM(p.tips), 0),
+    COALESCE(SUM(p.trip_total), 0),
+    COALESCE(SUM(v.trip_miles), 0),
+    COALESCE(SUM(EXTRACT(EPOCH FROM v.trip_end_timestamp - v.trip_start_timestamp)), 0)
+FROM viajes v
+LEFT JOIN pagos p ON p.trip_id = v.trip_id
+WHERE v.taxi_id IS NOT NULL
+GROUP BY v.taxi_id
+"""
+
+
+def _viajes_particionada() -> bool:
+    """En modo offline (--sql) no hay conexión; se asume sin particionar."""
+    if context.is_offline_mode():
+        return False
+    relkind = op.get_bind().execute(
+        sa.text("SELECT relkind FROM pg_class WHERE oid = to_regclass('viajes')")
+    ).scalar()
+    return relkind == "p"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _viajes_particionada():
+        op.create_index("ix_viajes_taxi_id", "viajes", ["taxi_id"], if_not_exists=True)
+    else:
+        # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+        with op.get_context().autocommit_block():
+            op.create_index(
+                "ix_viajes_taxi_id", "viajes", ["taxi_id"],
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+    op.create_table(
+        "resumen_taxis",
+        sa.Column("taxi_id", sa.Text(), primary_key=True),
+        sa.Column("viajes", sa.BigInteger(), nullable=True),
+        sa.Column("viajes_con_pago", sa.BigInteger(), nullable=True),
+        sa.Column("viajes_con_millas", sa.BigInteger(), nullable=True),
+        sa.Column("viajes_con_duracion", sa.BigInteger(), nullable=True),
+        sa.Column("suma_fare", sa.Numeric(), nullable=True),
+        sa.Column("suma_tips", sa.Numeric(), nullable=True),
+        sa.Column("suma_trip_total", sa.Numeric(), nullable=True),
+        sa.Column("suma_millas", sa.Numeric(), nullable=True),
+        sa.Column("suma_duracion_segundos", sa.Numeric(), nullable=True),
+    )
+    op.execute(LLENAR_RESUMEN)
+    op.execute("ANALYZE viajes")
+    op.execute("ANALYZE resumen_taxis")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("resumen_taxis")
+    op.drop_index("ix_viajes_taxi_id", table_name="viajes", if_exists=True)
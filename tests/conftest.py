@@ -0,0 +1,86 @@
+import os
+from contextlib import ExitStack, contextmanager
+from typing import Dict, List
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from db.entities import Base
+from db.rollups import rebuild_rollups
+from tests.data import sample_trips, seed
+
+
+@pytest.fixture
+def trips() -> List[dict]:
+    return sample_trips()
+
+
+@pytest.fixture
+def database_url(tmp_path, trips) -> str:
+    url = f"sqlite:///{tmp_path / 'taxis.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, trips)
+    engine.dispose()
+    return url
+
+
+@contextmanager
+def _serve(monkeypatch, database_url: str, env: Dict[str, str]):
+    """La app de main.py (lifespan incluido) sobre database_url."""
+    monkeypatch.setenv("DATABASE_URL", database_url)
+    monkeypatch.setenv("OD_CUBE", "0")
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    for variable in ("CACHE_URL", "DB_ASYNC", "DATABASE_REPLICA_URL"):
+        monkeypatch.delenv(variable, raising=False)
+    for variable, value in env.items():
+        monkeypatch.setenv(variable, value)
+
+    from main import create_app
+
+    with TestClient(create_app()) as client:
+        yield client
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """serve(database_url, **env): la app sobre otra BD o con más variables de entorno."""
+    with ExitStack() as stack:
+        yield lambda database_url, **env: stack.enter_context(_serve(monkeypatch, database_url, env))
+
+
+@pytest.fixture
+def client(database_url, serve):
+    return serve(database_url)
+
+
+@pytest.fixture
+def postgres_url() -> str:
+    url = os.getenv("TEST_DATABASE_URL", "")
+    if not url.startswith("postgresql"):
+        pytest.skip("requiere TEST_DATABASE_URL=postgresql://...")
+    return url
+
+
+@pytest.fixture
+def pg_database(postgres_url, trips) -> str:
+    """Esquema y datos de prueba en TEST_DATABASE_URL; se borran al terminar."""
+    engine = create_engine(postgres_url)
+    Base.metadata.create_all(engine)
+    try:
+        with Session(engine) as session:
+            seed(session, trips)
+            rebuild_rollups(session)
+            session.commit()
+        yield postgres_url
+    finally:
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+
+@pytest.fixture
+def pg_client(pg_database, serve):
+    return serve(pg_database)
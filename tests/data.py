@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from db.entities import CiudadViaje, CommunityArea, Pago, Viaje
+
+# Las pruebas corren sobre SQLite (lecturas, filtros, cursor, ETag). Lo que
+# solo existe en Postgres (resúmenes, EXPLAIN, COPY) se prueba contra
+# TEST_DATABASE_URL=postgresql://... si está definida; si no, se omite.
+N_VIAJES = 30
+START = datetime(2021, 6, 1)
+
+
+def sample_trips() -> List[dict]:
+    """
+    Viajes de prueba: 3 taxis, 5 zonas y varios viajes con el mismo
+    trip_start_timestamp (para el desempate por trip_id del cursor). Los
+    dos últimos no tienen fecha de inicio.
+    """
+    trips = []
+    for i in range(N_VIAJES):
+        start = None if i >= N_VIAJES - 2 else START + timedelta(hours=(i // 2) * 5)
+        trips.append({
+            "trip_id": f"t{i:03d}",
+            "taxi_id": f"taxi{i % 3}",
+            "trip_start_timestamp": start,
+            "trip_end_timestamp": START + timedelta(hours=i * 5, minutes=20),
+            "trip_miles": i % 10,
+            "fare": 5 + i,
+            "tips": i % 4,
+            "trip_total": 5 + i + i % 4,
+            "pickup": 1 + i % 5,
+            "dropoff": 1 + (i + 2) % 5,
+        })
+    return trips
+
+
+def seed(session: Session, trips: List[dict]) -> None:
+    session.add_all(CommunityArea(community_id=i, community=f"Zona {i}") for i in range(1, 6))
+    for trip in trips:
+        session.add(Viaje(
+            trip_id=trip["trip_id"],
+            taxi_id=trip["taxi_id"],
+            trip_start_timestamp=trip["trip_start_timestamp"],
+            trip_end_timestamp=trip["trip_end_timestamp"],
+            trip_miles=trip["trip_miles"],
+        ))
+        session.add(Pago(trip_id=trip["trip_id"], fare=trip["fare"], tips=trip["tips"], tolls=0, extras=0, trip_total=trip["trip_total"]))
+        session.add(CiudadViaje(trip_id=trip["trip_id"], pickup_community_area=trip["pickup"], dropoff_community_area=trip["dropoff"]))
+    session.commit()
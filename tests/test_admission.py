@@ -0,0 +1,91 @@
+import asyncio
+
+from db.session import STATEMENT_TIMEOUT_KEY
+from util.admission import AdmissionMiddleware, RouteClass, create_route_classes
+
+
+def test_environment_overrides_limits_and_timeouts(monkeypatch):
+    monkeypatch.setenv("ADMISSION_LIMITS", "listado=3, pesado=1")
+    monkeypatch.setenv("ADMISSION_TIMEOUTS_MS", "listado=900")
+    classes = create_route_classes()
+    assert (classes["listado"].limit, classes["listado"].queue, classes["listado"].statement_timeout_ms) == (3, 6, 900)
+    assert classes["pesado"].limit == 1
+    assert (classes["general"].limit, classes["general"].statement_timeout_ms) == (32, 2_000)
+
+
+def _scope(method: str, path: str) -> dict:
+    return {"type": "http", "method": method, "path": path, "headers": []}
+
+
+def _run(middleware, scopes):
+    """Manda los requests a la vez; devuelve el status de cada uno."""
+    async def main():
+        statuses = {}
+
+        def sender(index):
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses[index] = message["status"]
+            return send
+
+        await asyncio.gather(*(middleware(scope, None, sender(index)) for index, scope in enumerate(scopes)))
+        return [statuses[index] for index in range(len(scopes))]
+
+    return asyncio.run(main())
+
+
+def _app(reached, hold: float = 0.0):
+    async def app(scope, receive, send):
+        reached.append(scope)
+        await asyncio.sleep(hold)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+    return app
+
+
+def test_full_class_is_503_without_waiting():
+    reached = []
+    classes = {"listado": RouteClass("listado", limit=1, statement_timeout_ms=5_000, queue=0)}
+    middleware = AdmissionMiddleware(_app(reached, hold=0.05), classes=classes)
+    statuses = _run(middleware, [_scope("GET", "/viajes/"), _scope("GET", "/viajes/")])
+    assert statuses == [200, 503]
+    assert len(reached) == 1
+    # El statement_timeout de la clase queda en request.state
+    assert reached[0]["state"][STATEMENT_TIMEOUT_KEY] == 5_000
+
+
+def test_queued_request_waits_for_a_place():
+    reached = []
+    classes = {"listado": RouteClass("listado", limit=1, statement_timeout_ms=0, queue=1)}
+    middleware = AdmissionMiddleware(_app(reached, hold=0.05), classes=classes)
+    assert _run(middleware, [_scope("GET", "/viajes/"), _scope("GET", "/pagos/")]) == [200, 200]
+    # Sin statement_timeout no se toca el estado
+    assert all("state" not in scope for scope in reached)
+
+
+def test_queue_wait_is_bounded():
+    reached = []
+    classes = {"listado": RouteClass("listado", limit=1, statement_timeout_ms=0, queue=1)}
+    middleware = AdmissionMiddleware(_app(reached, hold=0.3), classes=classes, max_wait=0.05)
+    assert _run(middleware, [_scope("GET", "/viajes/"), _scope("GET", "/viajes/")]) == [200, 503]
+
+
+def test_classes_have_their_own_places():
+    reached = []
+    classes = {
+        "listado": RouteClass("listado", limit=1, statement_timeout_ms=0, queue=0),
+        "general": RouteClass("general", limit=1, statement_timeout_ms=0, queue=0),
+    }
+    middleware = AdmissionMiddleware(_app(reached, hold=0.05), classes=classes)
+    # Un listado en curso no frena el GET por ID; salud no pasa por el control
+    statuses = _run(middleware, [_scope("GET", "/viajes/"), _scope("GET", "/viajes/t001"), _scope("GET", "/health"), _scope("GET", "/health")])
+    assert statuses == [200, 200, 200, 200]
+
+
+def test_admission_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("ADMISSION", "0")
+    reached = []
+    classes = {"listado": RouteClass("listado", limit=1, statement_timeout_ms=5_000, queue=0)}
+    middleware = AdmissionMiddleware(_app(reached, hold=0.05), classes=classes)
+    assert _run(middleware, [_scope("GET", "/viajes/"), _scope("GET", "/viajes/")]) == [200, 200]
+    assert all("state" not in scope for scope in reached)
@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from api.bulk import BulkStream, iter_line_batches, parse_bulk
+
+
+def _batches(chunks, size):
+    async def source():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [batch async for batch in iter_line_batches(source(), size)]
+
+    return asyncio.run(collect())
+
+
+def test_parse_bulk_reports_each_bad_line_and_keeps_the_rest():
+    lines = [
+        json.dumps({"trip_id": "n1", "pickup_community_area": 1}),
+        "{no es json",
+        json.dumps({"trip_id": "n2", "trip_miles": "muchas"}),
+        json.dumps({"trip_id": "n1"}),
+        json.dumps({"trip_id": "n3", "dropoff_community_area": 99}),
+        "",
+        json.dumps({"trip_id": "n4"}),
+    ]
+    rows, errors = parse_bulk("ndjson", lines, valid_area_ids={1, 2})
+    assert [(line, row.trip_id) for line, row in rows] == [(1, "n1"), (7, "n4")]
+    assert [(error.line, error.trip_id) for error in errors] == [(2, None), (3, "n2"), (4, "n1"), (5, "n3")]
+    assert errors[2].error == "trip_id duplicado en el lote"
+    assert errors[3].error == "community_area inexistente: 99"
+
+
+def test_parse_bulk_csv_numbers_lines_after_header():
+    rows, errors = parse_bulk("csv", ["trip_id,fare,taxi_id", "c1,3.5,", "c2,caro,x"])
+    assert [(line, row.trip_id, row.taxi_id) for line, row in rows] == [(2, "c1", None)]
+    assert [(error.line, error.trip_id) for error in errors] == [(3, "c2")]
+
+
+def test_line_batches_keep_split_utf8_and_strip_crlf():
+    body = "a\r\nñandú\r\nc\nd".encode()
+    # Se parte en medio de la ñ (dos bytes)
+    cut = body.index("ñ".encode()) + 1
+    assert _batches([body[:cut], body[cut:]], size=3) == [["a", "ñandú", "c"], ["d"]]
+
+
+def test_line_batches_invalid_utf8_is_400():
+    with pytest.raises(HTTPException) as error:
+        _batches([b"ok\n\xff\xfe\n"], size=10)
+    assert error.value.status_code == 400
+
+
+def test_stream_validates_csv_parts_with_the_header():
+    stream = BulkStream("csv")
+    assert [row.trip_id for row in stream.feed(["trip_id,fare", "c1,1"])] == ["c1"]
+    assert [row.trip_id for row in stream.feed(["c2,2", "c1,3", "c3,x"])] == ["c2"]
+    assert [(error.line, error.trip_id) for error in stream.errors] == [(4, "c1"), (5, "c3")]
+    assert stream.received == 4
+
+
+def test_stream_rejects_oversized_bodies(monkeypatch):
+    monkeypatch.setattr("api.bulk.MAX_BULK_ROWS", 2)
+    stream = BulkStream("ndjson")
+    stream.feed(['{"trip_id": "a"}', '{"trip_id": "b"}'])
+    with pytest.raises(HTTPException) as error:
+        stream.feed(['{"trip_id": "c"}', '{"trip_id": "d"}'])
+    assert error.value.status_code == 413
+
+
+def test_bulk_copies_full_trips(pg_client):
+    lines = [
+        {"trip_id": "b001", "taxi_id": "taxiB", "trip_start_timestamp": "2021-07-01T10:00:00", "trip_miles": 4,
+         "fare": 12, "tips": 2, "trip_total": 14, "pickup_community_area": 1, "dropoff_community_area": 2},
+        {"trip_id": "t000", "taxi_id": "taxiB"},
+        {"trip_id": "b002", "pickup_community_area": 42},
+        {"trip_id": "b003", "taxi_id": "taxiB", "trip_total": 7},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines)
+    response = pg_client.post("/viajes/bulk", content=body, headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["received"], result["inserted"]) == (4, 2)
+    assert [error["line"] for error in result["errors"]] == [2, 3]
+    assert result["errors"][0]["error"] == "El viaje ya existe"
+
+    viaje = pg_client.get("/viajes/b001", params={"expand": "pago,ciudad"}).json()
+    assert viaje["taxi_id"] == "taxiB"
+    assert pg_client.get("/pagos/b001").json()["trip_total"] == 14
+    assert pg_client.get("/pagos/b003").json()["trip_total"] == 7
+    assert pg_client.get("/viajes/b002").status_code == 404
+    # Lo existente no se tocó
+    assert pg_client.get("/viajes/t000").json()["taxi_id"] == "taxi0"
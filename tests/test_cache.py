@@ -0,0 +1,81 @@
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from util.cache import MemoryCache, bump_data_version, get_versioned, invalidate, set_versioned
+
+
+def test_memory_cache_lru_and_ttl(monkeypatch):
+    cache = MemoryCache(ttl=10, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    # "b" es la menos usada
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.stats() == {
+        "backend": "MemoryCache", "hits": 1, "misses": 1, "hit_ratio": 0.5,
+        "entries": 2, "max_entries": 2, "evictions": 1,
+    }
+
+    now = time.monotonic()
+    monkeypatch.setattr("util.cache.time.monotonic", lambda: now + 11)
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_invalidate_deletes_now_and_after_commit(database_url):
+    cache = MemoryCache()
+    cache.set("viaje:t001", {"trip_miles": 1})
+    engine = create_engine(database_url)
+    with Session(engine) as db_session:
+        invalidate(db_session, cache, "viaje:t001")
+        assert cache.get("viaje:t001") is None
+        # Una lectura concurrente vuelve a guardar la versión anterior
+        cache.set("viaje:t001", {"trip_miles": 1})
+        db_session.commit()
+    assert cache.get("viaje:t001") is None
+
+    with Session(engine) as db_session:
+        db_session.connection()
+        invalidate(db_session, cache, "viaje:t002")
+        db_session.rollback()
+        cache.set("viaje:t002", {})
+        db_session.commit()
+    # Un rollback descarta el borrado pendiente
+    assert cache.get("viaje:t002") == {}
+    engine.dispose()
+
+
+def test_bump_invalidates_every_versioned_entry(database_url):
+    cache = MemoryCache()
+    version, _ = get_versioned(cache, "grafica:a", "datos")
+    set_versioned(cache, "grafica:a", version, "png")
+    assert get_versioned(cache, "grafica:a", "datos") == (version, "png")
+
+    engine = create_engine(database_url)
+    with Session(engine) as db_session:
+        bump_data_version(db_session, cache)
+        db_session.commit()
+    engine.dispose()
+    new_version, value = get_versioned(cache, "grafica:a", "datos")
+    assert new_version != version and value is None
+
+
+def test_write_invalidates_the_cached_pago(pg_client):
+    assert pg_client.get("/pagos/t003").json()["trip_total"] == 11
+    body = {"trip_id": "t003", "fare": 8, "tips": 3, "tolls": 0, "extras": 0, "trip_total": 99}
+    assert pg_client.put("/pagos/t003", json=body).status_code == 200
+    assert pg_client.get("/pagos/t003").json()["trip_total"] == 99
+
+
+def test_metrics_expose_cache_stats(client):
+    client.get("/viajes/t001")
+    client.get("/viajes/t001")
+    metrics = client.get("/metrics").text
+    assert 'cache_hits_total{backend="MemoryCache"}' in metrics
+    assert 'cache_misses_total{backend="MemoryCache"}' in metrics
+    assert "# TYPE cache_entries gauge" in metrics
+    entries = next(line for line in metrics.splitlines() if line.startswith("cache_entries{"))
+    assert int(entries.rsplit(" ", 1)[1]) >= 1
@@ -0,0 +1,80 @@
+import asyncio
+import gzip
+
+import pytest
+
+from util import compression
+from util.compression import CompressionMiddleware, negotiate
+
+
+def _respond(content_type: bytes, chunks, accept_encoding: str = "gzip", minimum_size: int = 16):
+    """Corre el middleware sobre una app que manda chunks; devuelve (headers, cuerpo)."""
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+        for index, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=minimum_size)(scope, None, send))
+    headers = {name.decode().lower(): value.decode() for name, value in messages[0]["headers"]}
+    return headers, b"".join(message.get("body", b"") for message in messages[1:])
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [("gzip, deflate", "gzip"), ("identity", None), ("gzip;q=0", None), ("*", "gzip"), ("", None)],
+)
+def test_negotiate_without_brotli(monkeypatch, accept_encoding, expected):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert negotiate(accept_encoding) == expected
+
+
+def test_negotiate_prefers_brotli_when_installed(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", object())
+    assert negotiate("gzip, br") == "br"
+    assert negotiate("gzip, br;q=0") == "gzip"
+
+
+def test_compresses_json_over_the_minimum():
+    body = b'{"trip_id": "t000"}' * 10
+    headers, content = _respond(b"application/json", [body])
+    assert headers["content-encoding"] == "gzip"
+    assert headers["content-length"] == str(len(content))
+    assert headers["vary"] == "Accept-Encoding"
+    assert gzip.decompress(content) == body
+
+
+def test_small_or_binary_bodies_pass_through():
+    headers, content = _respond(b"application/json", [b"{}"])
+    assert "content-encoding" not in headers and content == b"{}"
+    assert headers["vary"] == "Accept-Encoding"
+
+    png = b"\x89PNG" * 100
+    headers, content = _respond(b"image/png", [png])
+    assert "content-encoding" not in headers and "vary" not in headers
+    assert content == png
+
+
+def test_streams_are_compressed_chunk_by_chunk():
+    chunks = [b'{"trip_id": "t%03d"}\n' % i for i in range(5)]
+    headers, content = _respond(b"application/x-ndjson", chunks)
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    assert gzip.decompress(content) == b"".join(chunks)
+
+
+def test_list_endpoint_is_gzipped(client):
+    response = client.get("/viajes/", params={"limit": 30}, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    # httpx descomprime el cuerpo
+    assert len(response.json()) == 30
+
+    plain = client.get("/viajes/", params={"limit": 30}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.json() == response.json()
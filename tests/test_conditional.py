@@ -0,0 +1,116 @@
+import json
+from email.utils import formatdate
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+import cli
+from api.conditional import conditional_get, etag_matches
+from util.cache import DATA_VERSION, MemoryCache, bump_data_version, data_version
+
+
+def make_request(query: str = "", **headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/viajes/",
+        "query_string": query.encode(),
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_same_version_gives_304():
+    cache = MemoryCache()
+    headers, not_modified = conditional_get(make_request("limit=10"), cache, "viajes")
+    assert not_modified is None
+    assert headers["ETag"].startswith('W/"')
+
+    headers_again, not_modified = conditional_get(make_request("limit=10", if_none_match=headers["ETag"]), cache, "viajes")
+    assert headers_again["ETag"] == headers["ETag"]
+    assert not_modified is not None and not_modified.status_code == 304
+
+
+def test_etag_depends_on_query_but_not_parameter_order():
+    cache = MemoryCache()
+    etag = conditional_get(make_request("limit=10&skip=5"), cache, "viajes")[0]["ETag"]
+    assert conditional_get(make_request("skip=5&limit=10"), cache, "viajes")[0]["ETag"] == etag
+    assert conditional_get(make_request("limit=20&skip=5"), cache, "viajes")[0]["ETag"] != etag
+
+
+def test_weak_comparison_and_lists():
+    request = make_request(if_none_match='"otro", "abc"')
+    assert etag_matches(request, 'W/"abc"')
+    assert etag_matches(make_request(if_none_match="*"), 'W/"abc"')
+    assert not etag_matches(make_request(if_none_match='"otro"'), 'W/"abc"')
+
+
+def test_write_changes_version_again_at_commit():
+    cache = MemoryCache()
+    engine = create_engine("sqlite://")
+    etag = conditional_get(make_request(), cache, "viajes", "pagos")[0]["ETag"]
+
+    with Session(engine) as session:
+        session.connection()
+        bump_data_version(session, cache, "pagos")
+        # Una lectura antes del commit genera una versión nueva...
+        during = conditional_get(make_request(if_none_match=etag), cache, "viajes", "pagos")
+        assert during[1] is None
+        session.commit()
+
+    # ...que el commit vuelve a descartar: nadie valida contra ella
+    headers, not_modified = conditional_get(make_request(if_none_match=during[0]["ETag"]), cache, "viajes", "pagos")
+    assert not_modified is None
+    assert headers["ETag"] not in (etag, during[0]["ETag"])
+
+
+def test_if_modified_since_only_without_if_none_match():
+    cache = MemoryCache()
+    headers, _ = conditional_get(make_request(), cache, "viajes")
+    last_modified = headers["Last-Modified"]
+    assert conditional_get(make_request(if_modified_since=last_modified), cache, "viajes")[1] is not None
+    assert conditional_get(make_request(if_modified_since=formatdate(0, usegmt=True)), cache, "viajes")[1] is None
+    # If-None-Match gana aunque If-Modified-Since diga que no cambió
+    assert conditional_get(make_request(if_none_match='"otro"', if_modified_since=last_modified), cache, "viajes")[1] is None
+
+
+def test_list_endpoint_answers_304(client):
+    response = client.get("/viajes/", params={"limit": 5})
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    again = client.get("/viajes/", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert client.get("/viajes/", params={"limit": 6}, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_cli_writes_change_the_versions(pg_database, tmp_path, monkeypatch):
+    # El MemoryCache hace las veces del Redis compartido con la API
+    cache = MemoryCache()
+    monkeypatch.setenv("DATABASE_URL", pg_database)
+    monkeypatch.setattr(cli, "shared_cache", lambda: cache)
+
+    def versions():
+        return [data_version(cache, table) for table in cli.WRITTEN_VERSIONS]
+
+    before = versions()
+    path = tmp_path / "viajes.ndjson"
+    path.write_text(json.dumps({"trip_id": "c001", "taxi_id": "taxiC", "trip_total": 7}) + "\n")
+    assert cli.main(["bulk", str(path)]) == 0
+    after_bulk = versions()
+    assert all(old != new for old, new in zip(before, after_bulk))
+
+    # Un lote sin viajes nuevos no cambia nada
+    assert cli.main(["bulk", str(path)]) == 1
+    assert versions() == after_bulk
+
+    assert cli.main(["rollups"]) == 0
+    assert data_version(cache, DATA_VERSION) != after_bulk[-1]
+    assert data_version(cache, "viajes") == after_bulk[0]
+
+
+def test_cli_without_shared_cache_keeps_the_memory_versions(monkeypatch):
+    monkeypatch.delenv("CACHE_URL", raising=False)
+    assert cli.shared_cache() is None
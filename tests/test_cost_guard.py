@@ -0,0 +1,108 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import psycopg2
+
+from api.cost_guard import _verdict, guard_list, guard_params
+from api.counting import explain_statement, total_count
+from db.entities import Viaje
+from util.cache import MemoryCache
+
+
+class FakePostgresSession:
+    """Sesión de Postgres de mentira: responde cada EXPLAIN con el costo dado."""
+
+    def __init__(self, page_cost: float, count_cost: float, rows: int = 1_000):
+        self.dialect = psycopg2.dialect()
+        self.costs = {"page": page_cost, "count": count_cost}
+        self.rows = rows
+        self.explained = []
+
+    def get_bind(self):
+        return self
+
+    def connection(self):
+        return self
+
+    def exec_driver_sql(self, sql):
+        self.explained.append(sql)
+        cost = self.costs["count" if "count(*)" in sql else "page"]
+        self.plan = json.dumps([{"Plan": {"Total Cost": cost, "Plan Rows": self.rows}}])
+        return self
+
+    def scalar(self):
+        return self.plan
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setenv("LIST_MAX_COST", "1000")
+    monkeypatch.setenv("COUNT_MAX_COST", "500")
+
+
+def test_verdict():
+    assert _verdict("viajes", {"page": 10, "count": 10}, "exact") == "exact"
+    assert _verdict("viajes", {"page": 10, "count": 600}, "exact") == "estimated"
+    assert _verdict("viajes", {"page": 10, "count": None}, "none") == "none"
+    with pytest.raises(HTTPException) as error:
+        _verdict("viajes", {"page": 5_000, "count": None}, "none")
+    assert error.value.status_code == 400
+
+
+def test_zero_disables_limits(monkeypatch):
+    monkeypatch.setenv("LIST_MAX_COST", "0")
+    monkeypatch.setenv("COUNT_MAX_COST", "0")
+    assert _verdict("viajes", {"page": 1e12, "count": 1e12}, "exact") == "exact"
+
+
+def _guard(db_session, cache, count, skip=0):
+    page = select(Viaje.trip_id).where(Viaje.taxi_id == "taxi1").offset(skip).limit(100)
+    count_base = select(Viaje.trip_id).where(Viaje.taxi_id == "taxi1")
+    params = guard_params({"taxi_id": "taxi1"}, skip, 100, None)
+    return guard_list(db_session, cache, "viajes", page, count_base, count, params)
+
+
+def test_expensive_count_downgrades_to_estimated():
+    db_session = FakePostgresSession(page_cost=10, count_cost=800)
+    assert _guard(db_session, MemoryCache(), "exact") == "estimated"
+    assert len(db_session.explained) == 2
+
+
+def test_expensive_page_is_400():
+    with pytest.raises(HTTPException) as error:
+        _guard(FakePostgresSession(page_cost=50_000, count_cost=10), MemoryCache(), "none", skip=5_000_000)
+    assert error.value.status_code == 400
+
+
+def test_verdict_is_cached_per_params():
+    cache = MemoryCache()
+    db_session = FakePostgresSession(page_cost=10, count_cost=800)
+    _guard(db_session, cache, "exact")
+    assert _guard(db_session, cache, "exact") == "estimated"
+    assert len(db_session.explained) == 2
+    # Otro skip es otra combinación
+    _guard(db_session, cache, "exact", skip=100)
+    assert len(db_session.explained) == 4
+
+
+def test_not_postgres_is_not_guarded(client):
+    # Sobre SQLite no hay EXPLAIN: count=exact se respeta
+    response = client.get("/viajes/", params={"count": "exact", "taxi_id": "taxi1"})
+    assert response.status_code == 200
+    assert response.headers["X-Total-Count-Mode"] == "exact"
+    assert response.headers["X-Total-Count"] == "10"
+
+
+def test_explain_keeps_colons_in_literals():
+    # text() leería ":y" como parámetro; el EXPLAIN va tal cual al driver
+    stmt = select(Viaje.trip_id).where(Viaje.taxi_id == "x :y")
+    sql = explain_statement(stmt, psycopg2.dialect())
+    assert sql.startswith("EXPLAIN (FORMAT JSON) ") and "'x :y'" in sql
+
+    db_session = FakePostgresSession(page_cost=10, count_cost=10, rows=42)
+    headers = total_count(db_session, MemoryCache(), "viajes", "estimated", stmt, {"taxi_id": "x :y"})
+    assert headers == {"X-Total-Count": "42", "X-Total-Count-Mode": "estimated"}
+    assert "'x :y'" in db_session.explained[0]
+
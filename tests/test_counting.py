@@ -0,0 +1,42 @@
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from api.counting import count_statement
+from db.entities import Viaje
+
+
+def test_count_statement_drops_order_and_pagination():
+    sql = str(count_statement(select(Viaje.trip_id).where(Viaje.trip_miles > 3).order_by(Viaje.trip_id).limit(5)))
+    assert sql.startswith("SELECT count(*)")
+    assert "LIMIT" not in sql.split("FROM", 1)[0]
+
+
+def _count(client, **params):
+    response = client.get("/viajes/", params={"limit": 2, **params})
+    assert response.status_code == 200
+    return response.headers.get("X-Total-Count"), response.headers.get("X-Total-Count-Mode")
+
+
+def test_exact_count_matches_the_filters(client, trips):
+    assert _count(client, count="exact", taxi_id="taxi1") == ("10", "exact")
+    assert _count(client) == (None, None)
+    # Sin EXPLAIN (SQLite) estimated se cuenta exacto
+    assert _count(client, count="estimated", trip_miles_min=5) == (str(sum(trip["trip_miles"] >= 5 for trip in trips)), "exact")
+
+
+def test_count_is_cached_per_filters(client, database_url):
+    assert _count(client, count="exact", taxi_id="taxi2") == ("10", "exact")
+    engine = create_engine(database_url)
+    with Session(engine) as db_session:
+        db_session.add(Viaje(trip_id="t999", taxi_id="taxi2", trip_miles=1))
+        db_session.commit()
+    engine.dispose()
+    # Otra página, mismos filtros: el total sale del cache (COUNT_TTL)
+    assert _count(client, count="exact", taxi_id="taxi2", skip=2) == ("10", "exact")
+    assert _count(client, count="exact", taxi_id="taxi2", trip_miles_min=0) == ("11", "exact")
+
+
+def test_estimated_count_uses_the_planner(pg_client):
+    total, mode = _count(pg_client, count="estimated", taxi_id="taxi1")
+    assert mode == "estimated" and int(total) > 0
+    assert _count(pg_client, count="exact", taxi_id="taxi1") == ("10", "exact")
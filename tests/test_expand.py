@@ -0,0 +1,53 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from api.expand import parse_expand
+
+
+def test_areas_implies_ciudad():
+    assert parse_expand("pago, areas") == {"pago", "ciudad", "areas"}
+    assert parse_expand(None) == frozenset()
+    with pytest.raises(HTTPException) as error:
+        parse_expand("pago,taxi")
+    assert error.value.status_code == 400
+
+
+def test_detail_nests_the_requested_relations(client, trips):
+    trip = trips[3]
+    viaje = client.get(f"/viajes/{trip['trip_id']}", params={"expand": "pago,areas"}).json()
+    assert viaje["pago"]["trip_total"] == trip["trip_total"]
+    assert viaje["ciudad"]["pickup_area"] == {"community_id": trip["pickup"], "community": f"Zona {trip['pickup']}"}
+    assert viaje["ciudad"]["dropoff_area"]["community_id"] == trip["dropoff"]
+
+    # Sin expand la respuesta es la de siempre
+    assert "pago" not in client.get(f"/viajes/{trip['trip_id']}").json()
+
+
+def _statements(client, params):
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = client.app.state.db_session_manager.read_engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.get("/viajes/", params=params)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert response.status_code == 200
+    return response.json(), len(statements)
+
+
+def test_list_cost_does_not_grow_with_the_page(client):
+    small, small_count = _statements(client, {"expand": "pago,ciudad,areas", "limit": 2})
+    page, page_count = _statements(client, {"expand": "pago,ciudad,areas", "limit": 30})
+    assert len(small) == 2 and len(page) == 30
+    assert all(viaje["pago"] and viaje["ciudad"]["pickup_area"] for viaje in page)
+    # Una sentencia para la página y una por relación, sin N+1
+    assert small_count == page_count
+
+
+def test_fields_and_expand_are_exclusive(client):
+    assert client.get("/viajes/", params={"expand": "pago", "fields": "trip_id"}).status_code == 400
@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+
+import pytest
+from sqlalchemy import event
+
+from tests.data import N_VIAJES
+
+
+def _ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_ndjson_streams_every_filtered_row(client, trips):
+    response = client.get("/viajes/export", params={"taxi_id": "taxi0"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = _ndjson(response)
+    assert sorted(row["trip_id"] for row in rows) == sorted(trip["trip_id"] for trip in trips if trip["taxi_id"] == "taxi0")
+    assert set(rows[0]) == {"trip_id", "taxi_id", "trip_start_timestamp", "trip_end_timestamp", "trip_miles"}
+
+
+def test_csv_with_includes(client):
+    response = client.get("/viajes/export", params={"format": "csv", "include": "pago,ciudad"})
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == "attachment; filename=viajes.csv"
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == N_VIAJES
+    assert {"trip_total", "pickup_community_area"} <= set(rows[0])
+
+
+def test_unknown_include_is_400(client):
+    assert client.get("/viajes/export", params={"include": "pago,taxis"}).status_code == 400
+
+
+@pytest.fixture
+def timed_client(pg_database, serve):
+    return serve(pg_database, ADMISSION_TIMEOUTS_MS="pesado=4321")
+
+
+def test_export_is_a_read_only_transaction_with_route_timeout(timed_client):
+    # En AUTOCOMMIT psycopg2 no puede abrir el cursor del lado del servidor
+    statements = []
+    engine = timed_client.app.state.db_session_manager.read_engine
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+
+    response = timed_client.get("/viajes/export", params={"trip_miles_min": 5})
+    assert response.status_code == 200
+    assert len(_ndjson(response)) == sum(1 for i in range(N_VIAJES) if i % 10 >= 5)
+    assert "SET LOCAL statement_timeout = 4321" in statements
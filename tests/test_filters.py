@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import pytest
+
+from api.filters import PagoFilters, ViajeFilters
+
+
+def viaje_filters(**values) -> ViajeFilters:
+    # Sin Depends los defaults serían objetos Query
+    params = dict.fromkeys(
+        ["taxi_id", "pickup_community_id", "dropoff_community_id", "trip_miles_min",
+         "trip_miles_max", "trip_start_after", "trip_end_before", "trip_total"]
+    )
+    return ViajeFilters(**{**params, **values})
+
+
+def _ids(client, path, **params):
+    response = client.get(path, params={"limit": 1000, **params})
+    assert response.status_code == 200
+    return sorted(row["trip_id"] for row in response.json())
+
+
+def test_as_dict_only_active_filters():
+    assert viaje_filters(taxi_id="taxi1", trip_total=0).as_dict() == {"taxi_id": "taxi1", "trip_total": 0}
+    assert PagoFilters(min_total=None, max_total=10).as_dict() == {"max_total": 10}
+
+
+def test_orders_by_start_only_with_trip_start_after():
+    assert viaje_filters(trip_start_after="2021-06-01").orders_by_start
+    assert not viaje_filters(trip_end_before="2021-06-02").orders_by_start
+    assert not viaje_filters().orders_by_start
+
+
+@pytest.mark.parametrize(
+    "params, keep",
+    [
+        ({"taxi_id": "taxi1"}, lambda trip: trip["taxi_id"] == "taxi1"),
+        ({"pickup_community_id": 2}, lambda trip: trip["pickup"] == 2),
+        ({"dropoff_community_id": 3, "pickup_community_id": 1}, lambda trip: trip["dropoff"] == 3 and trip["pickup"] == 1),
+        ({"trip_miles_min": 3, "trip_miles_max": 5}, lambda trip: 3 <= trip["trip_miles"] <= 5),
+        ({"trip_total": 20}, lambda trip: trip["trip_total"] >= 20),
+        ({"taxi_id": "taxi2", "trip_total": 15}, lambda trip: trip["taxi_id"] == "taxi2" and trip["trip_total"] >= 15),
+        (
+            {"trip_start_after": "2021-06-02", "trip_end_before": "2021-06-05"},
+            lambda trip: trip["trip_start_timestamp"] is not None
+            and trip["trip_start_timestamp"] >= datetime(2021, 6, 2)
+            and trip["trip_end_timestamp"] <= datetime(2021, 6, 5),
+        ),
+    ],
+)
+def test_viaje_filters(client, trips, params, keep):
+    expected = sorted(trip["trip_id"] for trip in trips if keep(trip))
+    assert 0 < len(expected) < len(trips)
+    assert _ids(client, "/viajes/", **params) == expected
+
+
+def test_trip_end_before_keeps_trips_without_start(client, trips):
+    # Solo trip_end_before no ordena por fecha de inicio, así que los
+    # viajes sin trip_start_timestamp siguen en el listado
+    ids = _ids(client, "/viajes/", trip_end_before="2021-07-01")
+    assert {trip["trip_id"] for trip in trips if trip["trip_start_timestamp"] is None} <= set(ids)
+    assert ids == sorted(trip["trip_id"] for trip in trips if trip["trip_end_timestamp"] <= datetime(2021, 7, 1))
+
+
+def test_pago_filters(client, trips):
+    expected = sorted(trip["trip_id"] for trip in trips if 10 <= trip["trip_total"] <= 20)
+    assert _ids(client, "/pagos/", min_total=10, max_total=20) == expected
+
+
+def test_invalid_filter_is_422(client):
+    assert client.get("/viajes/", params={"pickup_community_id": 0}).status_code == 422
@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from db.config import DBSettings, pool_for_workers
+from db.entities import Base
+from tests.data import N_VIAJES, seed
+
+
+def test_pool_is_split_between_workers():
+    assert pool_for_workers(100, 4) == (12, 13)
+    # En modo async cada worker tiene dos pools contra el primario
+    assert pool_for_workers(100, 4, 2) == (6, 6)
+    assert pool_for_workers(3, 8) == (1, 1)
+
+
+def test_settings_from_env(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgresql+psycopg2://u@db/taxis")
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    monkeypatch.setenv("DB_MAX_CONNECTIONS", "100")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "2")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "0")
+    settings = DBSettings.from_env()
+    # El valor explícito gana sobre el calculado
+    assert (settings.pool_size, settings.max_overflow, settings.pool_pre_ping) == (12, 2, False)
+    assert settings.engine_options(settings.database_url)["pool_size"] == 12
+    assert "pool_size" not in settings.engine_options("sqlite:///taxis.db")
+    assert settings.get_async_url() == "postgresql+asyncpg://u@db/taxis"
+
+
+def test_health_reports_pools(client):
+    response = client.get("/health/db")
+    assert response.status_code == 200
+    health = response.json()
+    assert health["status"] == "ok"
+    assert health["latency_ms"]["primary"] >= 0
+    assert [pool["name"] for pool in health["pools"]] == ["primary"]
+
+
+def test_health_is_503_when_the_database_fails(client, monkeypatch):
+    def ping(engine):
+        raise ConnectionError("sin conexión")
+
+    monkeypatch.setattr(client.app.state.db_session_manager, "ping", ping)
+    response = client.get("/health/db")
+    assert response.status_code == 503
+    assert response.json()["latency_ms"] == {"primary": None}
+
+
+@pytest.fixture
+def replica_url(tmp_path, trips) -> str:
+    # Réplica con los datos; el primario queda con el esquema vacío
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, trips)
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def replica_client(tmp_path, replica_url, serve):
+    primary = f"sqlite:///{tmp_path / 'primary.db'}"
+    engine = create_engine(primary)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return serve(primary, DATABASE_REPLICA_URL=replica_url)
+
+
+def test_reads_go_to_the_replica(replica_client):
+    assert len(replica_client.get("/viajes/", params={"limit": 1000}).json()) == N_VIAJES
+    health = replica_client.get("/health/db").json()
+    assert set(health["latency_ms"]) == {"primary", "replica"}
+    assert [pool["name"] for pool in health["pools"]] == ["primary", "replica"]
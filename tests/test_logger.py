@@ -0,0 +1,78 @@
+import io
+import json
+import logging
+
+import pytest
+
+from util.logger import FRAMEWORK_LOGGERS, LoggerSessionManager, SamplingFilter, _level, _parse_mapping
+
+
+def test_env_mappings():
+    assert _parse_mapping("uvicorn.access=WARNING, sqlalchemy.engine=10,mal") == {
+        "uvicorn.access": "WARNING", "sqlalchemy.engine": "10",
+    }
+    assert (_level("warning"), _level("10"), _level(logging.ERROR)) == (logging.WARNING, 10, logging.ERROR)
+
+
+def _record(name: str, level: int) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, "mensaje", None, None)
+
+
+def test_sampling_by_logger_prefix():
+    sampling = SamplingFilter({"uvicorn": 1.0, "uvicorn.access": 0.0})
+    # El nombre más específico gana
+    assert not sampling.filter(_record("uvicorn.access", logging.INFO))
+    assert not sampling.filter(_record("uvicorn.access.hijo", logging.INFO))
+    assert sampling.filter(_record("uvicorn.error", logging.INFO))
+    assert sampling.filter(_record("uvicorn.accesso", logging.INFO))
+    # WARNING o más siempre pasa
+    assert sampling.filter(_record("uvicorn.access", logging.WARNING))
+
+
+@pytest.fixture
+def prod_logging(monkeypatch):
+    """Un LoggerSessionManager en modo prod; se restaura la configuración global."""
+    saved = {
+        name: (list(logger.handlers), logger.level, logger.propagate)
+        for name in FRAMEWORK_LOGGERS for logger in [logging.getLogger(name)]
+    }
+    monkeypatch.setattr(LoggerSessionManager, "_instance", None)
+    manager = LoggerSessionManager(
+        name="prueba", mode="prod",
+        levels={"prueba.ruido": logging.WARNING},
+        sample_rates={"prueba.muestreo": 0.0},
+    )
+    output = io.StringIO()
+    manager.console_handler.setStream(output)
+    yield manager, output
+    manager.shutdown()
+    logging.getLogger("prueba").handlers.clear()
+    for name, (handlers, level, propagate) in saved.items():
+        logger = logging.getLogger(name)
+        logger.handlers[:] = handlers
+        logger.setLevel(level)
+        logger.propagate = propagate
+
+
+def test_prod_mode_writes_json_lines_from_the_listener(prod_logging):
+    manager, output = prod_logging
+    logger = manager.get_logger("api")
+    logger.info("viaje %s", "t001")
+    try:
+        raise ValueError("roto")
+    except ValueError:
+        logger.exception("falló")
+    manager.get_logger("ruido").info("no sale")
+    manager.get_logger("muestreo").info("no sale")
+    manager.get_logger("muestreo").warning("sí sale")
+    logging.getLogger("sqlalchemy.engine").info("SELECT 1")
+    manager.shutdown()
+
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [(line["logger"], line["level"], line["msg"]) for line in lines] == [
+        ("prueba.api", "INFO", "viaje t001"),
+        ("prueba.api", "ERROR", "falló"),
+        ("prueba.muestreo", "WARNING", "sí sale"),
+    ]
+    assert "ValueError: roto" in lines[1]["exc"]
+    assert "\033" not in output.getvalue()
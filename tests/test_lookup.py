@@ -0,0 +1,36 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from api.lookup import unique_ids
+
+
+def test_unique_ids_keep_order_and_limit(monkeypatch):
+    assert unique_ids(["b", "a", "b", "c", "a"]) == ["b", "a", "c"]
+    monkeypatch.setattr("api.lookup.MAX_LOOKUP_IDS", 2)
+    with pytest.raises(HTTPException) as error:
+        unique_ids(["a", "b", "c"])
+    assert error.value.status_code == 413
+
+
+def test_lookup_resolves_in_chunks(pg_client, trips, monkeypatch):
+    monkeypatch.setattr("api.lookup.LOOKUP_CHUNK_SIZE", 2)
+    ids = ["t001", "nope", "t002", "t001", "t029", "otro"]
+    result = pg_client.post("/viajes/lookup", json={"ids": ids}).json()
+    found = {viaje["trip_id"]: viaje for viaje in result["found"]}
+    assert sorted(found) == ["t001", "t002", "t029"]
+    assert result["missing"] == ["nope", "otro"]
+    assert found["t029"]["trip_start_timestamp"] is None
+
+    pagos = pg_client.post("/pagos/lookup", json={"ids": ["t003", "nope"]}).json()
+    assert [pago["trip_total"] for pago in pagos["found"]] == [trips[3]["trip_total"]]
+
+
+def test_lookup_streams_ndjson(pg_client, monkeypatch):
+    monkeypatch.setattr("api.lookup.LOOKUP_CHUNK_SIZE", 2)
+    response = pg_client.post("/viajes/lookup", params={"stream": True}, json={"ids": ["t001", "nope", "t002"]})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    *rows, last = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["trip_id"] for row in rows) == ["t001", "t002"]
+    assert last == {"missing": ["nope"]}
@@ -0,0 +1,52 @@
+from util.metrics import Histogram
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latencia", "Latencia", ["route"], [0.1, 1.0])
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, '/a"b')
+    assert list(histogram.render()) == [
+        "# HELP latencia Latencia",
+        "# TYPE latencia histogram",
+        'latencia_bucket{route="/a\\"b",le="0.1"} 1',
+        'latencia_bucket{route="/a\\"b",le="1"} 3',
+        'latencia_bucket{route="/a\\"b",le="+Inf"} 4',
+        'latencia_sum{route="/a\\"b"} 4.250000',
+        'latencia_count{route="/a\\"b"} 4',
+    ]
+
+
+def _sample(metrics: str, prefix: str) -> float:
+    return float(next(line for line in metrics.splitlines() if line.startswith(prefix)).rsplit(" ", 1)[1])
+
+
+def test_requests_are_measured_by_route_template(client):
+    assert "server-timing" not in client.get("/viajes/t001").headers
+    client.get("/viajes/t002")
+    client.get("/no-existe")
+    metrics = client.get("/metrics").text
+
+    labels = 'method="GET",route="/viajes/{trip_id}"'
+    assert _sample(metrics, f"http_request_duration_seconds_count{{{labels},status=\"200\"}}") == 2
+    # Cada detalle hace al menos un SELECT
+    assert _sample(metrics, f"http_request_db_statements_sum{{{labels}}}") >= 2
+    assert _sample(metrics, f"http_request_db_seconds_count{{{labels}}}") == 2
+    assert 'route="sin_ruta",status="404"' in metrics
+    assert 'db_pool_wait_seconds_count{engine="primary"}' in metrics
+
+
+def test_server_timing_header(database_url, serve):
+    client = serve(database_url, METRICS_SERVER_TIMING="1")
+    header = client.get("/viajes/t001").headers["server-timing"]
+    assert header.startswith("db;dur=") and "sentencias" in header and ", app;dur=" in header
+
+
+def test_slow_query_log_carries_the_list_filters(database_url, serve, monkeypatch):
+    client = serve(database_url, METRICS_SLOW_QUERY_MS="0")
+    warnings = []
+    monkeypatch.setattr(client.app.state.metrics.logger, "warning", warnings.append)
+
+    client.get("/viajes/", params={"taxi_id": "taxi1", "limit": 5})
+    listing = [message for message in warnings if "GET /viajes/ " in message]
+    assert listing and "'taxi_id': 'taxi1'" in listing[-1] and "SELECT" in listing[-1]
+    assert "db_slow_queries_total" in client.get("/metrics").text
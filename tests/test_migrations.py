@@ -0,0 +1,78 @@
+from argparse import Namespace
+from datetime import datetime
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+import cli
+from db.bulk import copy_viajes
+from tests.data import N_VIAJES, sample_trips, seed
+
+
+def _alembic(url: str, *x: str) -> Config:
+    config = Config("alembic.ini")
+    config.cmd_opts = Namespace(x=[f"url={url}", *x])
+    return config
+
+
+@pytest.fixture
+def partitioned_url(postgres_url):
+    """TEST_DATABASE_URL migrada con viajes particionada; se baja al terminar."""
+    command.upgrade(_alembic(postgres_url, "particionar=true"), "head")
+    try:
+        yield postgres_url
+    finally:
+        command.downgrade(_alembic(postgres_url), "base")
+
+
+def test_bulk_skips_existing_trip_ids_with_another_start(partitioned_url):
+    engine = create_engine(partitioned_url)
+    with Session(engine) as db_session:
+        assert db_session.execute(text("SELECT relkind FROM pg_class WHERE oid = 'viajes'::regclass")).scalar() == "p"
+        trip = sample_trips()[0]
+        db_session.execute(text("INSERT INTO community_area VALUES (1, 'Zona 1')"))
+        assert copy_viajes(db_session, [{**trip, "pickup_community_area": 1}]) == {trip["trip_id"]}
+
+        # La llave es (trip_id, trip_start_timestamp): otra fecha no choca en ON CONFLICT
+        again = {**trip, "trip_start_timestamp": datetime(2022, 1, 1)}
+        assert copy_viajes(db_session, [again, {**again, "trip_id": "nuevo"}]) == {"nuevo"}
+        assert db_session.execute(text("SELECT count(*) FROM viajes")).scalar() == 2
+        db_session.commit()
+    engine.dispose()
+
+
+@pytest.fixture
+def stamped_url(postgres_url):
+    """Una BD hecha con los scripts de SQL/ (sin resumen_viajes), marcada y subida a head."""
+    command.upgrade(_alembic(postgres_url), "0001_esquema_base")
+    engine = create_engine(postgres_url)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE resumen_viajes"))
+    engine.dispose()
+    command.upgrade(_alembic(postgres_url), "head")
+    try:
+        yield postgres_url
+    finally:
+        # Si la prueba falló antes de crearla, el downgrade de 0001 no la encuentra
+        engine = create_engine(postgres_url)
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE IF NOT EXISTS resumen_viajes (anio int)"))
+        engine.dispose()
+        command.downgrade(_alembic(postgres_url), "base")
+
+
+def test_rollups_command_creates_the_missing_summary(stamped_url, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", stamped_url)
+    engine = create_engine(stamped_url)
+    with Session(engine) as db_session:
+        seed(db_session, sample_trips())
+
+    assert cli.main(["rollups"]) == 0
+    with engine.connect() as connection:
+        viajes = connection.execute(text("SELECT sum(viajes) FROM resumen_viajes")).scalar()
+    # Los viajes sin fecha de inicio no entran en resumen_viajes
+    assert viajes == N_VIAJES - 2
+    engine.dispose()
@@ -0,0 +1,103 @@
+import time
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text, update
+from sqlalchemy.orm import Session
+
+from db.entities import Pago
+from db.od_cube import ODCube, write_signature
+from tests.data import sample_trips
+
+pytest.importorskip("numpy")
+
+
+def _cube(**options) -> ODCube:
+    return ODCube(max_mb=64, start=date(2021, 1, 1), end=date(2022, 1, 1), **options)
+
+
+def _cube_row(dia: date, ingresos: float):
+    return SimpleNamespace(dia=dia, hora=5, pickup=8, dropoff=32, viajes=1, viajes_con_millas=1, ingresos=ingresos, millas=2.5)
+
+
+def test_od_cube_patch_delta():
+    cube = _cube(refresh_seconds=0)
+    before = [_cube_row(date(2021, 6, day), 10.1 * day) for day in range(1, 29)]
+    after = [_cube_row(date(2021, 6, day), 10.1 * day + 0.01) for day in range(1, 29)]
+    cube.apply(before, 1)
+    # Un PATCH: se resta lo de antes y se suma lo de después
+    cube.apply(before, -1)
+    cube.apply(after, 1)
+
+    result = cube.matrix(date(2021, 6, 1), date(2021, 6, 30))
+    assert result["viajes"][8, 32] == 28
+    assert result["ingresos"][8, 32] == pytest.approx(sum(row.ingresos for row in after), abs=1e-9)
+    assert cube.ingresos.dtype.name == "float64"
+    assert cube.matrix(date(2021, 7, 1), date(2021, 7, 31))["viajes"].sum() == 0
+
+
+# --- Postgres: solo las escrituras de otros procesos recargan el cubo ---
+
+@pytest.fixture
+def pg_engine(pg_database):
+    engine = create_engine(pg_database)
+    yield engine
+    engine.dispose()
+
+
+def _put_trip_total(db_session, trip_id, trip_total, hook=lambda: None):
+    db_session.execute(update(Pago).where(Pago.trip_id == trip_id).values(trip_total=trip_total))
+    hook()
+    # Que el backend publique sus estadísticas al terminar la transacción
+    db_session.execute(text("SELECT pg_stat_force_next_flush()"))
+    db_session.commit()
+
+
+def _trip_total(trip_id):
+    return next(trip["trip_total"] for trip in sample_trips() if trip["trip_id"] == trip_id)
+
+
+def _published(pg_engine, signature):
+    """Espera a que la firma de escrituras llegue a signature."""
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        with Session(pg_engine) as db_session:
+            if write_signature(db_session) >= signature:
+                return True
+        time.sleep(0.1)
+    return False
+
+
+def _refresh_loads(cube, pg_engine) -> bool:
+    loads = []
+    load = cube.load
+    cube.load = lambda db_session: loads.append(load(db_session))
+    cube._refresh(lambda: Session(pg_engine))
+    del cube.load
+    return bool(loads)
+
+
+def test_own_writes_do_not_reload(pg_engine):
+    cube = _cube(refresh_seconds=1)
+    with Session(pg_engine) as db_session:
+        cube.load(db_session)
+    total = cube.matrix(date(2021, 1, 1), date(2021, 12, 31))["ingresos"].sum()
+
+    # Como PUT /pagos/{trip_id}: el hook del cubo resta y suma el viaje
+    with Session(pg_engine) as db_session:
+        cube.stage(db_session, ["t003"], -1)
+        _put_trip_total(db_session, "t003", 1000, hook=lambda: cube.stage(db_session, ["t003"], 1))
+
+    assert cube.local_writes == 1
+    assert _published(pg_engine, cube.signature + cube.local_writes)
+    assert not _refresh_loads(cube, pg_engine)
+    assert cube.matrix(date(2021, 1, 1), date(2021, 12, 31))["ingresos"].sum() == pytest.approx(total + 1000 - _trip_total("t003"))
+
+    # La misma escritura desde otro proceso (sin el hook) sí recarga
+    with Session(pg_engine) as db_session:
+        _put_trip_total(db_session, "t004", 1000)
+    assert _published(pg_engine, cube.signature + cube.local_writes + 1)
+    assert _refresh_loads(cube, pg_engine)
+    assert cube.local_writes == 0
+    assert cube.matrix(date(2021, 1, 1), date(2021, 12, 31))["ingresos"].sum() == pytest.approx(total + 2000 - _trip_total("t003") - _trip_total("t004"))
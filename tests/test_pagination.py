@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from api.pagination import NEXT_CURSOR_HEADER, apply_keyset, decode_cursor, encode_cursor, next_cursor
+from db.entities import Viaje
+
+
+def test_cursor_round_trip_serializes_datetimes():
+    token = encode_cursor({"trip_start_timestamp": datetime(2021, 6, 1, 5), "trip_id": "t001"})
+    assert "=" not in token
+    assert decode_cursor(token) == {"trip_start_timestamp": "2021-06-01T05:00:00", "trip_id": "t001"}
+
+
+@pytest.mark.parametrize("token", ["no-es-base64!", encode_cursor({"a": 1})[:-2] + "@@", "WzFd"])
+def test_corrupt_cursor_is_400(token):
+    # "WzFd" es [1] en base64: JSON válido pero no un objeto
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(token)
+    assert error.value.status_code == 400
+
+
+def test_apply_keyset_filters_after_last_key():
+    columns = [Viaje.trip_start_timestamp, Viaje.trip_id]
+    token = encode_cursor({"trip_start_timestamp": datetime(2021, 6, 1), "trip_id": "t001"})
+    sql = str(apply_keyset(select(Viaje.trip_id), columns, token))
+    assert "(viajes.trip_start_timestamp, viajes.trip_id) >" in sql
+    assert "ORDER BY viajes.trip_start_timestamp, viajes.trip_id" in sql
+
+
+def test_cursor_from_another_keyset_is_400():
+    token = encode_cursor({"trip_id": "t001"})
+    with pytest.raises(HTTPException) as error:
+        apply_keyset(select(Viaje.trip_id), [Viaje.trip_start_timestamp, Viaje.trip_id], token)
+    assert error.value.status_code == 400
+
+
+def test_next_cursor_only_for_full_pages():
+    row = type("Row", (), {"trip_id": "t009"})()
+    assert next_cursor([row], [Viaje.trip_id], limit=2) is None
+    assert decode_cursor(next_cursor([row, row], [Viaje.trip_id], limit=2)) == {"trip_id": "t009"}
+
+
+def _walk(client, params):
+    """Recorre el listado siguiendo X-Next-Cursor; devuelve los trip_id en orden."""
+    seen, cursor = [], None
+    while True:
+        response = client.get("/viajes/", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen += [viaje["trip_id"] for viaje in response.json()]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return seen
+
+
+def test_cursor_pages_by_trip_id(client, trips):
+    assert _walk(client, {"limit": 7}) == sorted(trip["trip_id"] for trip in trips)
+
+
+def test_cursor_pages_by_start_time_with_ties(client, trips):
+    # Pares de viajes comparten trip_start_timestamp: el trip_id desempata
+    # y ninguna página repite ni salta viajes
+    after = "2021-06-02"
+    expected = sorted(
+        (trip for trip in trips if trip["trip_start_timestamp"] and trip["trip_start_timestamp"] >= datetime(2021, 6, 2)),
+        key=lambda trip: (trip["trip_start_timestamp"], trip["trip_id"]),
+    )
+    assert _walk(client, {"limit": 3, "trip_start_after": after}) == [trip["trip_id"] for trip in expected]
+
+
+def test_cursor_and_skip_are_exclusive(client):
+    cursor = encode_cursor({"trip_id": "t001"})
+    assert client.get("/viajes/", params={"cursor": cursor, "skip": 5}).status_code == 400
@@ -0,0 +1,50 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+from api.pagination import NEXT_CURSOR_HEADER
+from api.projection import FastJSONResponse, projected_columns
+from db.entities import Viaje
+from util.serialization import json_default
+
+
+def test_json_default_converts_database_types():
+    assert json_default(Decimal("2.50")) == 2.5
+    assert json_default(datetime(2021, 6, 1, 5)) == "2021-06-01T05:00:00"
+    with pytest.raises(TypeError):
+        json_default(object())
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_fast_response_encodes_rows(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr("api.projection.orjson", None)
+    body = FastJSONResponse([{"trip_id": "ñ1", "millas": Decimal("1.5"), "inicio": datetime(2021, 6, 1)}]).body
+    assert json.loads(body) == [{"trip_id": "ñ1", "millas": 1.5, "inicio": "2021-06-01T00:00:00"}]
+
+
+def test_projected_columns_follow_table_order():
+    assert [column.key for column in projected_columns(Viaje, "trip_miles, trip_id")] == ["trip_id", "trip_miles"]
+    assert len(projected_columns(Viaje, None)) == 5
+    with pytest.raises(HTTPException) as error:
+        projected_columns(Viaje, "trip_id,tarifa")
+    assert error.value.status_code == 400
+
+
+def test_fields_drop_the_cursor_keys_but_keep_paging(client, trips):
+    params = {"fields": "trip_miles", "trip_start_after": "2021-06-02", "limit": 4}
+    response = client.get("/viajes/", params=params)
+    assert response.status_code == 200
+    assert all(list(row) == ["trip_miles"] for row in response.json())
+
+    # El cursor se arma con las llaves que no se devolvieron
+    second = client.get("/viajes/", params={**params, "cursor": response.headers[NEXT_CURSOR_HEADER]})
+    assert len(second.json()) == 4
+
+    pagos = client.get("/pagos/", params={"fields": "trip_total", "limit": 1000}).json()
+    assert sorted(pago["trip_total"] for pago in pagos) == sorted(trip["trip_total"] for trip in trips)
@@ -0,0 +1,163 @@
+import logging
+import threading
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import Session
+
+from api.routers import PagosRouter
+from db.bulk import delete_viajes, stage_changes, update_pagos
+from db.config import DBSettings
+from db.entities import Pago, Viaje
+from db.rollups import _ADJUST_STAGED, _METRICS, ROLLUP_HOOKS_KEY, StagedTrips, adjust_rollups, rebuild_rollups
+from db.session import DBSessionManager
+from tests.data import sample_trips
+
+
+def test_staged_trips_read_the_changes_table():
+    for statement in _ADJUST_STAGED[-1]:
+        assert "IN (SELECT trip_id FROM cambio_viajes)" in str(statement)
+    assert not StagedTrips(0) and len(StagedTrips(3)) == 3
+
+
+def test_hooks_come_from_the_session():
+    calls = []
+    db_session = SimpleNamespace(info={ROLLUP_HOOKS_KEY: [lambda *args: calls.append(args)]}, execute=lambda *args: None)
+    adjust_rollups(db_session, ["t001"], -1)
+    adjust_rollups(db_session, [], 1)
+    assert calls == [(db_session, ["t001"], -1)]
+
+
+def test_each_session_manager_has_its_own_hooks(database_url):
+    logger_session_manager = SimpleNamespace(get_logger=lambda: logging.getLogger("prueba"))
+    first, second = (DBSessionManager(logger_session_manager, DBSettings(database_url=database_url)) for _ in range(2))
+    # Se agrega después de crear el gestor, como en el lifespan de main.py
+    first.rollup_hooks.append(print)
+    with first.SessionLocal() as db_session:
+        assert db_session.info[ROLLUP_HOOKS_KEY] == [print]
+    with second.SessionLocal() as db_session:
+        assert db_session.info[ROLLUP_HOOKS_KEY] == []
+    with first.ReadSessionLocal() as db_session:
+        assert ROLLUP_HOOKS_KEY not in db_session.info
+    for manager in (first, second):
+        manager.engine.dispose()
+
+
+# --- Postgres: los ajustes incrementales dejan lo mismo que recalcular ---
+
+def _snapshot(db_session):
+    # Un grupo que se queda sin viajes conserva su fila en cero; el
+    # recálculo no la tiene
+    zeros = " AND ".join(f"{metric} = 0" for metric in _METRICS)
+    return {
+        table: sorted(tuple(row) for row in db_session.execute(text(f"SELECT * FROM {table} WHERE NOT ({zeros})")))
+        for table in ("resumen_viajes", "resumen_taxis")
+    }
+
+
+def _rebuilt(db_session):
+    savepoint = db_session.begin_nested()
+    rebuild_rollups(db_session)
+    snapshot = _snapshot(db_session)
+    savepoint.rollback()
+    return snapshot
+
+
+def _taxi_totals(db_session, taxi_id):
+    row = db_session.execute(text("SELECT * FROM resumen_taxis WHERE taxi_id = :taxi_id"), {"taxi_id": taxi_id})
+    return {metric: float(value) for metric, value in row.mappings().one().items() if metric in _METRICS}
+
+
+@pytest.fixture
+def pg_engine(pg_database):
+    engine = create_engine(pg_database)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def pg_session(pg_engine):
+    with Session(pg_engine) as db_session:
+        yield db_session
+        db_session.rollback()
+
+
+@pytest.mark.parametrize("sign", [1, -1])
+def test_adjust_adds_the_trip_times_sign(pg_session, sign):
+    trip = next(trip for trip in sample_trips() if trip["trip_id"] == "t003")
+    before = _taxi_totals(pg_session, trip["taxi_id"])
+    adjust_rollups(pg_session, [trip["trip_id"]], sign)
+    after = _taxi_totals(pg_session, trip["taxi_id"])
+
+    delta = {metric: after[metric] - before[metric] for metric in _METRICS}
+    assert delta["viajes"] == delta["viajes_con_pago"] == delta["viajes_con_millas"] == sign
+    assert delta["suma_fare"] == sign * trip["fare"]
+    assert delta["suma_tips"] == sign * trip["tips"]
+    assert delta["suma_trip_total"] == sign * trip["trip_total"]
+    assert delta["suma_millas"] == sign * trip["trip_miles"]
+    # Inicio t003: 1 de junio 05:00, fin 15:20
+    assert delta["suma_duracion_segundos"] == sign * (10 * 3600 + 20 * 60)
+
+
+def test_delete_by_ids_matches_rebuild(pg_session):
+    adjust_rollups(pg_session, ["t001", "t002"], -1)
+    assert delete_viajes(pg_session, ["t001", "t002"]) == 2
+    assert _snapshot(pg_session) == _rebuilt(pg_session)
+
+
+def test_filtered_update_matches_rebuild(pg_session):
+    changes = stage_changes(pg_session, select(Pago.trip_id).where(Pago.trip_total >= 20))
+    assert changes.count == sum(trip["trip_total"] >= 20 for trip in sample_trips())
+    adjust_rollups(pg_session, changes, -1)
+    # Después del UPDATE ya ningún pago cumple el filtro: se vuelve a sumar
+    # el conjunto fijo de cambio_viajes
+    assert update_pagos(pg_session, changes, {"trip_total": 1, "tips": 0}) == changes.count
+    adjust_rollups(pg_session, changes, 1)
+    assert _snapshot(pg_session) == _rebuilt(pg_session)
+
+
+def test_filtered_delete_matches_rebuild(pg_session):
+    changes = stage_changes(pg_session, select(Viaje.trip_id).where(Viaje.taxi_id == "taxi1"))
+    adjust_rollups(pg_session, changes, -1)
+    assert delete_viajes(pg_session, changes) == changes.count == 10
+    assert _snapshot(pg_session) == _rebuilt(pg_session)
+    assert pg_session.execute(text("SELECT count(*) FROM pagos")).scalar() == 20
+
+
+def _put_pago(db_session, trip_id, trip_total):
+    # Los pasos de PUT /pagos/{trip_id}
+    pago = PagosRouter._locked_pago(db_session, trip_id)
+    adjust_rollups(db_session, [trip_id], -1)
+    pago.trip_total = trip_total
+    db_session.flush()
+    adjust_rollups(db_session, [trip_id], 1)
+
+
+def test_concurrent_updates_wait_for_the_row_lock(pg_engine, pg_session):
+    first = Session(pg_engine)
+    _put_pago(first, "t003", 100)
+
+    second = Session(pg_engine)
+    done = threading.Event()
+
+    def concurrent_put():
+        _put_pago(second, "t003", 200)
+        second.commit()
+        done.set()
+
+    thread = threading.Thread(target=concurrent_put)
+    thread.start()
+    # El segundo PUT espera el candado del viaje antes de restar
+    assert not done.wait(0.3)
+    first.commit()
+    thread.join(5)
+    assert done.is_set()
+    first.close()
+    second.close()
+
+    assert _taxi_totals(pg_session, "taxi0")["suma_trip_total"] == sum(
+        200 if trip["trip_id"] == "t003" else trip["trip_total"]
+        for trip in sample_trips() if trip["taxi_id"] == "taxi0"
+    )
+    assert _snapshot(pg_session) == _rebuilt(pg_session)
@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from starlette.requests import Request
+
+from db.session import STATEMENT_TIMEOUT_KEY, apply_statement_timeout
+from util.admission import QUERY_CANCELED, classify, statement_timeout_handler
+
+
+class FakeConnection:
+    """Lo que apply_statement_timeout usa de una Connection de SQLAlchemy."""
+
+    def __init__(self, dialect: str = "postgresql", autocommit: bool = False):
+        self.dialect = SimpleNamespace(name=dialect)
+        self.options = {"isolation_level": "AUTOCOMMIT"} if autocommit else {}
+        self.info = {}
+        self.statements = []
+
+    def get_execution_options(self):
+        return self.options
+
+    def exec_driver_sql(self, sql):
+        self.statements.append(sql)
+
+
+def session(timeout=None):
+    return SimpleNamespace(info={STATEMENT_TIMEOUT_KEY: timeout} if timeout else {})
+
+
+def test_only_postgres():
+    connection = FakeConnection("sqlite")
+    apply_statement_timeout(session(5_000), None, connection)
+    assert connection.statements == []
+
+
+def test_transaction_uses_set_local():
+    connection = FakeConnection()
+    apply_statement_timeout(session(5_000), None, connection)
+    assert connection.statements == ["SET LOCAL statement_timeout = 5000"]
+    # SET LOCAL no queda en la conexión
+    assert STATEMENT_TIMEOUT_KEY not in connection.info
+
+
+def test_transaction_without_timeout():
+    connection = FakeConnection()
+    apply_statement_timeout(session(), None, connection)
+    assert connection.statements == []
+
+    # La conexión trae el timeout de un GET anterior (AUTOCOMMIT)
+    connection.info[STATEMENT_TIMEOUT_KEY] = 2_000
+    apply_statement_timeout(session(), None, connection)
+    assert connection.statements == ["SET LOCAL statement_timeout TO DEFAULT"]
+
+
+def test_autocommit_sets_once_per_connection():
+    connection = FakeConnection(autocommit=True)
+    apply_statement_timeout(session(2_000), None, connection)
+    apply_statement_timeout(session(2_000), None, connection)
+    assert connection.statements == ["SET statement_timeout = 2000"]
+    assert connection.info[STATEMENT_TIMEOUT_KEY] == 2_000
+
+    apply_statement_timeout(session(15_000), None, connection)
+    apply_statement_timeout(session(), None, connection)
+    assert connection.statements[1:] == ["SET statement_timeout = 15000", "RESET statement_timeout"]
+    assert connection.info[STATEMENT_TIMEOUT_KEY] is None
+
+
+def test_routes_get_their_class():
+    assert classify("GET", "/viajes/") == "listado"
+    assert classify("GET", "/viajes/t001") == "general"
+    assert classify("DELETE", "/viajes/") == "pesado"
+    assert classify("GET", "/health") is None
+
+
+def _request(timeout):
+    scope = {"type": "http", "method": "GET", "path": "/viajes/", "headers": [], "state": {STATEMENT_TIMEOUT_KEY: timeout}}
+    return Request(scope)
+
+
+def test_canceled_statement_is_503():
+    error = Exception("canceling statement due to statement timeout")
+    error.orig = SimpleNamespace(pgcode=QUERY_CANCELED)
+    response = asyncio.run(statement_timeout_handler(_request(5_000), error))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+    assert b"5000 ms" in response.body
+
+
+def test_other_operational_errors_propagate():
+    error = Exception("server closed the connection")
+    error.orig = SimpleNamespace(pgcode="08006")
+    with pytest.raises(Exception, match="server closed"):
+        asyncio.run(statement_timeout_handler(_request(5_000), error))
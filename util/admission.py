@@ -0,0 +1,178 @@
+import asyncio
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from db.session import STATEMENT_TIMEOUT_KEY
+
+# --- CONTROL DE ADMISIÓN POR RUTA ---
+# Cada clase de ruta tiene su propio cupo de requests simultáneos por
+# worker, una cola corta y un statement_timeout. Así un puñado de exports
+# o listados sin filtros no ocupa todos los hilos del threadpool ni todas
+# las conexiones del pool: las rutas baratas (GET por ID, escrituras
+# individuales) siguen entrando por su propio cupo.
+# Conviene que la suma de los cupos de listado, reportes y pesado quede
+# por debajo de DB_POOL_SIZE + DB_MAX_OVERFLOW y del threadpool (40).
+
+
+@dataclass
+class RouteClass:
+    name: str
+    # Requests simultáneos por worker
+    limit: int
+    # statement_timeout de Postgres en ms (0 = el del servidor)
+    statement_timeout_ms: int
+    # Requests que pueden esperar un lugar; más allá se responde 503 sin esperar
+    queue: int = 0
+    waiting: int = field(default=0, init=False)
+    _semaphore: Optional[asyncio.Semaphore] = field(default=None, init=False, repr=False)
+    _loop: Optional[asyncio.AbstractEventLoop] = field(default=None, init=False, repr=False)
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Uno por event loop (las pruebas pueden correr la app en varios)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore, self._loop, self.waiting = asyncio.Semaphore(self.limit), loop, 0
+        return self._semaphore
+
+
+# clase -> (cupo, statement_timeout_ms); ADMISSION_LIMITS y
+# ADMISSION_TIMEOUTS_MS los cambian con "clase=valor,clase=valor"
+DEFAULT_CLASSES: Dict[str, Tuple[int, int]] = {
+    "general": (32, 2_000),
+    "listado": (8, 5_000),
+    "reportes": (4, 15_000),
+    # Export y bulk pueden tardar minutos: solo se limita cuántos corren
+    "pesado": (2, 0),
+}
+DEFAULT_CLASS = "general"
+# Segundos que un request espera un lugar antes del 503
+DEFAULT_MAX_WAIT = 2.0
+RETRY_AFTER_SECONDS = 1
+
+# (métodos, patrón de la ruta, clase); gana la primera que coincide.
+# Con clase None la ruta no pasa por el control (salud, métricas, docs)
+ROUTE_RULES: List[Tuple[frozenset, Pattern, Optional[str]]] = [
+    (frozenset({"GET", "HEAD"}), re.compile(r"^/(health|metrics|docs|redoc|openapi\.json)"), None),
+    (frozenset({"GET"}), re.compile(r"^/viajes/export"), "pesado"),
+    (frozenset({"POST"}), re.compile(r"^/viajes/bulk"), "pesado"),
+    (frozenset({"DELETE"}), re.compile(r"^/viajes/?$"), "pesado"),
+    (frozenset({"PATCH"}), re.compile(r"^/pagos/?$"), "pesado"),
+    (frozenset({"GET", "HEAD"}), re.compile(r"^/(viajes|pagos)/?$"), "listado"),
+    (frozenset({"POST"}), re.compile(r"^/(viajes|pagos)/lookup"), "listado"),
+    (frozenset({"GET", "HEAD"}), re.compile(r"^/(analytics|taxis|charts)/"), "reportes"),
+]
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    for methods, pattern, name in ROUTE_RULES:
+        if method in methods and pattern.match(path):
+            return name
+    return DEFAULT_CLASS
+
+
+def _overrides(variable: str) -> Dict[str, int]:
+    values = {}
+    for part in os.getenv(variable, "").split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            values[name.strip()] = int(value)
+    return values
+
+
+def create_route_classes() -> Dict[str, RouteClass]:
+    """Clases con los cupos y timeouts del entorno sobre los valores por defecto."""
+    limits = _overrides("ADMISSION_LIMITS")
+    timeouts = _overrides("ADMISSION_TIMEOUTS_MS")
+    classes = {}
+    for name, (limit, timeout) in DEFAULT_CLASSES.items():
+        limit = limits.get(name, limit)
+        classes[name] = RouteClass(name, limit, timeouts.get(name, timeout), queue=2 * limit)
+    return classes
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI puro que limita los requests simultáneos por clase de
+    ruta (ROUTE_RULES). Un request que no tiene lugar espera en la cola de
+    su clase hasta max_wait segundos; si la cola está llena o se acaba la
+    espera se responde 503 con Retry-After sin tocar la BD. También deja
+    en request.state el statement_timeout de la clase para
+    DBSessionMiddleware.
+
+    Los cupos son por worker (por event loop): con N workers el total es N
+    veces el cupo. ADMISSION=0 lo desactiva.
+    """
+
+    def __init__(self, app: ASGIApp, classes: Optional[Dict[str, RouteClass]] = None, max_wait: float = DEFAULT_MAX_WAIT):
+        self.app = app
+        self.classes = classes if classes is not None else create_route_classes()
+        self.max_wait = max_wait
+        self.enabled = os.getenv("ADMISSION", "1") != "0"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        name = classify(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        route_class = self.classes[name]
+
+        if route_class.statement_timeout_ms:
+            scope.setdefault("state", {})[STATEMENT_TIMEOUT_KEY] = route_class.statement_timeout_ms
+
+        semaphore = route_class.semaphore
+        if semaphore.locked() and route_class.waiting >= route_class.queue:
+            await self._reject(route_class, scope, receive, send)
+            return
+
+        route_class.waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.max_wait)
+        except TimeoutError:
+            await self._reject(route_class, scope, receive, send)
+            return
+        finally:
+            route_class.waiting -= 1
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            semaphore.release()
+
+    async def _reject(self, route_class: RouteClass, scope: Scope, receive: Receive, send: Send):
+        response = JSONResponse(
+            {"detail": f"Servidor ocupado ({route_class.name}: {route_class.limit} requests en curso). Intente de nuevo"},
+            status_code=503,
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+        await response(scope, receive, send)
+
+
+# SQLSTATE de Postgres cuando se cancela una sentencia por statement_timeout
+QUERY_CANCELED = "57014"
+
+
+async def statement_timeout_handler(request: Request, exc: Exception):
+    """
+    Exception handler de OperationalError: una consulta cancelada por el
+    statement_timeout de su ruta se responde 503 en lugar de 500.
+    """
+    # psycopg2 y el adaptador de asyncpg de SQLAlchemy exponen pgcode
+    if getattr(getattr(exc, "orig", None), "pgcode", None) != QUERY_CANCELED:
+        raise exc
+    timeout = getattr(request.state, STATEMENT_TIMEOUT_KEY, None)
+    return JSONResponse(
+        {"detail": f"La consulta excedió el tiempo límite de la ruta ({timeout} ms). Agregue filtros más selectivos"},
+        status_code=503,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
@@ -0,0 +1,286 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+T = TypeVar("T")
+
+# --- CONFIGURACIÓN DEL CACHE ---
+# CACHE_URL vacío usa el cache en memoria del proceso; con una URL
+# redis://localhost:6379/0 se comparte entre workers (requiere el extra "cache").
+# Con más de un worker CACHE_URL es obligatorio: las invalidaciones y las
+# versiones de los datos (ETag, gráficas) tienen que verse en todos.
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 10_000
+
+# Llave de session.info donde se acumulan las invalidaciones pendientes
+_PENDING_KEY = "cache_invalidations"
+
+# Versiones de los datos: cambian con cada escritura. Lo que se cachea o
+# valida "por versión" (las gráficas, el ETag de los listados) no se
+# invalida llave por llave; basta con que la versión cambie. "datos"
+# cambia con cada escritura que ajusta los resúmenes; además hay una
+# versión por tabla (viajes, pagos, community_area).
+DATA_VERSION = "datos"
+DATA_VERSION_TTL = 3600
+
+
+def version_key(table: str) -> str:
+    return f"{table}:version"
+
+
+class Cache(ABC):
+    """
+    Interfaz común de los backends de cache. Los valores deben ser
+    serializables a JSON (se guardan los dicts ya validados por Pydantic,
+    no objetos del ORM, para no arrastrar sesiones cerradas).
+    """
+
+    # True si cada operación es una ida y vuelta por red (Redis): desde
+    # código async se corre en el threadpool (ver run_cache)
+    blocking = False
+    # True si todos los workers ven el mismo contenido. Con un cache por
+    # proceso, una escritura solo invalida en el worker que la atendió
+    shared = False
+
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._set(key, value, self.ttl if ttl is None else ttl)
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def _set(self, key: str, value: Any, ttl: float) -> None:
+        ...
+
+
+class MemoryCache(Cache):
+    """
+    LRU con expiración por TTL dentro del proceso. Los handlers síncronos
+    corren en el threadpool, por eso todas las operaciones van con lock.
+    Solo sirve con un worker: cada proceso tiene el suyo y las
+    invalidaciones no se ven en los demás.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update(entries=len(self._entries), max_entries=self.max_entries, evictions=self.evictions)
+        return stats
+
+
+class RedisCache(Cache):
+    """
+    Backend compatible con Redis (Redis, Valkey, KeyDB...). Útil cuando hay
+    varios workers y se quiere que todos vean las mismas invalidaciones.
+    """
+
+    blocking = True
+    shared = True
+
+    def __init__(self, url: str, ttl: float = DEFAULT_TTL, prefix: str = "taxis:"):
+        super().__init__(ttl)
+        # Import perezoso: redis solo se instala con el extra "cache"
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def _set(self, key: str, value: Any, ttl: float) -> None:
+        self.client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+def create_cache() -> Cache:
+    """
+    Crea el cache según el entorno:
+
+        CACHE_URL          redis://... para usar Redis (por defecto en memoria)
+        CACHE_TTL          segundos de vida de cada entrada
+        CACHE_MAX_ENTRIES  tamaño máximo del LRU en memoria
+    """
+    ttl = float(os.getenv("CACHE_TTL", DEFAULT_TTL))
+    url = os.getenv("CACHE_URL")
+    if url:
+        return RedisCache(url, ttl=ttl)
+    return MemoryCache(ttl=ttl, max_entries=int(os.getenv("CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)))
+
+
+def invalidate(db_session: Session, cache: Cache, *keys: str) -> None:
+    """
+    Borra las llaves del cache ahora y otra vez cuando la transacción hace
+    commit. El segundo borrado evita que una lectura concurrente vuelva a
+    guardar la versión anterior entre el cambio y el commit del middleware.
+    Solo borra en el backend dado: con MemoryCache los demás workers no
+    se enteran, por eso varios workers requieren Redis.
+    """
+    cache.delete(*keys)
+    db_session.info.setdefault(_PENDING_KEY, []).append((cache, keys))
+
+
+async def run_cache(cache: Cache, func: Callable[..., T], *args: Any) -> T:
+    """
+    Corre desde un handler async una función que usa el cache (cache.get,
+    invalidate, conditional_get, ...) sin bloquear el event loop: directo
+    con el cache en memoria, en el threadpool si el backend hace I/O.
+    """
+    if cache.blocking:
+        return await run_in_threadpool(func, *args)
+    return func(*args)
+
+
+def _delete_after_commit(cache: Cache, keys) -> None:
+    if cache.blocking:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            # Commit de una AsyncSession: corre en el event loop, así que el
+            # borrado se manda al executor en lugar de esperar a Redis aquí
+            loop.run_in_executor(None, cache.delete, *keys)
+            return
+    cache.delete(*keys)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session):
+    for cache, keys in session.info.pop(_PENDING_KEY, []):
+        _delete_after_commit(cache, keys)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session: Session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def table_version(cache: Cache, table: str) -> Dict[str, Any]:
+    """
+    {"version": ..., "modified": epoch} de la tabla. Si no hay (primera
+    lectura, o hubo una escritura) se genera una nueva con la hora actual;
+    el TTL acota cuánto tarda en notarse una carga hecha fuera de la API
+    (cli.py ingest / rollups).
+    """
+    entry = cache.get(version_key(table))
+    if not isinstance(entry, dict):
+        entry = {"version": uuid.uuid4().hex[:16], "modified": int(time.time())}
+        cache.set(version_key(table), entry, ttl=DATA_VERSION_TTL)
+    return entry
+
+
+def data_version(cache: Cache, table: str = DATA_VERSION) -> str:
+    return table_version(cache, table)["version"]
+
+
+def bump_data_version(db_session: Session, cache: Cache, *tables: str) -> None:
+    """
+    Descarta la versión actual de las tablas (sin tablas, la de "datos");
+    como invalidate, también al hacer commit.
+    """
+    invalidate(db_session, cache, *(version_key(table) for table in tables or (DATA_VERSION,)))
+
+
+def get_versioned(cache: Cache, key: str, table: str) -> Tuple[str, Optional[Any]]:
+    """
+    (versión actual de table, valor) de una entrada guardada con
+    set_versioned; el valor es None si se guardó con otra versión. Así un
+    cambio que toca muchas llaves las invalida todas con
+    bump_data_version(table) en lugar de borrarlas una por una.
+    """
+    version = data_version(cache, table)
+    entry = cache.get(key)
+    if isinstance(entry, dict) and entry.get("version") == version:
+        return version, entry["value"]
+    return version, None
+
+
+def set_versioned(cache: Cache, key: str, version: str, value: Any, ttl: Optional[float] = None) -> None:
+    """Guarda value con la versión que devolvió get_versioned antes de leer la BD."""
+    cache.set(key, {"version": version, "value": value}, ttl)
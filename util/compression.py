@@ -0,0 +1,140 @@
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # extra "compression"; sin él solo se ofrece gzip
+    brotli = None
+
+# --- CONFIGURACIÓN DE LA COMPRESIÓN ---
+# Cuerpos más chicos no se comprimen: el ahorro no paga el costo
+DEFAULT_MINIMUM_SIZE = 1024
+# Niveles pensados para respuestas dinámicas (rápidos, no los máximos)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+# JSON, NDJSON, CSV y texto; las imágenes (PNG de /charts) ya vienen comprimidas
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        # Z_SYNC_FLUSH: cada chunk de un stream sale sin esperar al siguiente
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """
+    Codificación a usar según Accept-Encoding: br si el cliente la acepta
+    y brotli está instalado, si no gzip; None si no acepta ninguna.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name.strip():
+            weights[name.strip()] = weight
+
+    available = ("br", "gzip") if brotli is not None else ("gzip",)
+    for encoding in available:
+        if weights.get(encoding, weights.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI puro que comprime las respuestas JSON / NDJSON / CSV
+    con gzip o brotli según Accept-Encoding. Las respuestas en streaming
+    (export, lookup?stream=) se comprimen chunk por chunk sin acumularlas.
+    Siempre agrega Vary: Accept-Encoding para que los proxies no mezclen
+    versiones comprimidas y sin comprimir.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = DEFAULT_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start: Optional[Message] = None
+        encoder = None
+
+        async def send_wrapper(message: Message):
+            nonlocal start, encoder
+            if message["type"] == "http.response.start":
+                # Se retiene hasta ver el primer chunk del cuerpo
+                start = {**message, "headers": list(message.get("headers", []))}
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start is not None:
+                response_start, start = start, None
+                headers = MutableHeaders(raw=response_start["headers"])
+                compressible = headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                if compressible:
+                    headers.add_vary_header("Accept-Encoding")
+                if (
+                    encoding is None
+                    or not compressible
+                    or "content-encoding" in headers
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    await send(response_start)
+                    await send(message)
+                    return
+
+                encoder = _Brotli() if encoding == "br" else _Gzip()
+                headers["Content-Encoding"] = encoding
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = encoder.finish(body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(response_start)
+                    await send({**message, "body": body})
+                    return
+                await send(response_start)
+
+            if encoder is None:
+                await send(message)
+                return
+            chunk = encoder.compress(body) if more_body else encoder.finish(body)
+            await send({**message, "body": chunk})
+
+        await self.app(scope, receive, send_wrapper)
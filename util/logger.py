@@ -1,6 +1,14 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 from colorlog import ColoredFormatter
-from typing import Optional
+from typing import Dict, Optional
 
 # Definición de colores ANSI para la consola
 RESET = "\033[0m"
@@ -17,6 +25,98 @@ LOG_FORMAT = (
     f"{WHITE}%(message)s{RESET}"
 )
 
+# Loggers de librerías que se unifican con el logger de la app
+FRAMEWORK_LOGGERS = [
+    "uvicorn",
+    "uvicorn.error",
+    "uvicorn.access",
+    "fastapi",
+    "starlette",
+    "sqlalchemy.engine", # Muestra las queries SQL
+    # "sqlalchemy.pool", # Descomentar para ver conexiones del pool
+    # "sqlalchemy.orm",
+]
+
+# En producción el SQL de cada sentencia no se loguea salvo que se pida
+# con LOG_LEVELS (para consultas lentas ver util/metrics.py)
+PROD_LEVELS = {"sqlalchemy.engine": logging.WARNING}
+
+
+def _parse_mapping(value: Optional[str]) -> Dict[str, str]:
+    """"a=1,b.c=2" -> {"a": "1", "b.c": "2"}"""
+    if not value:
+        return {}
+    pairs = (item.split("=", 1) for item in value.split(",") if "=" in item)
+    return {name.strip(): setting.strip() for name, setting in pairs}
+
+
+def _level(value) -> int:
+    if isinstance(value, int):
+        return value
+    return int(value) if value.isdigit() else logging.getLevelName(value.upper())
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, sin colores (para recolectores de logs)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Ya formateado en el hilo del request (StructuredQueueHandler)
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class StructuredQueueHandler(QueueHandler):
+    """
+    QueueHandler que no mete el traceback en el mensaje. El de la stdlib
+    formatea el registro completo dentro de msg y borra exc_info, así que
+    el JSON nunca traía "exc". Aquí solo se resuelven los args y el
+    traceback viaja ya como texto en exc_text (el objeto traceback no se
+    encola); el formato final lo pone el handler del QueueListener.
+    """
+
+    _traceback_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._traceback_formatter.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Deja pasar solo una fracción de los registros de los loggers indicados
+    (y sus hijos). WARNING o más siempre pasan.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Los nombres más largos primero para que gane el más específico
+        self.rates = sorted(rates.items(), key=lambda item: -len(item[0]))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(name + "."):
+                return random.random() < rate
+        return True
+
+
 class LoggerSessionManager:
 
     _instance: Optional["LoggerSessionManager"] = None
@@ -27,15 +127,42 @@ class LoggerSessionManager:
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self, name: str = "app", log_level: int = logging.INFO):
+    def __init__(
+        self,
+        name: str = "app",
+        log_level: int = logging.INFO,
+        mode: Optional[str] = None,
+        levels: Optional[Dict[str, int]] = None,
+        sample_rates: Optional[Dict[str, float]] = None,
+    ):
+        """
+        Sin argumentos la configuración viene del entorno:
+
+            LOG_MODE     dev (consola con colores, por defecto) o prod
+                         (JSON por línea escrito desde un hilo aparte)
+            LOG_LEVEL    nivel general (INFO por defecto)
+            LOG_LEVELS   niveles por logger: "uvicorn.access=WARNING,sqlalchemy.engine=INFO"
+            LOG_SAMPLE   fracción que se conserva por logger: "uvicorn.access=0.1"
+        """
         # Evita re-inicializar si ya fue creado
         if hasattr(self, "_initialized") and self._initialized:
             return
 
+        self.mode = (mode or os.getenv("LOG_MODE", "dev")).strip().lower()
+        if os.getenv("LOG_LEVEL"):
+            log_level = _level(os.getenv("LOG_LEVEL"))
+        if levels is None:
+            levels = {name: _level(level) for name, level in _parse_mapping(os.getenv("LOG_LEVELS")).items()}
+        if sample_rates is None:
+            sample_rates = {name: float(rate) for name, rate in _parse_mapping(os.getenv("LOG_SAMPLE")).items()}
+        if self.mode == "prod":
+            levels = {**PROD_LEVELS, **levels}
+
         self.log_level = log_level
         self.logger = logging.getLogger(name)
         self.logger.setLevel(log_level)
         self.logger.propagate = False
+        self.listener: Optional[QueueListener] = None
 
         # Configuración del formateador con colores
         console_format = ColoredFormatter(
@@ -57,30 +184,47 @@ class LoggerSessionManager:
         self.console_handler.setLevel(log_level)
         self.console_handler.setFormatter(console_format)
 
+        if self.mode == "prod":
+            # El request solo encola el registro; el formateo a JSON y la
+            # escritura a la consola los hace el hilo del QueueListener
+            self.console_handler.setFormatter(JsonFormatter())
+            self.console_handler.setLevel(logging.NOTSET)
+            handler = StructuredQueueHandler(queue.SimpleQueue())
+            self.listener = QueueListener(handler.queue, self.console_handler, respect_handler_level=True)
+            self.listener.start()
+            atexit.register(self.shutdown)
+        else:
+            handler = self.console_handler
+        if sample_rates:
+            # Se descarta antes de encolar/escribir, en el hilo del request
+            handler.addFilter(SamplingFilter(sample_rates))
+        self.handler = handler
+
         # --- Adjuntar handler si no existe ---
         if not self.logger.handlers:
-            self.logger.addHandler(self.console_handler)
+            self.logger.addHandler(handler)
 
         # --- Interceptar loggers de librerías (SQLAlchemy, Uvicorn, FastAPI) ---
         # Esto unifica el estilo de todos los logs en la consola
-        for framework_logger in [
-            "uvicorn",
-            "uvicorn.error",
-            "uvicorn.access",
-            "fastapi",
-            "starlette",
-            "sqlalchemy.engine", # Muestra las queries SQL
-            # "sqlalchemy.pool", # Descomentar para ver conexiones del pool
-            # "sqlalchemy.orm",
-        ]:
+        for framework_logger in FRAMEWORK_LOGGERS:
             framework_logger_inst = logging.getLogger(framework_logger)
             framework_logger_inst.handlers.clear()
-            framework_logger_inst.addHandler(self.console_handler)
+            framework_logger_inst.addHandler(handler)
             framework_logger_inst.setLevel(self.log_level)
             framework_logger_inst.propagate = False
 
+        # --- Niveles por logger (LOG_LEVELS) ---
+        for logger_name, level in levels.items():
+            logging.getLogger(logger_name).setLevel(level)
+
         self._initialized = True
 
+    def shutdown(self) -> None:
+        """Vacía la cola y detiene el hilo de escritura (modo prod)."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
     def get_logger(self, name: Optional[str] = None) -> logging.Logger:
         """
         Retorna el logger principal o un hijo con el nombre especificado.
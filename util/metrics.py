@@ -0,0 +1,294 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from util.logger import LoggerSessionManager
+
+# --- CONFIGURACIÓN DE MÉTRICAS ---
+# Consultas más lentas que esto se loguean con su SQL y parámetros
+DEFAULT_SLOW_QUERY_MS = 500
+
+# Límites (en segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Sentencias SQL por request
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Parámetros más largos que esto se recortan en el log de consultas lentas
+# (un lookup manda miles de IDs en un solo parámetro)
+_MAX_PARAMS_LOG = 1000
+
+# Ruta que se reporta cuando ninguna coincide (evita una serie por URL)
+UNMATCHED_ROUTE = "sin_ruta"
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas, en el formato de Prometheus."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # etiquetas -> [conteo por bucket..., +Inf], suma
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(label_values, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(counts), total[0]) for labels, (counts, total) in self._series.items()]
+
+        for label_values, counts, total in sorted(series):
+            labels = _labels(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound:g}"}} {cumulative}'
+            cumulative += counts[-1]
+            yield f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {cumulative}'
+            yield f"{self.name}_sum{{{labels}}} {total:.6f}"
+            yield f"{self.name}_count{{{labels}}} {cumulative}"
+
+
+def _labels(pairs: Iterable[Tuple[str, Any]]) -> str:
+    def escape(value: Any) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return ",".join(f'{name}="{escape(value)}"' for name, value in pairs)
+
+
+class RequestMetrics:
+    """Lo que se acumula durante un request: SQL ejecutado y contexto para el log."""
+
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.method = scope["method"]
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.context: Dict[str, Any] = {}
+
+    @property
+    def route(self) -> str:
+        # El router deja en el scope la ruta que coincidió (p. ej. /viajes/{trip_id})
+        return getattr(self.scope.get("route"), "path", UNMATCHED_ROUTE)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+# El request en curso. run_in_threadpool copia el contexto, así que los
+# handlers síncronos ven el mismo objeto que el middleware
+_current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request_metrics", default=None)
+
+
+def annotate(**values: Any) -> None:
+    """
+    Agrega datos del request (p. ej. los filtros del listado) que se
+    incluyen en el log si alguna de sus consultas resulta lenta.
+    """
+    current = _current_request.get()
+    if current is not None:
+        current.context.update(values)
+
+
+class Metrics:
+    """
+    Registro de métricas del proceso: latencia por ruta, sentencias y
+    tiempo de BD por request. Se alimenta de los eventos de los engines
+    (instrument_engine) y de MetricsMiddleware, y se exporta en /metrics.
+    """
+
+    def __init__(
+        self,
+        logger_session_manager: LoggerSessionManager,
+        slow_query_ms: float = DEFAULT_SLOW_QUERY_MS,
+        server_timing: bool = False,
+    ):
+        self.logger = logger_session_manager.get_logger(__name__)
+        self.slow_query_ms = slow_query_ms
+        self.server_timing = server_timing
+
+        self.request_duration = Histogram(
+            "http_request_duration_seconds", "Latencia de los requests por ruta",
+            ["method", "route", "status"], LATENCY_BUCKETS,
+        )
+        self.request_statements = Histogram(
+            "http_request_db_statements", "Sentencias SQL ejecutadas por request",
+            ["method", "route"], STATEMENT_BUCKETS,
+        )
+        self.request_db_time = Histogram(
+            "http_request_db_seconds", "Tiempo total en la BD por request",
+            ["method", "route"], LATENCY_BUCKETS,
+        )
+        self.slow_queries = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def instrument_engine(self, engine: Engine) -> None:
+        """Cuenta y cronometra cada sentencia del engine (sync_engine en el caso async)."""
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_started
+        current = _current_request.get()
+        if current is not None:
+            current.statements += 1
+            current.db_seconds += elapsed
+
+        if elapsed * 1000 >= self.slow_query_ms:
+            with self._lock:
+                self.slow_queries += 1
+            params = repr(parameters)
+            if len(params) > _MAX_PARAMS_LOG:
+                params = params[:_MAX_PARAMS_LOG] + "..."
+            where = f"{current.method} {current.route} {current.context}" if current is not None else "fuera de un request"
+            self.logger.warning(
+                f"Consulta lenta ({elapsed * 1000:.1f} ms) en {where}\n{statement}\nparámetros: {params}"
+            )
+
+    def server_timing_header(self, current: RequestMetrics) -> str:
+        return (
+            f'db;dur={current.db_seconds * 1000:.1f};desc="{current.statements} sentencias", '
+            f"app;dur={current.elapsed * 1000:.1f}"
+        )
+
+    def observe_request(self, current: RequestMetrics, status: int) -> None:
+        self.request_duration.observe(current.elapsed, current.method, current.route, str(status))
+        self.request_statements.observe(current.statements, current.method, current.route)
+        self.request_db_time.observe(current.db_seconds, current.method, current.route)
+
+    def render(self, pool_report: List[Dict[str, Any]], cache_stats: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Texto para /metrics (formato de exposición de Prometheus 0.0.4).
+        cache_stats es Cache.stats() del cache compartido por los routers.
+        """
+        lines = []
+        for histogram in (self.request_duration, self.request_statements, self.request_db_time):
+            lines.extend(histogram.render())
+
+        lines += [
+            "# HELP http_requests_in_flight Requests en proceso",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self._in_flight}",
+            "# HELP db_slow_queries_total Consultas más lentas que el umbral del log",
+            "# TYPE db_slow_queries_total counter",
+            f"db_slow_queries_total {self.slow_queries}",
+        ]
+
+        # Estado de cada pool y el tiempo de espera por conexión (db/pool.py)
+        gauges = {
+            "db_pool_checked_out": ("Conexiones prestadas", "checked_out"),
+            "db_pool_idle": ("Conexiones libres en el pool", "idle"),
+            "db_pool_overflow": ("Conexiones en overflow", "overflow"),
+        }
+        for name, (help, key) in gauges.items():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            lines += [
+                f'{name}{{engine="{pool["name"]}"}} {pool[key]}'
+                for pool in pool_report if pool[key] is not None
+            ]
+
+        lines += [
+            "# HELP db_pool_wait_seconds Espera para obtener una conexión del pool",
+            "# TYPE db_pool_wait_seconds summary",
+        ]
+        for pool in pool_report:
+            wait = pool["wait"]
+            engine = f'engine="{pool["name"]}"'
+            lines += [
+                f'db_pool_wait_seconds{{{engine},quantile="0.95"}} {wait["p95_ms"] / 1000:.6f}',
+                f'db_pool_wait_seconds{{{engine},quantile="0.99"}} {wait["p99_ms"] / 1000:.6f}',
+                f"db_pool_wait_seconds_sum{{{engine}}} {wait['avg_ms'] * wait['count'] / 1000:.6f}",
+                f"db_pool_wait_seconds_count{{{engine}}} {wait['count']}",
+            ]
+
+        # Aciertos y fallos son del proceso aunque el backend sea compartido;
+        # el tamaño solo lo reporta el cache en memoria
+        if cache_stats is not None:
+            backend = f'backend="{cache_stats["backend"]}"'
+            counters = {
+                "cache_hits_total": ("Lecturas del cache con valor", "hits", "counter"),
+                "cache_misses_total": ("Lecturas del cache sin valor", "misses", "counter"),
+                "cache_evictions_total": ("Entradas desalojadas por el LRU", "evictions", "counter"),
+                "cache_entries": ("Entradas en el cache", "entries", "gauge"),
+                "cache_max_entries": ("Tamaño máximo del cache", "max_entries", "gauge"),
+            }
+            for name, (help, key, kind) in counters.items():
+                if key in cache_stats:
+                    lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name}{{{backend}}} {cache_stats[key]}"]
+        return "\n".join(lines) + "\n"
+
+
+def create_metrics(logger_session_manager: LoggerSessionManager) -> Metrics:
+    """
+    Crea el registro de métricas según el entorno:
+
+        METRICS_SLOW_QUERY_MS   umbral del log de consultas lentas
+        METRICS_SERVER_TIMING   1 para agregar el header Server-Timing
+    """
+    return Metrics(
+        logger_session_manager,
+        slow_query_ms=float(os.getenv("METRICS_SLOW_QUERY_MS", DEFAULT_SLOW_QUERY_MS)),
+        server_timing=os.getenv("METRICS_SERVER_TIMING", "").strip().lower() in ("1", "true", "yes", "si", "on"),
+    )
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI puro que mide cada request. Debe registrarse después
+    de DBSessionMiddleware (queda por fuera) para incluir el commit.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        current = RequestMetrics(scope)
+        token = _current_request.set(current)
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.metrics.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", self.metrics.server_timing_header(current).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        with self.metrics._lock:
+            self.metrics._in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            with self.metrics._lock:
+                self.metrics._in_flight -= 1
+            _current_request.reset(token)
+            self.metrics.observe_request(current, status)
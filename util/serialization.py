@@ -0,0 +1,14 @@
+from datetime import datetime
+from decimal import Decimal
+
+
+def json_default(value):
+    """
+    default= de json.dumps/orjson.dumps para las filas leídas de la BD:
+    NUMERIC llega como Decimal y TIMESTAMP como datetime.
+    """
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")